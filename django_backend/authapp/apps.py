@@ -1,4 +1,39 @@
+import logging
+import threading
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+logger = logging.getLogger(__name__)
+
+
+def connect():
+    # Register the MongoDB connection; sockets are opened lazily on first use
+    try:
+        from backend.mongo import connect_mongo
+        connect_mongo()
+    except Exception:
+        # Do not crash app startup (e.g. a malformed MONGODB_URI); errors resurface on DB ops
+        logger.exception('MongoDB connection setup failed')
+
+
+def connect_on_first_request(**kwargs):
+    request_started.disconnect(dispatch_uid='authapp.connect_mongo')
+    connect()
+
+
+def warm_search_on_first_request(**kwargs):
+    # build the user search index off the request path; a search that arrives first waits for it
+    request_started.disconnect(dispatch_uid='authapp.warm_search')
+    from .search import user_search
+    threading.Thread(target=warm_search, args=(user_search,), name='user-search-build', daemon=True).start()
+
+
+def warm_search(index):
+    try:
+        index.ensure_built()
+    except Exception:
+        logger.exception('User search index build failed')
 
 
 class AuthappConfig(AppConfig):
@@ -6,10 +41,9 @@ class AuthappConfig(AppConfig):
     name = 'authapp'
 
     def ready(self):
-        # Ensure MongoDB connection is established when the app is ready
-        try:
-            from backend.mongo import connect_mongo
-            connect_mongo()
-        except Exception:
-            # Do not crash app startup if mongo connection fails here; errors surface on DB ops
-            pass
+        if settings.MONGODB_CONNECT_ON_READY:
+            connect()
+        else:
+            request_started.connect(connect_on_first_request, dispatch_uid='authapp.connect_mongo')
+        if getattr(settings, 'USER_SEARCH_WARM', False):
+            request_started.connect(warm_search_on_first_request, dispatch_uid='authapp.warm_search')
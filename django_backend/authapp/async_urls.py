@@ -0,0 +1,9 @@
+from django.urls import re_path
+from . import async_views
+
+urlpatterns = [
+    re_path(r'^register/?$', async_views.register),
+    re_path(r'^login/?$', async_views.login),
+    re_path(r'^me/?$', async_views.get_me),
+    re_path(r'^profile/?$', async_views.update_profile),
+]
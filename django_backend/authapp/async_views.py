@@ -0,0 +1,208 @@
+# Natively async versions of the auth endpoints for ASGI deployments.
+# They mirror the request/response shapes of authapp.views, but talk to Mongo
+# through pymongo's AsyncMongoClient and push bcrypt onto the hashing pool, so
+# a single event loop can hold many slow clients. Mounted under /api/async/auth/.
+import json
+import math
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from mongoengine import ValidationError
+from pymongo.errors import DuplicateKeyError
+from rest_framework import exceptions
+
+from backend.mongo import get_async_db
+from backend.renderers import FastJsonResponse
+from claimsapp.coverage import coverage_service, plan_from_changes
+from .authentication import authenticate_async, generate_token_for_user
+from .hashing import HasherBusy
+from .audit import audit_trail
+from .last_login import last_login_buffer
+from .throttle import login_throttle
+from .models import User
+from .principal_cache import principal_cache
+from .search import search_fields_changed, user_search
+from .serializers import ProfileUpdateSerializer, RegisterSerializer
+
+
+def _collection():
+    return get_async_db()[User._get_collection_name()]
+
+
+def _json_body(request):
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _busy_response(exc):
+    response = FastJsonResponse({'success': False, 'message': 'Server is busy, please retry shortly'}, status=503)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def _bad_json():
+    return FastJsonResponse({'success': False, 'message': 'Request body must be a JSON object'}, status=400)
+
+
+async def _require_user(request):
+    # Same outcome as DRF's IsAuthenticated with MongoJWTAuthentication, which
+    # has no WWW-Authenticate header and therefore answers 403.
+    try:
+        user = await authenticate_async(request)
+    except exceptions.AuthenticationFailed as exc:
+        return None, FastJsonResponse({'detail': str(exc.detail)}, status=403)
+    if user is None:
+        return None, FastJsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+    return user, None
+
+
+_check_password = sync_to_async(User.check_password, thread_sensitive=False)
+_set_password = sync_to_async(User.set_password, thread_sensitive=False)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def register(request):
+    data = _json_body(request)
+    if data is None:
+        return _bad_json()
+    serializer = RegisterSerializer(data=data)
+    if not serializer.is_valid():
+        return FastJsonResponse({'success': False, 'message': serializer.errors}, status=400)
+
+    validated = serializer.validated_data
+    user = User(email=validated['email'], name=validated['name'], role=validated['role'], profile=validated['profile'])
+    try:
+        await _set_password(user, validated['password'])
+    except HasherBusy as exc:
+        return _busy_response(exc)
+    user.updated_at = datetime.utcnow()
+    try:
+        user.validate()
+    except ValidationError as exc:
+        errors = {field: [str(error)] for field, error in exc.to_dict().items()}
+        return FastJsonResponse({'success': False, 'message': errors}, status=400)
+
+    try:
+        result = await _collection().insert_one(user.to_mongo().to_dict())
+    except DuplicateKeyError:
+        return FastJsonResponse({'success': False, 'message': {'email': ['A user with this email already exists']}}, status=400)
+    user.id = result.inserted_id
+    user_search.update_user(user)
+    audit_trail.record('auth.register', request, user=user)
+
+    return FastJsonResponse({
+        'success': True,
+        'message': 'User registered successfully',
+        'token': generate_token_for_user(user),
+        'user': user.to_safe_object()
+    }, status=201)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def login(request):
+    data = _json_body(request)
+    if data is None:
+        return _bad_json()
+    email = data.get('email')
+    password = data.get('password')
+    role = data.get('role')
+
+    if not email or not password or not role:
+        return FastJsonResponse({'success': False, 'message': 'Please provide email, password, and role'}, status=400)
+
+    wait = login_throttle.check(request.META, email)
+    if wait:
+        audit_trail.record('auth.login', request, outcome='throttled', email=email, role=role)
+        response = FastJsonResponse({'success': False, 'message': 'Too many login attempts, please retry later'}, status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+
+    doc = await _collection().find_one({'email': email, 'role': role, 'is_active': True})
+    if not doc:
+        audit_trail.record('auth.login', request, outcome='failure', email=email, role=role)
+        return FastJsonResponse({'success': False, 'message': 'Invalid credentials or role'}, status=401)
+    user = User.from_snapshot(doc)
+
+    changes = {}
+    try:
+        if not await _check_password(user, password):
+            audit_trail.record('auth.login', request, user=user, outcome='failure')
+            return FastJsonResponse({'success': False, 'message': 'Invalid credentials'}, status=401)
+        if user.password_needs_rehash():
+            await _set_password(user, password)
+            changes['password'] = user.password
+    except HasherBusy as exc:
+        return _busy_response(exc)
+
+    now = datetime.utcnow()
+    if last_login_buffer.enabled:
+        last_login_buffer.record(user.id, now)
+        user.last_login = now
+    else:
+        changes['last_login'] = now
+    if changes:
+        query, update = user.versioned_update(changes, touch=False)
+        await _collection().update_one(query, update)
+        principal_cache.invalidate_user(user.id)
+        user.apply_update(update)
+
+    login_throttle.succeeded(email)
+    audit_trail.record('auth.login', request, user=user)
+    token = generate_token_for_user(user)
+
+    return FastJsonResponse({'success': True, 'message': 'Login successful', 'token': token, 'user': user.to_safe_object()}, status=200)
+
+
+@require_http_methods(['GET'])
+async def get_me(request):
+    user, denied = await _require_user(request)
+    if denied:
+        return denied
+    audit_trail.record('user.read', request, user=user, subject_id=user.id)
+    return FastJsonResponse({'success': True, 'user': user.to_safe_object()}, status=200)
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+async def update_profile(request):
+    user, denied = await _require_user(request)
+    if denied:
+        return denied
+    data = _json_body(request)
+    if data is None:
+        return _bad_json()
+    serializer = ProfileUpdateSerializer(data=data)
+    if not serializer.is_valid():
+        return FastJsonResponse({'success': False, 'message': serializer.errors}, status=400)
+    try:
+        changes = serializer.changes_for(user)
+        plan = plan_from_changes(user, changes)
+    except ValueError as exc:
+        return FastJsonResponse({'success': False, 'message': str(exc)}, status=400)
+    if changes:
+        query, update = user.versioned_update(changes, serializer.validated_data.get('version'))
+        result = await _collection().update_one(query, update)
+        principal_cache.invalidate_user(user.id)
+        if not result.matched_count:
+            current = await _collection().find_one({'_id': user.id})
+            return FastJsonResponse({
+                'success': False,
+                'message': 'Profile was changed by another request; reload it and try again',
+                'user': User.from_snapshot(current).to_safe_object() if current else None,
+            }, status=409)
+        user.apply_update(update)
+        if search_fields_changed(changes):
+            user_search.update_user(user)
+    if plan is not None:
+        await sync_to_async(coverage_service.save_plan)(plan)
+    audit_trail.record('user.update', request, user=user, subject_id=user.id, fields=sorted(changes))
+    return FastJsonResponse({'success': True, 'message': 'Profile updated successfully', 'user': user.to_safe_object()}, status=200)
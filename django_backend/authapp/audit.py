@@ -0,0 +1,281 @@
+"""Batched, append-only audit trail of PHI reads and auth events.
+
+Views call ``audit_trail.record(...)``, which only appends a tuple to an
+in-memory deque: no I/O and no lock on the request path. A background thread
+turns queued events into documents and writes them AUDIT_BATCH_SIZE at a time,
+at least every AUDIT_FLUSH_SECONDS and as soon as a batch is waiting, to the
+AUDIT_STORE:
+
+* ``mongo``: one unordered ``insert_many`` per batch into ``audit_event``;
+* ``file``: NDJSON segment files in AUDIT_DIR, one per process and hour,
+  appended and fsynced per batch.
+
+Events are never updated; a TTL index removes them AUDIT_RETENTION_DAYS after
+they happened. A batch Mongo rejects is appended to a segment file instead, so
+an outage neither loses events nor fills the queue. ``manage.py
+import_audit_segments`` loads closed segments into Mongo later. Every event
+gets its ``_id`` in ``record``, so a batch that is retried or re-imported
+skips the events that already arrived rather than storing them twice.
+
+Backpressure: once AUDIT_MAX_QUEUE events are waiting, ``record`` wakes the
+writer and blocks for up to AUDIT_BLOCK_SECONDS until there is room. Called on
+an event loop (the async views) it never blocks. An event that still does not
+fit is dropped, counted and logged. The queue is flushed at exit. With
+AUDIT_FLUSH_SECONDS=0, each event is written synchronously, except on an event
+loop, where it is queued and the writer woken at once.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo.errors import BulkWriteError
+
+from backend.renderers import dumps
+from .throttle import login_throttle
+
+logger = logging.getLogger(__name__)
+
+OPTIONAL_FIELDS = ('actor_id', 'actor_role', 'subject_id', 'ip', 'method', 'path', 'detail')
+ID_FIELDS = ('_id', 'actor_id', 'subject_id')
+
+
+def document(event):
+    """The stored form of a queued ``(_id, time, action, outcome, actor_id, ...)`` tuple."""
+    doc = {'_id': event[0], 'ts': datetime.utcfromtimestamp(event[1]), 'action': event[2], 'outcome': event[3]}
+    for key, value in zip(OPTIONAL_FIELDS, event[4:]):
+        if value is not None:
+            doc[key] = value
+    return doc
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def segment_name(now, pid):
+    return f'audit-{now:%Y%m%d%H}-{pid}.ndjson'
+
+
+def read_segment(path):
+    """The documents in one segment file, with ids and timestamps restored."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            doc['ts'] = datetime.fromisoformat(doc['ts'])
+            for key in ID_FIELDS:
+                if key in doc:
+                    doc[key] = ObjectId(doc[key])
+            yield doc
+
+
+class MongoAuditStore:
+    name = 'mongo'
+
+    def write(self, docs):
+        from .models import AuditEvent
+        try:
+            AuditEvent._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            # a re-imported or retried batch: events that are already stored keep their first copy
+            if exc.details.get('writeConcernErrors') or any(e['code'] != 11000 for e in exc.details['writeErrors']):
+                raise
+
+
+class SegmentAuditStore:
+    name = 'file'
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, docs):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        path = os.path.join(self.directory, segment_name(datetime.utcnow(), os.getpid()))
+        data = b''.join([dumps(doc) + b'\n' for doc in docs])
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600), 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class AuditTrail:
+    """Write-behind queue of audit events; see the module docstring."""
+
+    def __init__(self, store, spill, flush_interval, batch_size, max_queue, block_seconds):
+        self.store = store
+        self.spill = spill
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.block_seconds = block_seconds
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._room = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.recorded = 0
+        self.written = 0
+        self.spilled = 0
+        self.blocked = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failures = 0
+
+    @property
+    def enabled(self):
+        return self.flush_interval > 0
+
+    def record(self, action, request=None, user=None, subject_id=None, outcome='success', **detail):
+        """Queue one event. ``user`` is the actor; the client IP, method and path come from ``request``."""
+        meta = request.META if request is not None else None
+        event = (
+            ObjectId(), time.time(), action, outcome, getattr(user, 'id', None), getattr(user, 'role', None), subject_id,
+            login_throttle.client_ip(meta) if meta is not None else None,
+            request.method if request is not None else None,
+            request.path if request is not None else None,
+            detail or None,
+        )
+        if not self.enabled and not in_event_loop():
+            self._write([event])
+            return
+        queue = self._queue
+        if len(queue) >= self.max_queue and not self._make_room():
+            self.dropped += 1
+            logger.error('Audit queue full (%d events); dropped a %s event', len(queue), action)
+            return
+        queue.append(event)
+        self.recorded += 1
+        if self._pid != os.getpid():
+            self._ensure_thread()
+        if len(queue) >= self.batch_size or not self.enabled:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything queued so far; returns the number of events written."""
+        written = 0
+        with self._flush_lock:
+            queue = self._queue
+            while queue:
+                batch = []
+                try:
+                    for _ in range(self.batch_size):
+                        batch.append(queue.popleft())
+                except IndexError:
+                    pass
+                with self._room:
+                    self._room.notify_all()
+                if not self._write(batch):
+                    # keep them, in order, for the next attempt
+                    queue.extendleft(reversed(batch))
+                    break
+                written += len(batch)
+        return written
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake.set()
+        if self._pid == os.getpid():
+            self.flush()
+            if self._queue:
+                logger.error('%d audit events could not be written before exit', len(self._queue))
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'store': self.store.name,
+            'flush_interval': self.flush_interval,
+            'pending': len(self._queue),
+            'recorded': self.recorded,
+            'written': self.written,
+            'spilled': self.spilled,
+            'blocked': self.blocked,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'failures': self.failures,
+        }
+
+    def _make_room(self):
+        self._wake.set()
+        if in_event_loop():
+            return False  # waiting would stall every request on the loop
+        self.blocked += 1
+        with self._room:
+            return self._room.wait_for(lambda: len(self._queue) < self.max_queue, self.block_seconds)
+
+    def _write(self, events):
+        docs = [document(event) for event in events]
+        for store in (self.store, self.spill):
+            if store is None:
+                continue
+            try:
+                store.write(docs)
+            except Exception:
+                self.failures += 1
+                logger.exception('Failed to write %d audit events to the %s store', len(docs), store.name)
+                continue
+            if store is self.spill:
+                self.spilled += len(docs)
+            self.written += len(docs)
+            self.flushes += 1
+            return True
+        return False
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-flush', daemon=True)
+            self._thread.start()
+            self._pid = pid
+
+    def _run(self):
+        while not self._stopping:
+            # with no interval (only started for events recorded on a loop) sleep until woken
+            self._wake.wait(self.flush_interval or None)
+            self._wake.clear()
+            self.flush()
+
+    def _reset_after_fork(self):
+        # the parent writes its own events; the child starts empty with no thread
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._room = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+
+def build_audit_trail():
+    segments = SegmentAuditStore(settings.AUDIT_DIR)
+    store = MongoAuditStore() if settings.AUDIT_STORE == 'mongo' else segments
+    return AuditTrail(
+        store=store,
+        spill=segments if store is not segments else None,
+        flush_interval=settings.AUDIT_FLUSH_SECONDS,
+        batch_size=settings.AUDIT_BATCH_SIZE,
+        max_queue=settings.AUDIT_MAX_QUEUE,
+        block_seconds=settings.AUDIT_BLOCK_SECONDS,
+    )
+
+
+audit_trail = build_audit_trail()
+os.register_at_fork(after_in_child=audit_trail._reset_after_fork)
+atexit.register(audit_trail.shutdown)
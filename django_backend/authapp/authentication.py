@@ -1,60 +1,130 @@
 import os
-import jwt
+import time
 from rest_framework import authentication, exceptions
+from backend.metrics import phase
 from .models import User
+from .principal_cache import principal_cache
 from datetime import datetime, timedelta
 
 
+JWT_SECRET = os.environ.get('JWT_SECRET', os.environ.get('DJANGO_SECRET_KEY', 'change-me'))
+
+
+class AuthUserWrapper:
+    # Wrap the mongoengine User to provide DRF expected properties
+    def __init__(self, user):
+        self._user = user
+
+    def __getattr__(self, item):
+        return getattr(self._user, item)
+
+    def __setattr__(self, name, value):
+        if name == '_user':
+            super().__setattr__(name, value)
+        else:
+            setattr(self._user, name, value)
+
+    @property
+    def is_authenticated(self):
+        return True
+
+
+def get_bearer_token(request):
+    auth = authentication.get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b'bearer':
+        return None
+
+    if len(auth) == 1:
+        msg = 'Invalid token header. No credentials provided.'
+        raise exceptions.AuthenticationFailed(msg)
+    elif len(auth) > 2:
+        msg = 'Invalid token header. Token string should not contain spaces.'
+        raise exceptions.AuthenticationFailed(msg)
+
+    try:
+        return auth[1].decode()
+    except UnicodeDecodeError:
+        raise exceptions.AuthenticationFailed('Invalid token')
+
+
+def decode_token(token):
+    # PyJWT pulls in its JWK/crypto machinery at import (tens of ms), so load it on first use
+    import jwt
+    try:
+        with phase('jwt_decode'):
+            payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed('Token has expired')
+    except Exception:
+        raise exceptions.AuthenticationFailed('Invalid token')
+
+    user_id = payload.get('user_id') or payload.get('id')
+    if not user_id:
+        raise exceptions.AuthenticationFailed('Invalid token payload')
+    return payload, user_id
+
+
 class MongoJWTAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
-        auth = authentication.get_authorization_header(request).split()
-        if not auth or auth[0].lower() != b'bearer':
+        token = get_bearer_token(request)
+        if token is None:
             return None
 
-        if len(auth) == 1:
-            msg = 'Invalid token header. No credentials provided.'
-            raise exceptions.AuthenticationFailed(msg)
-        elif len(auth) > 2:
-            msg = 'Invalid token header. Token string should not contain spaces.'
-            raise exceptions.AuthenticationFailed(msg)
-
-        try:
-            token = auth[1].decode()
-            payload = jwt.decode(token, os.environ.get('JWT_SECRET', os.environ.get('DJANGO_SECRET_KEY', 'change-me')), algorithms=['HS256'])
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed('Token has expired')
-        except Exception:
-            raise exceptions.AuthenticationFailed('Invalid token')
-
-        user_id = payload.get('user_id') or payload.get('id')
-        if not user_id:
-            raise exceptions.AuthenticationFailed('Invalid token payload')
+        cached = principal_cache.get(token)
+        if cached is not None:
+            return (AuthUserWrapper(User.from_snapshot(cached[1])), None)
 
+        payload, user_id = decode_token(token)
+        loaded_at = time.time()
         user = User.objects(id=user_id).first()
         if not user:
             raise exceptions.AuthenticationFailed('User not found')
 
-        # Wrap the mongoengine User to provide DRF expected properties
-        class AuthUserWrapper:
-            def __init__(self, user):
-                self._user = user
+        if user.is_active:
+            principal_cache.set(token, str(user.id), payload, user.to_snapshot(), loaded_at)
+        return (AuthUserWrapper(user), None)
+
 
-            def __getattr__(self, item):
-                return getattr(self._user, item)
+async def authenticate_async(request, token=None):
+    """Async counterpart of MongoJWTAuthentication for the ASGI views.
 
-            @property
-            def is_authenticated(self):
-                return True
+    Returns the authenticated User (or None without a bearer header) and raises
+    AuthenticationFailed like the DRF class does. ``token`` may be passed in
+    directly for clients that cannot set headers (EventSource).
+    """
+    from backend.mongo import get_async_db
+    from bson import ObjectId
+    from bson.errors import InvalidId
 
-        return (AuthUserWrapper(user), None)
+    token = token or get_bearer_token(request)
+    if token is None:
+        return None
+
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return User.from_snapshot(cached[1])
+
+    payload, user_id = decode_token(token)
+    loaded_at = time.time()
+    try:
+        doc = await get_async_db()[User._get_collection_name()].find_one({'_id': ObjectId(user_id)})
+    except InvalidId:
+        doc = None
+    if not doc:
+        raise exceptions.AuthenticationFailed('User not found')
+
+    user = User.from_snapshot(doc)
+    if user.is_active:
+        principal_cache.set(token, str(user.id), payload, doc, loaded_at)
+    return user
 
 
 def generate_token_for_user(user, days=7):
-    secret = os.environ.get('JWT_SECRET', os.environ.get('DJANGO_SECRET_KEY', 'change-me'))
+    import jwt
     exp = datetime.utcnow() + timedelta(days=days)
     payload = {
         'user_id': str(user.id),
         'exp': exp
     }
-    token = jwt.encode(payload, secret, algorithm='HS256')
+    token = jwt.encode(payload, JWT_SECRET, algorithm='HS256')
     return token
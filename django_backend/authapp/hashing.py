@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from backend.metrics import phase
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool already has its maximum of pending jobs, or just lost a worker."""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing queue is full')
+        self.retry_after = retry_after
+
+
+def bcrypt_hash(raw_password, rounds):
+    import bcrypt  # on first use, so processes that never hash don't load it
+    return bcrypt.hashpw(raw_password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def bcrypt_check(raw_password, hashed):
+    import bcrypt
+    try:
+        return bcrypt.checkpw(raw_password.encode('utf-8'), hashed.encode('utf-8'))
+    except Exception:
+        return False
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool with a bounded backlog.
+
+    The pool is created lazily and recreated after a fork, so gunicorn workers
+    each get their own children. With ``workers=0`` hashing runs inline.
+    """
+
+    def __init__(self, workers, queue_depth, retry_after):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_depth)
+        self.rejected = 0
+
+    def hash(self, raw_password, rounds):
+        return self._run(bcrypt_hash, raw_password, rounds)
+
+    def check(self, raw_password, hashed):
+        return self._run(bcrypt_check, raw_password, hashed)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy(self.retry_after)
+        try:
+            if not self.workers:
+                with phase('bcrypt'):
+                    return fn(*args)
+            executor = self._get_executor()
+            try:
+                with phase('bcrypt'):
+                    return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # a child died (OOM kill etc.); start a fresh pool for the next caller
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                # the caller gets the same 503 + Retry-After as when the queue is full
+                self.rejected += 1
+                raise HasherBusy(self.retry_after) from None
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    # spawn rather than fork: request workers are threaded and
+                    # forking them would copy held locks into the children.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                    self._pid = pid
+        return self._executor
+
+
+def hash_rounds(hashed):
+    # bcrypt hashes look like $2b$12$<salt+hash>; the second field is the cost
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    return hash_rounds(hashed) != settings.BCRYPT_ROUNDS
+
+
+password_hasher = PasswordHasher(
+    workers=getattr(settings, 'PASSWORD_HASHER_WORKERS', 2),
+    queue_depth=getattr(settings, 'PASSWORD_HASHER_QUEUE_DEPTH', 32),
+    retry_after=getattr(settings, 'PASSWORD_HASHER_RETRY_AFTER', 1),
+)
@@ -0,0 +1,136 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .principal_cache import principal_cache
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """Write-behind buffer for ``User.last_login``.
+
+    Logins only record the timestamp in memory. A background thread writes the
+    pending timestamps every ``flush_interval`` seconds (sooner once
+    ``max_pending`` users are waiting) as one unordered bulk write, so stored
+    values lag by at most the interval. Pending writes are flushed at exit.
+    With ``flush_interval=0`` every login is written synchronously.
+    """
+
+    def __init__(self, flush_interval, max_pending):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+
+    @property
+    def enabled(self):
+        return self.flush_interval > 0
+
+    def record(self, user_id, when):
+        if not self.enabled:
+            self._write({user_id: when})
+            return
+        with self._lock:
+            current = self._pending.get(user_id)
+            if current is None or when > current:
+                self._pending[user_id] = when
+            self.recorded += 1
+            full = len(self._pending) >= self.max_pending
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            self._write(pending)
+        except Exception:
+            self.failures += 1
+            logger.exception('Failed to flush %d last_login updates', len(pending))
+            with self._lock:
+                # keep them for the next attempt unless a newer login superseded them
+                for user_id, when in pending.items():
+                    if user_id not in self._pending or when > self._pending[user_id]:
+                        self._pending[user_id] = when
+            return 0
+        self.flushes += 1
+        self.written += len(pending)
+        return len(pending)
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake.set()
+        if self._pid == os.getpid():
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'enabled': self.enabled,
+            'flush_interval': self.flush_interval,
+            'pending': pending,
+            'recorded': self.recorded,
+            'written': self.written,
+            'flushes': self.flushes,
+            'failures': self.failures,
+        }
+
+    def _write(self, pending):
+        from .models import User
+        # $max: a late flush never moves last_login backwards
+        User._get_collection().bulk_write([
+            UpdateOne({'_id': user_id}, {'$max': {'last_login': when}})
+            for user_id, when in pending.items()
+        ], ordered=False)
+        for user_id in pending:
+            principal_cache.invalidate_user(user_id)
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._thread = threading.Thread(target=self._run, name='last-login-flush', daemon=True)
+            self._thread.start()
+            self._pid = pid
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _reset_after_fork(self):
+        # the parent flushes its own entries; the child starts empty with no thread
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+
+last_login_buffer = LastLoginBuffer(
+    flush_interval=getattr(settings, 'LAST_LOGIN_FLUSH_SECONDS', 5),
+    max_pending=getattr(settings, 'LAST_LOGIN_MAX_PENDING', 1000),
+)
+os.register_at_fork(after_in_child=last_login_buffer._reset_after_fork)
+atexit.register(last_login_buffer.shutdown)
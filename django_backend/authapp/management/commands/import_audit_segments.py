@@ -0,0 +1,40 @@
+import glob
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from authapp.audit import MongoAuditStore, read_segment, segment_name
+from backend.mongo import connect_mongo
+
+
+class Command(BaseCommand):
+    help = 'Load audit segment files (AUDIT_STORE=file, or spilled during a Mongo outage) into the audit_event collection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Segment directory (default: AUDIT_DIR)')
+        parser.add_argument('--all', action='store_true', help="Also import the current hour's segments, which may still be written to")
+        parser.add_argument('--batch-size', type=int, default=5000, help='Events inserted per insert_many')
+
+    def handle(self, *args, **options):
+        connect_mongo()
+        directory = options['dir'] or settings.AUDIT_DIR
+        # segment names sort by hour, so anything below the current hour's prefix is closed
+        current = segment_name(datetime.utcnow(), 0).rsplit('-', 1)[0]
+        paths = sorted(p for p in glob.glob(os.path.join(directory, 'audit-*.ndjson'))
+                       if options['all'] or os.path.basename(p) < current)
+        store = MongoAuditStore()
+        events = 0
+        for path in paths:
+            batch = []
+            for doc in read_segment(path):
+                batch.append(doc)
+                if len(batch) == options['batch_size']:
+                    store.write(batch)
+                    events += len(batch)
+                    batch = []
+            if batch:
+                store.write(batch)
+                events += len(batch)
+            os.rename(path, path + '.imported')
+        self.stdout.write(f'✅ Loaded {events} audit events from {len(paths)} segments (events already stored were skipped)')
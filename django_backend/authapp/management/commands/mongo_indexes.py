@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from authapp.models import AuditEvent, User
+from backend.mongo import connect_mongo
+from bson import ObjectId
+from claimsapp.models import Claim, ClaimRollup, IngestJob, ReviewItem
+from notificationsapp.models import Notification
+from datetime import datetime
+
+
+# Queries on the request path; each must be served by an index.
+HOT_QUERIES = [
+    ('User.find_by_email_and_role', lambda: User.objects(email='patient@demo.com', role='patient', is_active=True).limit(1)),
+    ('User by id (MongoJWTAuthentication)', lambda: User.objects(id='000000000000000000000000').limit(1)),
+    ('User.list_by_role', lambda: User.list_by_role('patient')),
+    ('Users changed since (search index refresh)', lambda: User.objects(updated_at__gte=datetime.utcnow())),
+    ('Patients by member id (claim ingestion)', lambda: User.objects(role='patient', profile__memberId__in=['MEM000000001'])),
+    ('Claim by patient', lambda: Claim.objects(patient_id=ObjectId()).order_by('-service_date', '-id').limit(25)),
+    ('Claim by provider', lambda: Claim.objects(provider_id=ObjectId()).order_by('-service_date', '-id').limit(25)),
+    ('Claim by payor and status', lambda: Claim.objects(payor_id=ObjectId(), status='under_review').order_by('-service_date', '-id').limit(25)),
+    ('Claim export (whole book, _id order)', lambda: Claim.objects(status='approved').order_by('id')),
+    ('Member export', lambda: User.objects(role='patient').order_by('-created_at')),
+    ('Fraud alerts', lambda: Claim.objects(fraud_flag=True).order_by('-service_date', '-id').limit(25)),
+    ('Dashboard rollup days', lambda: ClaimRollup.objects(scope='provider', owner_id=ObjectId(), day__gte=datetime(2024, 1, 1)).order_by('day')),
+    ('ReviewQueue.claim_next', lambda: ReviewItem.objects(state='open', lease_until__lte=datetime.utcnow()).order_by('priority').limit(1)),
+    ('Audit trail by subject', lambda: AuditEvent.objects(subject_id=ObjectId()).order_by('-ts').limit(100)),
+    ('Notifications by user', lambda: Notification.objects(user_id=ObjectId()).order_by('-id').limit(25)),
+]
+
+DOCUMENTS = [User, Claim, ReviewItem, IngestJob, ClaimRollup, Notification, AuditEvent]
+
+
+def plan_stages(plan):
+    # Walk a winningPlan tree and yield every stage name in it
+    yield plan.get('stage')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from plan_stages(child)
+
+
+def index_names(document, key_specs):
+    info = document._get_collection().index_information()
+    wanted = [[list(k) for k in spec] for spec in key_specs]
+    return [name for name, idx in info.items() if [list(k) for k in idx['key']] in wanted]
+
+
+class Command(BaseCommand):
+    help = 'Create or reconcile declared MongoDB indexes and explain the hot queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop-extra', action='store_true', help='Drop indexes that exist in Mongo but are not declared on the model')
+        parser.add_argument('--no-create', action='store_true', help='Only report; do not create missing indexes')
+        parser.add_argument('--explain', action='store_true', help='Print the winning plan for each hot query')
+        parser.add_argument('--check', action='store_true', help='Exit non-zero if any hot query uses a collection scan')
+
+    def handle(self, *args, **options):
+        connect_mongo()
+
+        for document in DOCUMENTS:
+            name = document._get_collection_name()
+            diff = document.compare_indexes()
+            for spec in diff['missing']:
+                self.stdout.write(f'{name}: missing index {spec}')
+            for spec in diff['extra']:
+                self.stdout.write(f'{name}: undeclared index {spec}')
+
+            if not options['no_create']:
+                document.ensure_indexes()
+                if diff['missing']:
+                    self.stdout.write(f'{name}: created {len(diff["missing"])} index(es)')
+
+            if options['drop_extra'] and diff['extra']:
+                collection = document._get_collection()
+                for index_name in index_names(document, diff['extra']):
+                    collection.drop_index(index_name)
+                    self.stdout.write(f'{name}: dropped {index_name}')
+
+        if not (options['explain'] or options['check']):
+            return
+
+        collscans = []
+        for label, build in HOT_QUERIES:
+            explain = build().explain()
+            winning = explain.get('queryPlanner', {}).get('winningPlan', {})
+            stages = [stage for stage in plan_stages(winning) if stage]
+            self.stdout.write(f'{label}: {" <- ".join(stages)}')
+            if options['explain']:
+                self.stdout.write(f'    {winning}')
+            if 'COLLSCAN' in stages:
+                collscans.append(label)
+
+        if collscans and options['check']:
+            raise CommandError(f'Collection scan in hot queries: {", ".join(collscans)}')
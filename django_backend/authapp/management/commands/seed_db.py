@@ -1,152 +1,388 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from pymongo.errors import BulkWriteError
+from authapp.hashing import bcrypt_hash
 from authapp.models import User
 from backend.mongo import connect_mongo
 
 
+DEMO_USERS = [
+    {
+        'email': 'patient@demo.com',
+        'password': 'demo123',
+        'role': 'patient',
+        'name': 'John Smith',
+        'profile': {
+            'firstName': 'John',
+            'lastName': 'Smith',
+            'dateOfBirth': '1985-03-15',
+            'phone': '(555) 123-4567',
+            'address': '123 Main St, Anytown, ST 12345',
+            'memberId': 'MEM123456789',
+            'groupNumber': 'GRP001',
+            'insuranceProvider': 'HealthPlus Insurance',
+            'planType': 'Premium Care Plan',
+            'effectiveDate': '2024-01-01',
+            'copay': '$25',
+            'deductible': '$1,500',
+            'outOfPocketMax': '$5,000'
+        }
+    },
+    {
+        'email': 'jane.doe@example.com',
+        'password': 'patient123',
+        'role': 'patient',
+        'name': 'Jane Doe',
+        'profile': {
+            'firstName': 'Jane',
+            'lastName': 'Doe',
+            'dateOfBirth': '1990-07-22',
+            'phone': '(555) 987-6543',
+            'address': '456 Oak Ave, Springfield, ST 67890',
+            'memberId': 'MEM987654321',
+            'groupNumber': 'GRP002',
+            'insuranceProvider': 'MediCare Plus',
+            'planType': 'Standard Plan',
+            'effectiveDate': '2024-02-15',
+            'copay': '$30',
+            'deductible': '$2,000',
+            'outOfPocketMax': '$6,500'
+        }
+    },
+    {
+        'email': 'provider@demo.com',
+        'password': 'provider123',
+        'role': 'provider',
+        'name': 'Dr. Sarah Wilson',
+        'profile': {
+            'firstName': 'Dr. Sarah',
+            'lastName': 'Wilson',
+            'specialty': 'Internal Medicine',
+            'licenseNumber': 'MD12345',
+            'npiNumber': '1234567890',
+            'clinic': 'Central Medical Center',
+            'address': '789 Medical Plaza, Healthcare City, ST 11111',
+            'phone': '(555) 246-8100',
+            'fax': '(555) 246-8101',
+            'yearsExperience': 15,
+            'boardCertified': True
+        }
+    },
+    {
+        'email': 'dr.johnson@healthcenter.com',
+        'password': 'health123',
+        'role': 'provider',
+        'name': 'Dr. Michael Johnson',
+        'profile': {
+            'firstName': 'Dr. Michael',
+            'lastName': 'Johnson',
+            'specialty': 'Cardiology',
+            'licenseNumber': 'MD67890',
+            'npiNumber': '0987654321',
+            'clinic': 'Heart Health Institute',
+            'address': '321 Cardiac Way, Wellness Town, ST 22222',
+            'phone': '(555) 369-2580',
+            'fax': '(555) 369-2581',
+            'yearsExperience': 20,
+            'boardCertified': True
+        }
+    },
+    {
+        'email': 'payor@demo.com',
+        'password': 'payor123',
+        'role': 'payor',
+        'name': 'Lisa Thompson',
+        'profile': {
+            'firstName': 'Lisa',
+            'lastName': 'Thompson',
+            'title': 'Claims Administrator',
+            'department': 'Claims Processing',
+            'company': 'HealthPlus Insurance',
+            'employeeId': 'EMP789012',
+            'phone': '(555) 147-2583',
+            'extension': '1205',
+            'address': '999 Insurance Blvd, Coverage City, ST 33333',
+            'region': 'Northeast',
+            'authority': 'Senior Claims Reviewer'
+        }
+    },
+    {
+        'email': 'admin@insurance.com',
+        'password': 'insurance123',
+        'role': 'payor',
+        'name': 'Robert Chen',
+        'profile': {
+            'firstName': 'Robert',
+            'lastName': 'Chen',
+            'title': 'Senior Underwriter',
+            'department': 'Risk Assessment',
+            'company': 'MediCare Plus',
+            'employeeId': 'EMP456789',
+            'phone': '(555) 789-4561',
+            'extension': '2108',
+            'address': '777 Underwriter St, Policy Town, ST 44444',
+            'region': 'Southwest',
+            'authority': 'Policy Authorization'
+        }
+    }
+]
+
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Daniel', 'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Betty', 'Mark', 'Sandra', 'Steven', 'Ashley',
+    'Wei', 'Priya', 'Carlos', 'Fatima', 'Hiroshi', 'Olga', 'Kwame', 'Aisha', 'Mateo', 'Ingrid',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+    'Chen', 'Patel', 'Nguyen', 'Kim', 'Okafor', 'Ivanova', 'Tanaka', 'Haddad', 'Silva', 'Larsen',
+]
+STREETS = ['Main St', 'Oak Ave', 'Maple Dr', 'Cedar Ln', 'Elm St', 'Pine Rd', 'Lakeview Blvd', 'Hillcrest Way']
+CITIES = ['Anytown', 'Springfield', 'Riverside', 'Fairview', 'Georgetown', 'Madison', 'Clinton', 'Salem']
+PLANS = [
+    # (insuranceProvider, planType, copay, deductible, outOfPocketMax)
+    ('HealthPlus Insurance', 'Premium Care Plan', 25, 1500, 5000),
+    ('HealthPlus Insurance', 'Bronze Saver Plan', 50, 6000, 8700),
+    ('MediCare Plus', 'Standard Plan', 30, 2000, 6500),
+    ('MediCare Plus', 'Silver Plan', 40, 3500, 7500),
+    ('United Wellness', 'Gold PPO', 20, 1000, 4000),
+]
+SPECIALTIES = [
+    'Internal Medicine', 'Cardiology', 'Family Medicine', 'Pediatrics', 'Orthopedics', 'Dermatology',
+    'Neurology', 'Radiology', 'Emergency Medicine', 'Obstetrics and Gynecology', 'Psychiatry', 'Oncology',
+]
+PAYOR_TITLES = ['Claims Administrator', 'Claims Examiner', 'Senior Underwriter', 'Medical Review Nurse', 'Fraud Analyst']
+DEPARTMENTS = ['Claims Processing', 'Risk Assessment', 'Medical Review', 'Special Investigations']
+COMPANIES = [plan[0] for plan in PLANS[::2]]
+REGIONS = ['Northeast', 'Southeast', 'Midwest', 'Southwest', 'West']
+EPOCH = datetime(2024, 1, 1)
+
+
+def money(amount):
+    return f'${amount:,}'
+
+
+def phone(rng):
+    return f'({rng.randint(200, 989)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}'
+
+
+def address(rng):
+    return f'{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}, ST {rng.randint(10000, 99999)}'
+
+
+def patient_profile(rng, i, first, last):
+    provider, plan, copay, deductible, oop = rng.choice(PLANS)
+    dob = EPOCH - timedelta(days=rng.randint(365 * 1, 365 * 90))
+    return {
+        'firstName': first,
+        'lastName': last,
+        'dateOfBirth': dob.strftime('%Y-%m-%d'),
+        'phone': phone(rng),
+        'address': address(rng),
+        'memberId': f'MEM{i:09d}',
+        'groupNumber': f'GRP{rng.randint(1, 999):03d}',
+        'insuranceProvider': provider,
+        'planType': plan,
+        'effectiveDate': (EPOCH + timedelta(days=rng.randint(0, 365))).strftime('%Y-%m-%d'),
+        'copay': money(copay),
+        'deductible': money(deductible),
+        'outOfPocketMax': money(oop),
+    }
+
+
+def provider_profile(rng, i, first, last):
+    return {
+        'firstName': f'Dr. {first}',
+        'lastName': last,
+        'specialty': rng.choice(SPECIALTIES),
+        'licenseNumber': f'MD{i:07d}',
+        'npiNumber': f'{1000000000 + i}',
+        'clinic': f'{rng.choice(CITIES)} {rng.choice(["Medical Center", "Clinic", "Health Partners", "Hospital"])}',
+        'address': address(rng),
+        'phone': phone(rng),
+        'fax': phone(rng),
+        'yearsExperience': rng.randint(1, 40),
+        'boardCertified': rng.random() < 0.85,
+    }
+
+
+def payor_profile(rng, i, first, last):
+    return {
+        'firstName': first,
+        'lastName': last,
+        'title': rng.choice(PAYOR_TITLES),
+        'department': rng.choice(DEPARTMENTS),
+        'company': rng.choice(COMPANIES),
+        'employeeId': f'EMP{i:07d}',
+        'phone': phone(rng),
+        'extension': str(rng.randint(1000, 9999)),
+        'address': address(rng),
+        'region': rng.choice(REGIONS),
+        'authority': rng.choice(['Claims Reviewer', 'Senior Claims Reviewer', 'Policy Authorization']),
+    }
+
+
+PROFILE_BUILDERS = {
+    'patient': patient_profile,
+    'provider': provider_profile,
+    'payor': payor_profile,
+}
+
+
+def synthetic_users(role, count, seed):
+    # One RNG per role so changing --providers does not reshuffle patients
+    rng = random.Random(f'{seed}:{role}')
+    build_profile = PROFILE_BUILDERS[role]
+    span = int((datetime(2026, 1, 1) - EPOCH).total_seconds())
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        profile = build_profile(rng, i, first, last)
+        created_at = EPOCH + timedelta(seconds=rng.randrange(span))
+        yield {
+            'email': f'{first}.{last}.{role}{i}@synthetic.example'.lower(),
+            'name': f'{profile["firstName"]} {last}',
+            'role': role,
+            'profile': profile,
+            'is_active': True,
+            'created_at': created_at,
+            'updated_at': created_at,
+        }
+
+
+def insert_new(collection, docs):
+    """insert_many, counting documents whose email is already taken instead of failing; returns that count."""
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        # with --keep, users from an earlier run with the same seed already hold these emails
+        errors = exc.details['writeErrors']
+        if any(error['code'] != 11000 for error in errors):
+            raise
+        return len(errors)
+    return 0
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
 class Command(BaseCommand):
-    help = 'Seed the database with sample users'
+    help = 'Seed the database with the demo users and, optionally, a large synthetic population'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=0, help='Number of synthetic patients to generate')
+        parser.add_argument('--providers', type=int, default=0, help='Number of synthetic providers to generate')
+        parser.add_argument('--payors', type=int, default=0, help='Number of synthetic payors to generate')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed always yields the same users')
+        parser.add_argument('--password', default='password123', help='Password given to every synthetic user')
+        parser.add_argument('--reuse-hash', action='store_true', help='Hash --password once and reuse it for every synthetic user')
+        parser.add_argument('--rounds', type=int, default=None, help='bcrypt cost for synthetic users (default: BCRYPT_ROUNDS)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes used for password hashing')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Documents per insert_many call')
+        parser.add_argument('--keep', action='store_true', help='Keep existing users instead of dropping the collection')
 
     def handle(self, *args, **options):
         # connect to MongoDB
         connect_mongo()
-        users = [
-            {
-                'email': 'patient@demo.com',
-                'password': 'demo123',
-                'role': 'patient',
-                'name': 'John Smith',
-                'profile': {
-                    'firstName': 'John',
-                    'lastName': 'Smith',
-                    'dateOfBirth': '1985-03-15',
-                    'phone': '(555) 123-4567',
-                    'address': '123 Main St, Anytown, ST 12345',
-                    'memberId': 'MEM123456789',
-                    'groupNumber': 'GRP001',
-                    'insuranceProvider': 'HealthPlus Insurance',
-                    'planType': 'Premium Care Plan',
-                    'effectiveDate': '2024-01-01',
-                    'copay': '$25',
-                    'deductible': '$1,500',
-                    'outOfPocketMax': '$5,000'
-                }
-            },
-            {
-                'email': 'jane.doe@example.com',
-                'password': 'patient123',
-                'role': 'patient',
-                'name': 'Jane Doe',
-                'profile': {
-                    'firstName': 'Jane',
-                    'lastName': 'Doe',
-                    'dateOfBirth': '1990-07-22',
-                    'phone': '(555) 987-6543',
-                    'address': '456 Oak Ave, Springfield, ST 67890',
-                    'memberId': 'MEM987654321',
-                    'groupNumber': 'GRP002',
-                    'insuranceProvider': 'MediCare Plus',
-                    'planType': 'Standard Plan',
-                    'effectiveDate': '2024-02-15',
-                    'copay': '$30',
-                    'deductible': '$2,000',
-                    'outOfPocketMax': '$6,500'
-                }
-            },
-            {
-                'email': 'provider@demo.com',
-                'password': 'provider123',
-                'role': 'provider',
-                'name': 'Dr. Sarah Wilson',
-                'profile': {
-                    'firstName': 'Dr. Sarah',
-                    'lastName': 'Wilson',
-                    'specialty': 'Internal Medicine',
-                    'licenseNumber': 'MD12345',
-                    'npiNumber': '1234567890',
-                    'clinic': 'Central Medical Center',
-                    'address': '789 Medical Plaza, Healthcare City, ST 11111',
-                    'phone': '(555) 246-8100',
-                    'fax': '(555) 246-8101',
-                    'yearsExperience': 15,
-                    'boardCertified': True
-                }
-            },
-            {
-                'email': 'dr.johnson@healthcenter.com',
-                'password': 'health123',
-                'role': 'provider',
-                'name': 'Dr. Michael Johnson',
-                'profile': {
-                    'firstName': 'Dr. Michael',
-                    'lastName': 'Johnson',
-                    'specialty': 'Cardiology',
-                    'licenseNumber': 'MD67890',
-                    'npiNumber': '0987654321',
-                    'clinic': 'Heart Health Institute',
-                    'address': '321 Cardiac Way, Wellness Town, ST 22222',
-                    'phone': '(555) 369-2580',
-                    'fax': '(555) 369-2581',
-                    'yearsExperience': 20,
-                    'boardCertified': True
-                }
-            },
-            {
-                'email': 'payor@demo.com',
-                'password': 'payor123',
-                'role': 'payor',
-                'name': 'Lisa Thompson',
-                'profile': {
-                    'firstName': 'Lisa',
-                    'lastName': 'Thompson',
-                    'title': 'Claims Administrator',
-                    'department': 'Claims Processing',
-                    'company': 'HealthPlus Insurance',
-                    'employeeId': 'EMP789012',
-                    'phone': '(555) 147-2583',
-                    'extension': '1205',
-                    'address': '999 Insurance Blvd, Coverage City, ST 33333',
-                    'region': 'Northeast',
-                    'authority': 'Senior Claims Reviewer'
-                }
-            },
-            {
-                'email': 'admin@insurance.com',
-                'password': 'insurance123',
-                'role': 'payor',
-                'name': 'Robert Chen',
-                'profile': {
-                    'firstName': 'Robert',
-                    'lastName': 'Chen',
-                    'title': 'Senior Underwriter',
-                    'department': 'Risk Assessment',
-                    'company': 'MediCare Plus',
-                    'employeeId': 'EMP456789',
-                    'phone': '(555) 789-4561',
-                    'extension': '2108',
-                    'address': '777 Underwriter St, Policy Town, ST 44444',
-                    'region': 'Southwest',
-                    'authority': 'Policy Authorization'
-                }
-            }
-        ]
-
-        self.stdout.write('🗑️ Clearing existing users...')
-        # delete all documents in the mongo collection
-        try:
-            User.objects.delete()
-        except Exception:
-            pass
+        collection = User._get_collection()
+        rounds = options['rounds'] or settings.BCRYPT_ROUNDS
+
+        if not options['keep']:
+            self.stdout.write('🗑️ Clearing existing users...')
+            # dropping is O(1) and lets the indexes be built once after the bulk load
+            collection.drop()
 
         created = 0
-        for u in users:
-            try:
-                user = User(email=u['email'], name=u['name'], role=u['role'], profile=u['profile'])
-                user.set_password(u['password'])
-                user.save()
-                created += 1
-                self.stdout.write(f"   - Created {user.email} ({user.role})")
-            except Exception as e:
-                self.stderr.write(f"Failed to create {u['email']}: {e}")
+        now = datetime.utcnow()
+        demo_docs = []
+        for u in DEMO_USERS:
+            demo_docs.append({
+                'email': u['email'], 'name': u['name'], 'role': u['role'], 'profile': u['profile'],
+                'password': bcrypt_hash(u['password'], settings.BCRYPT_ROUNDS),
+                'is_active': True, 'created_at': now, 'updated_at': now,
+            })
+        try:
+            existing = insert_new(collection, demo_docs)
+            created += len(demo_docs) - existing
+            for u in demo_docs:
+                self.stdout.write(f"   - Created {u['email']} ({u['role']})")
+            if existing:
+                self.stdout.write(f'   ({existing} demo users already existed and were kept)')
+        except Exception as e:
+            self.stderr.write(f'Failed to create demo users: {e}')
 
+        plan = [(role, options[f'{role}s']) for role in ('patient', 'provider', 'payor')]
+        total = sum(count for _, count in plan)
+        if total:
+            created += self.seed_synthetic(collection, plan, total, rounds, options)
+
+        User.ensure_indexes()
         self.stdout.write(f'✅ Successfully created {created} users')
+
+    def seed_synthetic(self, collection, plan, total, rounds, options):
+        password = options['password']
+        shared_hash = bcrypt_hash(password, rounds) if options['reuse_hash'] else None
+        executor = None
+        if shared_hash is None and options['workers'] > 1:
+            executor = ProcessPoolExecutor(max_workers=options['workers'])
+
+        hashing = 'shared hash' if shared_hash else f'{options["workers"]} hashing workers'
+        self.stdout.write(f'Generating {total} synthetic users (seed={options["seed"]}, rounds={rounds}, {hashing})')
+        inserted = skipped = 0
+        hash_seconds = write_seconds = 0.0
+        started = time.perf_counter()
+        try:
+            for role, count in plan:
+                for chunk in chunked(synthetic_users(role, count, options['seed']), options['chunk_size']):
+                    t0 = time.perf_counter()
+                    if shared_hash is not None:
+                        hashes = [shared_hash] * len(chunk)
+                    elif executor is not None:
+                        per_worker = max(1, len(chunk) // (options['workers'] * 4))
+                        hashes = executor.map(bcrypt_hash, [password] * len(chunk), [rounds] * len(chunk), chunksize=per_worker)
+                    else:
+                        hashes = [bcrypt_hash(password, rounds) for _ in chunk]
+                    for doc, hashed in zip(chunk, hashes):
+                        doc['password'] = hashed
+                    t1 = time.perf_counter()
+                    failed = insert_new(collection, chunk)
+                    t2 = time.perf_counter()
+                    hash_seconds += t1 - t0
+                    write_seconds += t2 - t1
+                    inserted += len(chunk) - failed
+                    skipped += failed
+
+                    elapsed = t2 - started
+                    done = inserted + skipped
+                    self.stdout.write(
+                        f'   {done}/{total} ({done * 100 // total}%) '
+                        f'{done / elapsed:,.0f} users/s'
+                    )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Inserted {inserted} synthetic users in {elapsed:.1f}s ({inserted / elapsed:,.0f} users/s; '
+            f'hashing {hash_seconds:.1f}s, writes {write_seconds:.1f}s)'
+        )
+        if skipped:
+            self.stdout.write(f'⚠️ Skipped {skipped} synthetic users whose email already exists')
+        return inserted
@@ -1,6 +1,11 @@
-from mongoengine import Document, StringField, DateTimeField, BooleanField, DictField, EmailField, connect, signals
-import bcrypt
+from mongoengine import Document, StringField, DateTimeField, BooleanField, DictField, EmailField, IntField, ObjectIdField, connect, signals
+import copy
 from datetime import datetime
+from django.conf import settings
+from backend.renderers import json_datetime
+from .hashing import password_hasher, needs_rehash
+from .principal_cache import principal_cache
+from .search import search_fields_changed, user_search
 
 
 class User(Document):
@@ -13,19 +18,35 @@ class User(Document):
     last_login = DateTimeField()
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
+    # bumped by every update_fields(); clients echo it back for optimistic concurrency
+    version = IntField(default=0)
 
     meta = {
-        'collection': 'user'
+        'collection': 'user',
+        'indexes': [
+            # find_by_email_and_role; equality on all three keys
+            {'fields': ['email', 'role', 'is_active'], 'name': 'login_lookup'},
+            # list_by_role, newest first
+            {'fields': ['role', '-created_at'], 'name': 'role_created_at'},
+            {'fields': ['-created_at'], 'name': 'created_at'},
+            # the search index in every process polls for users changed since its last look
+            {'fields': ['updated_at'], 'name': 'updated_at'},
+            # member id -> patient, for bulk claim ingestion
+            {'fields': ['profile.memberId'], 'name': 'member_id', 'partialFilterExpression': {'role': 'patient'}},
+        ],
     }
 
+    # Both raise authapp.hashing.HasherBusy when the hashing pool is saturated
     def set_password(self, raw_password):
-        self.password = bcrypt.hashpw(raw_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password = password_hasher.hash(raw_password, settings.BCRYPT_ROUNDS)
 
     def check_password(self, raw_password):
-        try:
-            return bcrypt.checkpw(raw_password.encode('utf-8'), self.password.encode('utf-8'))
-        except Exception:
+        if not self.password:
             return False
+        return password_hasher.check(raw_password, self.password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password)
 
     def to_safe_object(self):
         return {
@@ -35,15 +56,115 @@ class User(Document):
             'role': self.role,
             'profile': self.profile,
             'is_active': self.is_active,
-            'last_login': self.last_login.isoformat() if self.last_login else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'last_login': json_datetime(self.last_login),
+            'created_at': json_datetime(self.created_at),
+            'updated_at': json_datetime(self.updated_at),
+            'version': self.version or 0,
         }
 
+    def to_snapshot(self):
+        # Raw document used by the principal cache; rebuilt per request so
+        # cached state is never shared between concurrent requests.
+        return self.to_mongo().to_dict()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls._from_son(copy.deepcopy(snapshot), created=False)
+
+    def profile_changes(self, profile):
+        """Dotted ``profile.<key>`` paths for the top-level keys whose value differs."""
+        for key in profile:
+            if not isinstance(key, str) or not key or '.' in key or key.startswith('$'):
+                raise ValueError(f'Invalid profile field name: {key!r}')
+        current = self.profile or {}
+        return {f'profile.{key}': value for key, value in profile.items() if key not in current or current[key] != value}
+
+    def versioned_update(self, changes, expected_version=None, touch=True):
+        """Filter and update that ``$set`` only ``changes``.
+
+        ``touch`` also sets updated_at and bumps ``version``; bookkeeping writes
+        such as last_login pass False so they never conflict with profile edits.
+        With ``expected_version`` the filter only matches while nobody else has
+        touched the document since that version was read.
+        """
+        query = {'_id': self.id}
+        if expected_version is not None:
+            # documents written before versioning have no field; they count as 0
+            query['version'] = expected_version if expected_version else {'$in': [0, None]}
+        if not touch:
+            return query, {'$set': changes}
+        return query, {'$set': {**changes, 'updated_at': datetime.utcnow()}, '$inc': {'version': 1}}
+
+    def apply_update(self, update):
+        # mirror a successful versioned_update() on this instance
+        for path, value in update['$set'].items():
+            if path.startswith('profile.'):
+                self.profile[path[len('profile.'):]] = value
+            else:
+                setattr(self, path, value)
+        if '$inc' in update:
+            self.version = (self.version or 0) + 1
+        self._clear_changed_fields()
+
+    def update_fields(self, changes, expected_version=None, touch=True):
+        """Atomically apply ``changes``; False if ``expected_version`` is stale."""
+        query, update = self.versioned_update(changes, expected_version, touch)
+        result = self._get_collection().update_one(query, update)
+        principal_cache.invalidate_user(self.id)
+        if not result.matched_count:
+            return False
+        self.apply_update(update)
+        if search_fields_changed(changes):
+            user_search.update_user(self)
+        return True
+
     @classmethod
     def find_by_email_and_role(cls, email, role):
         return cls.objects(email=email, role=role, is_active=True).first()
 
+    @classmethod
+    def list_by_role(cls, role, before=None, limit=50):
+        query = cls.objects(role=role)
+        if before is not None:
+            query = query.filter(created_at__lt=before)
+        return query.order_by('-created_at').limit(limit)
+
     def save(self, *args, **kwargs):
-        self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        if self.pk is None or self._get_changed_fields():
+            self.updated_at = datetime.utcnow()
+        result = super().save(*args, **kwargs)
+        principal_cache.invalidate_user(self.id)
+        user_search.update_user(self)
+        return result
+
+    def delete(self, *args, **kwargs):
+        user_id = self.id
+        result = super().delete(*args, **kwargs)
+        principal_cache.invalidate_user(user_id)
+        user_search.remove(user_id)
+        return result
+
+
+class AuditEvent(Document):
+    """One audited PHI read or auth event; written in batches by authapp.audit and never updated."""
+    ts = DateTimeField(required=True)
+    action = StringField(required=True)
+    outcome = StringField(required=True)
+    actor_id = ObjectIdField()
+    actor_role = StringField()
+    subject_id = ObjectIdField()
+    ip = StringField()
+    method = StringField()
+    path = StringField()
+    detail = DictField()
+
+    meta = {
+        'collection': 'audit_event',
+        'indexes': [
+            # "who read this patient's data" and "what did this user do", newest first
+            {'fields': ['subject_id', '-ts'], 'name': 'subject_ts'},
+            {'fields': ['actor_id', '-ts'], 'name': 'actor_ts'},
+            # also deletes events AUDIT_RETENTION_DAYS old; with 0 they are kept for good
+            {'fields': ['-ts'], 'name': 'ts', **({'expireAfterSeconds': settings.AUDIT_RETENTION_DAYS * 86400} if settings.AUDIT_RETENTION_DAYS else {})},
+        ],
+    }
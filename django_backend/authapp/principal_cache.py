@@ -0,0 +1,186 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+from .throttle import _default_dir, key_hash
+
+REVOKED_AT = struct.Struct('=d')
+
+
+class RevocationTable:
+    """When each user's cached principals were last invalidated, shared by
+    every worker on the host.
+
+    A memory-mapped array of wall-clock timestamps indexed by a hash of the
+    user id (same layout rules as ``authapp.throttle``). ``invalidate_user``
+    stamps the slot, and a cache entry loaded before that stamp is treated as
+    a miss in every process. Users that share a slot only cost each other an
+    extra lookup.
+    """
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        size = self.slots * REVOKED_AT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._map = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._fd = fd
+        self._pid = pid
+
+    def revoked_at(self, user_id):
+        if not self.slots:
+            return 0.0
+        self._open()
+        return REVOKED_AT.unpack_from(self._map, (key_hash(user_id) % self.slots) * REVOKED_AT.size)[0]
+
+    def revoke(self, user_id, now=None):
+        if not self.slots:
+            return
+        self._open()
+        now = time.time() if now is None else now
+        offset = (key_hash(user_id) % self.slots) * REVOKED_AT.size
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, REVOKED_AT.size, offset)
+        try:
+            # never move a stamp backwards
+            if REVOKED_AT.unpack_from(self._map, offset)[0] < now:
+                REVOKED_AT.pack_into(self._map, offset, now)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, REVOKED_AT.size, offset)
+
+
+class PrincipalCache:
+    """Bounded per-process LRU of verified tokens.
+
+    Each entry holds the decoded JWT payload and a raw snapshot of the user
+    document, so a hit skips both ``jwt.decode`` and the Mongo lookup. Entries
+    never outlive the token's own ``exp`` claim.
+
+    ``invalidate_user`` drops the user's entries here and, through
+    ``revocations``, in every other worker on the host: an entry loaded before
+    the user's last invalidation is a miss. Workers on other hosts still serve
+    their entries for up to ``ttl`` seconds.
+    """
+
+    def __init__(self, max_size=10000, ttl=60, revocations=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.revocations = revocations
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token):
+        if not self.max_size:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, loaded_at, user_id, payload, snapshot = entry
+            if expires_at <= now or (
+                self.revocations is not None and self.revocations.revoked_at(user_id) >= loaded_at
+            ):
+                self._discard(token, user_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return payload, snapshot
+
+    def set(self, token, user_id, payload, snapshot, loaded_at=None):
+        """Cache a verified token. ``loaded_at`` is the ``time.time()`` taken
+        before the user was read, so an invalidation that raced the read wins."""
+        if not self.max_size:
+            return
+        loaded_at = time.time() if loaded_at is None else loaded_at
+        expires_at = time.monotonic() + self.ttl
+        exp = payload.get('exp')
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, time.monotonic() + (exp - time.time()))
+        with self._lock:
+            if token in self._entries:
+                self._discard(token, self._entries[token][2])
+            self._entries[token] = (expires_at, loaded_at, user_id, payload, snapshot)
+            self._by_user.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                old_token, old_entry = self._entries.popitem(last=False)
+                self._unindex(old_token, old_entry[2])
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        user_id = str(user_id)
+        if self.revocations is not None:
+            self.revocations.revoke(user_id)
+        with self._lock:
+            tokens = self._by_user.pop(user_id, ())
+            for token in tokens:
+                self._entries.pop(token, None)
+            if tokens:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _discard(self, token, user_id):
+        self._entries.pop(token, None)
+        self._unindex(token, user_id)
+
+    def _unindex(self, token, user_id):
+        tokens = self._by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[user_id]
+
+
+def _revocations():
+    slots = getattr(settings, 'AUTH_PRINCIPAL_REVOCATION_SLOTS', 65536)
+    if not slots:
+        return None
+    directory = getattr(settings, 'LOGIN_THROTTLE_DIR', '') or _default_dir()
+    prefix = getattr(settings, 'LOGIN_THROTTLE_NAME', 'healthclaim-login')
+    return RevocationTable(os.path.join(directory, f'{prefix}-revoked-{slots}'), slots)
+
+
+principal_cache = PrincipalCache(
+    max_size=getattr(settings, 'AUTH_PRINCIPAL_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_PRINCIPAL_CACHE_TTL', 60),
+    revocations=_revocations(),
+)
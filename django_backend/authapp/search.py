@@ -0,0 +1,344 @@
+"""In-memory search over users by partial name, memberId, npiNumber or licenseNumber.
+
+Those fields live in the untyped ``profile`` dict, where a regex query has to
+scan the collection. Each process instead keeps a compact index of them:
+
+* every user's searchable text, normalised to lower-case ``[a-z0-9]`` terms,
+  concatenated into one byte string with an offset per user;
+* a trigram index in CSR form: for each of the 36**3 trigrams, a run of a
+  single uint32 array listing the users whose terms contain it;
+* the terms themselves, truncated to TERM_BYTES and sorted, for prefix and
+  exact lookups by binary search.
+
+These are built in bulk from a cursor, vectorised with NumPy
+(authapp.search_index, imported on the first build), and never modified
+except for a tombstone flag. Users saved afterwards (User.save,
+update_fields, delete, and the other processes' writes, which a background
+thread picks up by polling the ``updated_at`` index every
+USER_SEARCH_REFRESH_SECONDS) go into a small delta with the same three
+structures in dicts and sorted lists. Once the delta holds
+USER_SEARCH_DELTA_MAX users, a background thread merges a snapshot of it into
+a freshly built main index and swaps that in, replaying the writes made
+meanwhile; until then writes and searches carry on against the old one.
+
+A query is split into terms; its longest term picks the candidates and every
+other term must also appear somewhere in the user's text. Matches are ranked
+exact term, then term prefix (alphabetically), then infix (trigram lookup,
+terms of three or more characters only), and the search stops as soon as
+``limit`` users are found, so its cost follows the limit rather than the
+number of users that match.
+"""
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEYS = ('memberId', 'npiNumber', 'licenseNumber')
+PROJECTION = {'name': 1, 'role': 1, 'is_active': 1, **{f'profile.{key}': 1 for key in PROFILE_KEYS}}
+ROLES = ('patient', 'provider', 'payor')
+TERM = re.compile(rb'[a-z0-9]+')
+ALPHABET = b'abcdefghijklmnopqrstuvwxyz0123456789'
+CODE = {byte: code for code, byte in enumerate(ALPHABET)}
+# polled rows overlap the previous poll by this much, so writes from hosts with a slightly slow clock are not missed
+CLOCK_SKEW = timedelta(seconds=5)
+
+
+def terms(value):
+    value = str(value)
+    if not value.isascii():
+        value = unicodedata.normalize('NFKD', value)
+    return TERM.findall(value.encode('ascii', 'ignore').lower())
+
+
+def document_text(doc):
+    """`` term term ... `` for a raw user document, or None if it has nothing to search."""
+    found = terms(doc.get('name') or '')
+    profile = doc.get('profile') or {}
+    for key in PROFILE_KEYS:
+        if profile.get(key):
+            found += terms(profile[key])
+    if not found:
+        return None
+    return b' ' + b' '.join(dict.fromkeys(found)) + b' '
+
+
+def trigrams(term):
+    """Trigram ids (base-36 numbers) of one normalised term."""
+    n = len(ALPHABET)
+    return {CODE[a] * n * n + CODE[b] * n + CODE[c] for a, b, c in zip(term, term[1:], term[2:])}
+
+
+def search_fields_changed(changes):
+    return any(path in ('name', 'role', 'is_active') or path.startswith('profile.') for path in changes)
+
+
+class UserSearchIndex:
+    def __init__(self, delta_max=50000, refresh_seconds=5.0):
+        self.delta_max = delta_max
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._pid = None
+        self._main = None
+        self._watermark = None
+        self._poller_pid = None
+        self._compacting = None
+        self._compactor = None
+        self._killed = set()
+        self.builds = 0
+        self.queries = 0
+        self._reset_delta()
+
+    def _reset_delta(self):
+        self._delta_ids = []
+        self._delta_roles = []
+        self._delta_texts = []
+        self._delta_alive = []
+        self._delta_slot = {}
+        self._delta_trigrams = {}
+        self._delta_terms = []
+
+    @property
+    def built(self):
+        return self._main is not None and self._pid == os.getpid()
+
+    def ensure_built(self):
+        if self.built:
+            return
+        with self._build_lock:
+            if not self.built:
+                self.build()
+
+    def build(self, cursor=None):
+        """(Re)build from a cursor of raw user documents (default: every active user)."""
+        from .models import User
+        from .search_index import MainIndex
+        started = time.perf_counter()
+        watermark = datetime.utcnow() - CLOCK_SKEW
+        if cursor is None:
+            cursor = User._get_collection().find({'is_active': {'$ne': False}}, PROJECTION).sort('_id', 1).batch_size(10000)
+        rows = []
+        for doc in cursor:
+            text = document_text(doc)
+            if text is not None and doc.get('role') in ROLES:
+                rows.append((doc['_id'].binary, ROLES.index(doc['role']), text))
+        rows.sort()
+        main = MainIndex([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+        with self._lock:
+            self._main = main
+            self._reset_delta()
+            self._watermark = watermark
+            self._pid = os.getpid()
+            self.builds += 1
+        logger.info('User search index built: %d users in %.2fs', len(main), time.perf_counter() - started)
+        self._start_poller()
+        return len(main)
+
+    def _start_poller(self):
+        # one per process: a forked child starts its own when it builds
+        if self.refresh_seconds > 0 and self._poller_pid != os.getpid():
+            self._poller_pid = os.getpid()
+            threading.Thread(target=self._poll, name='user-search-refresh', daemon=True).start()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('User search refresh failed')
+
+    # -- incremental updates ------------------------------------------------
+
+    def update_user(self, user):
+        """Re-index a User instance after it was saved."""
+        if user.id is None:
+            return
+        self.upsert({'_id': user.id, 'name': user.name, 'role': user.role, 'is_active': user.is_active, 'profile': user.profile})
+
+    def upsert(self, doc):
+        if not self.built:
+            return  # the build reads the current state
+        user_id = doc['_id'].binary
+        text = document_text(doc) if doc.get('is_active', True) is not False and doc.get('role') in ROLES else None
+        with self._lock:
+            slot = self._slot(user_id)
+            if slot is not None:
+                if text is not None and self._text(slot) == text and self._role(slot) == ROLES.index(doc['role']):
+                    return
+                self._kill(slot)
+            if text is None:
+                return
+            self._add(user_id, ROLES.index(doc['role']), text)
+            if len(self._delta_ids) >= self.delta_max and self._compacting != os.getpid():
+                self._start_compaction()
+
+    def remove(self, user_id):
+        if not self.built:
+            return
+        with self._lock:
+            slot = self._slot(user_id.binary)
+            if slot is not None:
+                self._kill(slot)
+
+    def refresh(self):
+        """Apply users written by other processes since the last poll."""
+        from .models import User
+        since = self._watermark
+        now = datetime.utcnow()
+        for doc in User._get_collection().find({'updated_at': {'$gte': since}}, PROJECTION):
+            self.upsert(doc)
+        self._watermark = now - CLOCK_SKEW
+
+    def _add(self, user_id, role, text):
+        slot = len(self._main) + len(self._delta_ids)
+        self._delta_ids.append(user_id)
+        self._delta_roles.append(role)
+        self._delta_texts.append(text)
+        self._delta_alive.append(True)
+        self._delta_slot[user_id] = slot
+        for term in TERM.findall(text):
+            bisect.insort(self._delta_terms, (term, slot))
+            for trigram in trigrams(term) if len(term) >= 3 else ():
+                self._delta_trigrams.setdefault(trigram, set()).add(slot)
+
+    def _start_compaction(self):
+        # called under _lock: snapshot what the merge covers, then build it off the lock
+        self._compacting = os.getpid()
+        self._killed = set()
+        self._compactor = threading.Thread(
+            target=self._compact, args=(self._main, len(self._delta_ids), self._main.alive.copy(), list(self._delta_alive)),
+            name='user-search-compact', daemon=True,
+        )
+        self._compactor.start()
+
+    def _compact(self, main, frozen, main_alive, delta_alive):
+        from .search_index import MainIndex
+        try:
+            # the delta lists are only appended to until the swap, so the first ``frozen`` entries are stable
+            rows = main.rows(main_alive)
+            rows += [(user_id, role, text) for user_id, role, text, live in
+                     zip(self._delta_ids[:frozen], self._delta_roles[:frozen], self._delta_texts[:frozen], delta_alive) if live]
+            rows.sort()
+            merged = MainIndex([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+            with self._lock:
+                if self._main is not main:
+                    return  # rebuilt from scratch meanwhile
+                later = [(user_id, role, text) for user_id, role, text, live in
+                         zip(self._delta_ids[frozen:], self._delta_roles[frozen:], self._delta_texts[frozen:], self._delta_alive[frozen:]) if live]
+                self._main = merged
+                # users re-indexed or removed since the snapshot: their merged rows are stale
+                for user_id in self._killed:
+                    slot = merged.slot(user_id)
+                    if slot is not None:
+                        merged.alive[slot] = False
+                self._reset_delta()
+                for row in later:
+                    self._add(*row)
+                self.builds += 1
+        except Exception:
+            logger.exception('User search compaction failed')
+        finally:
+            self._compacting = None
+
+    # -- slots ----------------------------------------------------------------
+
+    def _slot(self, user_id):
+        slot = self._delta_slot.get(user_id)
+        if slot is not None and self._delta_alive[slot - len(self._main)]:
+            return slot
+        return self._main.slot(user_id)
+
+    def _kill(self, slot):
+        if self._compacting == os.getpid():
+            self._killed.add(self._user_id(slot))
+        n = len(self._main)
+        if slot < n:
+            self._main.alive[slot] = False
+        else:
+            self._delta_alive[slot - n] = False
+
+    def _text(self, slot):
+        n = len(self._main)
+        return self._main.text(slot) if slot < n else self._delta_texts[slot - n]
+
+    def _role(self, slot):
+        n = len(self._main)
+        return int(self._main.roles[slot]) if slot < n else self._delta_roles[slot - n]
+
+    def _user_id(self, slot):
+        n = len(self._main)
+        return self._main.user_id(slot) if slot < n else self._delta_ids[slot - n]
+
+    def _delta_live(self, slots, role_codes, needles):
+        n = len(self._main)
+        for slot in slots:
+            i = slot - n
+            if self._delta_alive[i] and (role_codes is None or self._delta_roles[i] in role_codes):
+                if all(needle in self._delta_texts[i] for needle in needles):
+                    yield slot
+
+    def _matches(self, term, match, role_codes, needles):
+        """Live slots matching ``term`` at the given level whose text contains every needle, main index first."""
+        main = self._main
+        if match == 'infix':
+            yield from main.live(main.trigram_slots(term), role_codes, needles)
+            runs = sorted((self._delta_trigrams.get(t, ()) for t in trigrams(term)), key=len)
+            yield from self._delta_live(sorted(set(runs[0]).intersection(*runs[1:])), role_codes, needles)
+            return
+        exact = match == 'exact'
+        yield from main.live(main.term_slots_for(term, exact), role_codes, needles)
+        left = bisect.bisect_left(self._delta_terms, (term,))
+        right = bisect.bisect_left(self._delta_terms, (term + (b'\0' if exact else b'\xff'),))
+        yield from self._delta_live([slot for _, slot in self._delta_terms[left:right]], role_codes, needles)
+
+    # -- queries --------------------------------------------------------------
+
+    def search(self, query, roles=None, limit=20):
+        """Ranked matches for ``query``: [(user ObjectId bytes, 'exact' | 'prefix' | 'infix')]."""
+        words = sorted(set(terms(query)), key=len, reverse=True)
+        if not words or limit <= 0:
+            return []
+        self.ensure_built()
+        lead, rest = words[0], words[1:]
+        role_codes = None if roles is None else [ROLES.index(role) for role in roles]
+        found = {}
+        with self._lock:
+            self.queries += 1
+            for match, needle in (('exact', b' ' + lead + b' '), ('prefix', b' ' + lead), ('infix', lead)):
+                if match == 'infix' and len(lead) < 3:
+                    break
+                for slot in self._matches(lead, match, role_codes, (needle, *rest)):
+                    if slot not in found:
+                        found[slot] = match
+                        if len(found) == limit:
+                            break
+                if len(found) == limit:
+                    break
+            return [(self._user_id(slot), match) for slot, match in found.items()]
+
+    def stats(self):
+        with self._lock:
+            main = self._main
+            return {
+                'built': self.built,
+                'users': (main.live_count() if main is not None else 0) + sum(self._delta_alive),
+                'delta': len(self._delta_ids),
+                'builds': self.builds,
+                'queries': self.queries,
+                'bytes': main.nbytes() if main is not None else 0,
+            }
+
+
+user_search = UserSearchIndex(
+    delta_max=getattr(settings, 'USER_SEARCH_DELTA_MAX', 50000),
+    refresh_seconds=getattr(settings, 'USER_SEARCH_REFRESH_SECONDS', 5),
+)
@@ -0,0 +1,116 @@
+"""The bulk-built main part of the user search index (see authapp.search).
+
+Kept apart so NumPy is only imported once a process builds the index.
+"""
+import numpy as np
+
+from .search import ALPHABET, trigrams
+
+SEPARATOR = len(ALPHABET)
+CODES = np.full(256, SEPARATOR, np.uint8)
+CODES[list(ALPHABET)] = np.arange(len(ALPHABET), dtype=np.uint8)
+TRIGRAMS = SEPARATOR ** 3
+TERM_BYTES = 16
+BUILD_CHUNK = 100_000
+
+
+class MainIndex:
+    """The bulk-built, read-only part of the index; slots are positions in ``ids``, which is sorted."""
+
+    def __init__(self, ids, roles, texts):
+        n = len(texts)
+        # numpy strips trailing NULs from S12 values; slot() compares stripped ids for that reason
+        self.ids = np.array(ids, dtype='S12')
+        self.roles = np.array(roles, dtype=np.int8)
+        self.alive = np.ones(n, dtype=bool)
+        lengths = np.fromiter(map(len, texts), np.int64, n)
+        self.ends = np.cumsum(lengths)
+        self.starts = self.ends - lengths
+        self.blob = b''.join(texts)
+
+        keys, term_parts, slot_parts = [], [], []
+        for first in range(0, n, BUILD_CHUNK):
+            last = min(n, first + BUILD_CHUNK)
+            base = int(self.starts[first]) if n else 0
+            chunk = np.frombuffer(self.blob, np.uint8, int(self.ends[last - 1]) - base, base)
+            codes = CODES[chunk].astype(np.int64)
+            slot_of = np.repeat(np.arange(first, last, dtype=np.int64), lengths[first:last])
+            letter = codes < SEPARATOR
+            # trigrams that lie inside one term, as (trigram << 32 | slot) so one sort groups them
+            inside = letter[:-2] & letter[1:-1] & letter[2:]
+            tri = codes[:-2] * SEPARATOR * SEPARATOR + codes[1:-1] * SEPARATOR + codes[2:]
+            keys.append(np.unique((tri[inside] << 32) | slot_of[:-2][inside]))
+            # each term's first TERM_BYTES bytes, NUL padded
+            begins = np.flatnonzero(letter & ~np.concatenate(([False], letter[:-1])))
+            stops = np.flatnonzero(letter & ~np.concatenate((letter[1:], [False]))) + 1
+            window = begins[:, None] + np.arange(TERM_BYTES)
+            padded = np.where(window < stops[:, None], chunk[np.minimum(window, len(chunk) - 1)], 0).astype(np.uint8)
+            term_parts.append(padded.view(f'S{TERM_BYTES}').ravel())
+            slot_parts.append(slot_of[begins].astype(np.uint32))
+
+        keys = np.sort(np.concatenate(keys)) if keys else np.empty(0, np.int64)
+        self.postings = (keys & 0xFFFFFFFF).astype(np.uint32)
+        self.offsets = np.searchsorted(keys >> 32, np.arange(TRIGRAMS + 1))
+        all_terms = np.concatenate(term_parts) if term_parts else np.empty(0, f'S{TERM_BYTES}')
+        order = np.argsort(all_terms, kind='stable')
+        self.terms = all_terms[order]
+        self.term_slots = (np.concatenate(slot_parts) if slot_parts else np.empty(0, np.uint32))[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def user_id(self, slot):
+        return self.ids[slot].ljust(12, b'\0')
+
+    def rows(self, alive=None):
+        """(user id, role, text) of every live user (per ``alive``, default the current flags), for a merge with the delta."""
+        return [(self.user_id(i), int(self.roles[i]), self.text(i)) for i in np.flatnonzero(self.alive if alive is None else alive)]
+
+    def live_count(self):
+        return int(self.alive.sum())
+
+    def nbytes(self):
+        arrays = (self.ids, self.roles, self.alive, self.starts, self.ends, self.postings, self.offsets, self.terms, self.term_slots)
+        return sum(a.nbytes for a in arrays) + len(self.blob)
+
+    def slot(self, user_id):
+        i = int(np.searchsorted(self.ids, user_id))
+        if i < len(self.ids) and self.ids[i] == user_id.rstrip(b'\0') and self.alive[i]:
+            return i
+        return None
+
+    def text(self, slot):
+        return self.blob[self.starts[slot]:self.ends[slot]]
+
+    def live(self, slots, role_codes, needles, block=256):
+        """Yield the live slots with one of ``role_codes`` whose text contains every needle, a block at a time."""
+        find = self.blob.find
+        for start in range(0, len(slots), block):
+            part = slots[start:start + block]
+            part = part[self.alive[part]]
+            if role_codes is not None:
+                part = part[np.isin(self.roles[part], role_codes)]
+            # find() within the user's bounds, so no text is sliced out of the blob
+            for slot, begin, end in zip(part.tolist(), self.starts[part].tolist(), self.ends[part].tolist()):
+                if all(find(needle, begin, end) >= 0 for needle in needles):
+                    yield slot
+
+    def term_slots_for(self, term, exact):
+        key = term[:TERM_BYTES]
+        left = np.searchsorted(self.terms, key, 'left')
+        if exact or len(term) >= TERM_BYTES:
+            right = np.searchsorted(self.terms, key, 'right')
+        else:
+            right = np.searchsorted(self.terms, key + b'\xff', 'left')
+        return self.term_slots[left:right]
+
+    def trigram_slots(self, term):
+        runs = sorted((self.postings[self.offsets[t]:self.offsets[t + 1]] for t in trigrams(term)), key=len)
+        slots = runs[0]
+        for run in runs[1:]:
+            if not len(slots):
+                break
+            # the shortest run so far, looked up in each longer one
+            found = np.searchsorted(run, slots)
+            slots = slots[run[np.minimum(found, len(run) - 1)] == slots]
+        return slots
@@ -36,6 +36,21 @@ class RegisterSerializer(serializers.Serializer):
         return user
 
 
+class ProfileUpdateSerializer(serializers.Serializer):
+    name = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    profile = serializers.DictField(required=False, allow_null=True)
+    # the version from the client's copy of the user; omit to skip the conflict check
+    version = serializers.IntegerField(required=False, min_value=0)
+
+    def changes_for(self, user):
+        # only what differs goes to Mongo; raises ValueError on unusable profile keys
+        data = self.validated_data
+        changes = user.profile_changes(data.get('profile') or {})
+        if data.get('name') and data['name'] != user.name:
+            changes['name'] = data['name']
+        return changes
+
+
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
@@ -52,3 +67,4 @@ class UserSerializer(serializers.Serializer):
     last_login = serializers.CharField(allow_null=True)
     created_at = serializers.CharField(allow_null=True)
     updated_at = serializers.CharField(allow_null=True)
+    version = serializers.IntegerField()
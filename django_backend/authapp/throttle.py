@@ -0,0 +1,157 @@
+"""Login rate limiting shared by every worker process on the host.
+
+Each limit is a table of token buckets in a memory-mapped file (under
+/dev/shm when available), so all gunicorn/uvicorn workers see the same
+counts without an external service. A key hashes to a group of WAYS slots.
+The group is locked with a per-process mutex plus an fcntl byte-range lock on
+just that group, so unrelated keys never contend. A slot holds
+``(key hash, tokens, updated_at)``, and a bucket that has refilled completely
+is as good as empty, so idle keys recycle their slots without any sweeping.
+If every slot in a group is busy, the least recently used one is reused.
+
+The login views check the per-IP and per-account buckets before looking the
+user up or running bcrypt, and answer 429 with Retry-After when either is empty.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+SLOT = struct.Struct('=Qdd')  # key hash (0 = empty), tokens, updated_at
+WAYS = 8
+GROUP = struct.Struct('=' + 'Qdd' * WAYS)
+GROUP_BYTES = GROUP.size
+
+
+def key_hash(key):
+    # stable across processes, unlike hash(); never 0, which marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+class TokenBucketTable:
+    def __init__(self, path, slots, per_minute, burst):
+        self.path = path
+        self.groups = max(slots // WAYS, 1)
+        self.rate = per_minute / 60.0
+        self.burst = float(burst)
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._lock = None
+
+    @property
+    def enabled(self):
+        return self.rate > 0 and self.burst >= 1
+
+    def _open(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        # per process: a mutex inherited through fork may be held by a thread that is gone
+        size = self.groups * GROUP_BYTES
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._map = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._fd = fd
+        self._lock = threading.Lock()
+        self._pid = pid
+
+    def take(self, key, now=None):
+        """Spend one token for ``key``; return 0 if allowed, else seconds until the next token."""
+        if not self.enabled:
+            return 0
+        self._open()
+        now = time.time() if now is None else now
+        h = key_hash(key)
+        base = (h % self.groups) * GROUP_BYTES
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, GROUP_BYTES, base)
+            try:
+                offset, tokens = self._find(h, base, now)
+                if tokens >= 1:
+                    SLOT.pack_into(self._map, offset, h, tokens - 1, now)
+                    return 0
+                SLOT.pack_into(self._map, offset, h, tokens, now)
+                return (1 - tokens) / self.rate
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, GROUP_BYTES, base)
+
+    def reset(self, key):
+        if not self.enabled:
+            return
+        self._open()
+        h = key_hash(key)
+        base = (h % self.groups) * GROUP_BYTES
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, GROUP_BYTES, base)
+            try:
+                for offset in range(base, base + GROUP_BYTES, SLOT.size):
+                    if SLOT.unpack_from(self._map, offset)[0] == h:
+                        SLOT.pack_into(self._map, offset, 0, 0.0, 0.0)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, GROUP_BYTES, base)
+
+    def _find(self, h, base, now):
+        # returns (slot offset, refilled token count) for h, claiming a slot if needed
+        group = GROUP.unpack_from(self._map, base)
+        free = oldest = None
+        oldest_at = None
+        for way in range(WAYS):
+            slot_hash, tokens, updated_at = group[way * 3:way * 3 + 3]
+            refilled = min(self.burst, tokens + max(now - updated_at, 0.0) * self.rate)
+            if slot_hash == h:
+                return base + way * SLOT.size, refilled
+            if free is None and (slot_hash == 0 or refilled >= self.burst):
+                free = way
+            if oldest_at is None or updated_at < oldest_at:
+                oldest, oldest_at = way, updated_at
+        return base + (free if free is not None else oldest) * SLOT.size, self.burst
+
+
+def _default_dir():
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class LoginThrottle:
+    def __init__(self):
+        directory = settings.LOGIN_THROTTLE_DIR or _default_dir()
+        slots = settings.LOGIN_THROTTLE_SLOTS
+        prefix = settings.LOGIN_THROTTLE_NAME
+        # slot count is part of the name so a resized table never reads an old layout
+        self.by_ip = TokenBucketTable(
+            os.path.join(directory, f'{prefix}-ip-{slots}'), slots,
+            settings.LOGIN_THROTTLE_IP_PER_MINUTE, settings.LOGIN_THROTTLE_IP_BURST,
+        )
+        self.by_account = TokenBucketTable(
+            os.path.join(directory, f'{prefix}-account-{slots}'), slots,
+            settings.LOGIN_THROTTLE_ACCOUNT_PER_MINUTE, settings.LOGIN_THROTTLE_ACCOUNT_BURST,
+        )
+        self.rejected = 0
+
+    def client_ip(self, meta):
+        header = settings.LOGIN_THROTTLE_IP_HEADER
+        if header and meta.get(header):
+            # the right-most entry is the one our own proxy appended
+            return meta[header].split(',')[-1].strip()
+        return meta.get('REMOTE_ADDR', '')
+
+    def check(self, meta, email):
+        """Seconds to wait if this login attempt is over a limit, otherwise 0."""
+        wait = self.by_ip.take(self.client_ip(meta)) or self.by_account.take(str(email).strip().lower())
+        if wait:
+            self.rejected += 1
+        return wait
+
+    def succeeded(self, email):
+        # a successful login clears the account's failed attempts
+        self.by_account.reset(str(email).strip().lower())
+
+
+login_throttle = LoginThrottle()
@@ -1,10 +1,42 @@
+import math
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from claimsapp.coverage import coverage_service, plan_from_changes
+from .audit import audit_trail
 from .models import User
-from .serializers import RegisterSerializer, UserSerializer
+from .serializers import ProfileUpdateSerializer, RegisterSerializer, UserSerializer
 from .authentication import generate_token_for_user, MongoJWTAuthentication
+from .hashing import HasherBusy
+from .last_login import last_login_buffer
+from .throttle import login_throttle
+
+
+def busy_response(exc):
+    return Response(
+        {'success': False, 'message': 'Server is busy, please retry shortly'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(exc.retry_after)},
+    )
+
+
+def throttled_response(wait):
+    return Response(
+        {'success': False, 'message': 'Too many login attempts, please retry later'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(math.ceil(wait))},
+    )
+
+
+def conflict_response(user):
+    current = User.objects(id=user.id).first()
+    return Response({
+        'success': False,
+        'message': 'Profile was changed by another request; reload it and try again',
+        'user': current.to_safe_object() if current else None,
+    }, status=status.HTTP_409_CONFLICT)
 
 
 @api_view(['POST'])
@@ -12,7 +44,11 @@ from .authentication import generate_token_for_user, MongoJWTAuthentication
 def register(request):
     serializer = RegisterSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
+        try:
+            user = serializer.save()
+        except HasherBusy as exc:
+            return busy_response(exc)
+        audit_trail.record('auth.register', request, user=user)
         token = generate_token_for_user(user)
         return Response({
             'success': True,
@@ -33,17 +69,36 @@ def login(request):
     if not email or not password or not role:
         return Response({'success': False, 'message': 'Please provide email, password, and role'}, status=status.HTTP_400_BAD_REQUEST)
 
+    wait = login_throttle.check(request.META, email)
+    if wait:
+        audit_trail.record('auth.login', request, outcome='throttled', email=email, role=role)
+        return throttled_response(wait)
+
     user = User.find_by_email_and_role(email, role)
     if not user:
+        audit_trail.record('auth.login', request, outcome='failure', email=email, role=role)
         return Response({'success': False, 'message': 'Invalid credentials or role'}, status=status.HTTP_401_UNAUTHORIZED)
 
-    if not user.check_password(password):
-        return Response({'success': False, 'message': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+    changes = {}
+    try:
+        if not user.check_password(password):
+            audit_trail.record('auth.login', request, user=user, outcome='failure')
+            return Response({'success': False, 'message': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        if user.password_needs_rehash():
+            # BCRYPT_ROUNDS changed since this hash was made; upgrade it while we have the plaintext
+            user.set_password(password)
+            changes['password'] = user.password
+    except HasherBusy as exc:
+        return busy_response(exc)
 
     from datetime import datetime
     user.last_login = datetime.utcnow()
-    user.save()
+    last_login_buffer.record(user.id, user.last_login)
+    if changes:
+        user.update_fields(changes, touch=False)
 
+    login_throttle.succeeded(email)
+    audit_trail.record('auth.login', request, user=user)
     token = generate_token_for_user(user)
 
     return Response({'success': True, 'message': 'Login successful', 'token': token, 'user': user.to_safe_object()}, status=status.HTTP_200_OK)
@@ -53,6 +108,7 @@ def login(request):
 @permission_classes([IsAuthenticated])
 def get_me(request):
     user = request.user
+    audit_trail.record('user.read', request, user=user, subject_id=user.id)
     return Response({'success': True, 'user': user.to_safe_object()}, status=status.HTTP_200_OK)
 
 
@@ -60,14 +116,20 @@ def get_me(request):
 @permission_classes([IsAuthenticated])
 def update_profile(request):
     user = request.user
-    name = request.data.get('name')
-    profile = request.data.get('profile')
-    if name:
-        user.name = name
-    if profile:
-        # merge dicts
-        user.profile = {**user.profile, **profile}
-    user.save()
+    serializer = ProfileUpdateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({'success': False, 'message': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        changes = serializer.changes_for(user)
+        plan = plan_from_changes(user, changes)
+    except ValueError as exc:
+        return Response({'success': False, 'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    # top-level profile keys are $set individually, so concurrent edits to other keys survive
+    if changes and not user.update_fields(changes, serializer.validated_data.get('version')):
+        return conflict_response(user)
+    if plan is not None:
+        coverage_service.save_plan(plan)
+    audit_trail.record('user.update', request, user=user, subject_id=user.id, fields=sorted(changes))
     return Response({'success': True, 'message': 'Profile updated successfully', 'user': user.to_safe_object()}, status=status.HTTP_200_OK)
 
 
@@ -79,8 +141,13 @@ def change_password(request):
     new_password = request.data.get('newPassword')
     if not current_password or not new_password:
         return Response({'success': False, 'message': 'Please provide current and new password'}, status=status.HTTP_400_BAD_REQUEST)
-    if not user.check_password(current_password):
-        return Response({'success': False, 'message': 'Current password is incorrect'}, status=status.HTTP_400_BAD_REQUEST)
-    user.set_password(new_password)
-    user.save()
+    try:
+        if not user.check_password(current_password):
+            audit_trail.record('auth.change_password', request, user=user, subject_id=user.id, outcome='failure')
+            return Response({'success': False, 'message': 'Current password is incorrect'}, status=status.HTTP_400_BAD_REQUEST)
+        user.set_password(new_password)
+    except HasherBusy as exc:
+        return busy_response(exc)
+    user.update_fields({'password': user.password})
+    audit_trail.record('auth.change_password', request, user=user, subject_id=user.id)
     return Response({'success': True, 'message': 'Password changed successfully'}, status=status.HTTP_200_OK)
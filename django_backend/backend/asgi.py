@@ -0,0 +1,11 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+# Serve with an ASGI server, e.g.
+#   uvicorn backend.asgi:application --workers 4
+#   gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker
+# The async endpoints live under /api/async/auth/; the sync DRF views keep
+# running (in Django's thread pool) under /api/auth/ for side by side comparison.
+application = get_asgi_application()
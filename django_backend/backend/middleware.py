@@ -0,0 +1,45 @@
+"""Browser-only middleware that steps aside for API requests.
+
+The API is stateless and authenticated with bearer tokens, so sessions, CSRF
+cookies, ``request.user``, messages and X-Frame-Options do nothing for
+requests under API_PATH_PREFIX. Each class here is the stock Django middleware
+of the same name, except that API requests are passed straight to the next
+layer. That skips the per-request work and, under ASGI, the thread hop that
+every sync ``process_request``/``process_response`` pair costs. Everything
+else on the site keeps the full behaviour.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware as _AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware as _MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware as _SessionMiddleware
+from django.middleware.clickjacking import XFrameOptionsMiddleware as _XFrameOptionsMiddleware
+from django.middleware.csrf import CsrfViewMiddleware as _CsrfViewMiddleware
+
+
+def is_api_request(request):
+    return request.path_info.startswith(settings.API_PATH_PREFIX)
+
+
+def web_only(middleware_class):
+    class WebOnly(middleware_class):
+        def __call__(self, request):
+            if is_api_request(request):
+                return self.get_response(request)
+            return super().__call__(request)
+
+        if hasattr(middleware_class, 'process_view'):
+            def process_view(self, request, *args):
+                if is_api_request(request):
+                    return None
+                return super().process_view(request, *args)
+
+    WebOnly.__name__ = WebOnly.__qualname__ = middleware_class.__name__
+    WebOnly.__doc__ = f'{middleware_class.__name__} for everything outside API_PATH_PREFIX.'
+    return WebOnly
+
+
+SessionMiddleware = web_only(_SessionMiddleware)
+CsrfViewMiddleware = web_only(_CsrfViewMiddleware)
+AuthenticationMiddleware = web_only(_AuthenticationMiddleware)
+MessageMiddleware = web_only(_MessageMiddleware)
+XFrameOptionsMiddleware = web_only(_XFrameOptionsMiddleware)
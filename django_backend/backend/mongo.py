@@ -1,7 +1,171 @@
+import logging
 import os
-from mongoengine import connect
+import threading
+import time
+from django.conf import settings
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+from pymongo import monitoring
+
+from .metrics import command_timer
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks connection pool utilisation from pymongo's CMAP events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, checked_out=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+    def pool_cleared(self, event):
+        self._add(pool_clears=1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            max_size = settings.MONGODB_MAX_POOL_SIZE
+            return {
+                'max_pool_size': max_size,
+                'open': self.open,
+                'checked_out': self.checked_out,
+                'waiting': self.waiting,
+                'utilisation': round(self.checked_out / max_size, 4) if max_size else None,
+                'checkout_failures': self.checkout_failures,
+                'pool_clears': self.pool_clears,
+            }
+
+
+pool_monitor = PoolMonitor()
+_connected_pid = None
+_async_clients = {}
+_async_pid = None
+
+
+def _client_options():
+    options = {
+        'maxPoolSize': settings.MONGODB_MAX_POOL_SIZE,
+        'minPoolSize': settings.MONGODB_MIN_POOL_SIZE,
+        'waitQueueTimeoutMS': settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if settings.MONGODB_COMPRESSORS:
+        options['compressors'] = settings.MONGODB_COMPRESSORS
+    return options
 
 
 def connect_mongo():
-    uri = os.environ.get('MONGODB_URI') or 'mongodb://localhost:27017/patientdb'
-    connect(host=uri)
+    # connect=False keeps pymongo from opening sockets or monitor threads until
+    # the first operation, so calling this before a fork (AppConfig.ready under
+    # gunicorn --preload) leaves each worker to open its own pool.
+    global _connected_pid
+    if _connected_pid == os.getpid():
+        return
+    connect(host=settings.MONGODB_URI, connect=False, event_listeners=[pool_monitor, command_timer], **_client_options())
+    _connected_pid = os.getpid()
+
+
+def get_async_db():
+    # Native asyncio driver for the ASGI views. An AsyncMongoClient is bound to
+    # the event loop it was first used on, so keep one per (process, loop).
+    global _async_pid
+    import asyncio
+    from pymongo import AsyncMongoClient
+
+    loop = asyncio.get_running_loop()
+    if _async_pid != os.getpid():
+        # the parent's clients belong to its loops; forget them without closing
+        _async_clients.clear()
+        _async_pid = os.getpid()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncMongoClient(settings.MONGODB_URI, event_listeners=[command_timer], **_client_options())
+        _async_clients[loop] = client
+        loop.create_task(_close_with_loop(loop, client))
+    return client.get_default_database('patientdb')
+
+
+async def _close_with_loop(loop, client):
+    # asyncio.run (and so async_to_sync, which runs each call of an async view
+    # served under WSGI on a fresh loop) cancels leftover tasks before closing
+    # the loop, so this closes the client while its loop can still run it.
+    try:
+        await loop.create_future()
+    finally:
+        _async_clients.pop(loop, None)
+        await client.close()
+
+
+def _reset_after_fork():
+    # A client inherited from the parent must never be used in the child.
+    # Drop it here; the next connect_mongo() builds a fresh, lazy one.
+    global _connected_pid
+    if _connected_pid is None:
+        return
+    try:
+        disconnect()
+    except Exception:
+        logger.exception('Failed to discard inherited MongoDB client after fork')
+    pool_monitor.reset()
+    _connected_pid = None
+    connect_mongo()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def mongo_health():
+    connect_mongo()
+    started = time.perf_counter()
+    try:
+        get_db().command('ping')
+    except Exception as exc:
+        logger.warning('MongoDB health ping failed: %s', exc)
+        return {'ok': False, 'error': type(exc).__name__, 'pool': pool_monitor.stats()}
+    return {
+        'ok': True,
+        'ping_ms': round((time.perf_counter() - started) * 1000, 3),
+        'pool': pool_monitor.stats(),
+    }
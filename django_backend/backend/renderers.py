@@ -0,0 +1,96 @@
+"""JSON encoding for API responses.
+
+With orjson installed, FastJSONRenderer (the default DRF renderer) and
+FastJsonResponse (for the plain async views) encode dicts, lists, datetimes and
+ObjectIds in C. Without it both fall back to the stdlib ``json`` module through
+DRF's encoder. Serialized rows carry dates as ISO strings (``json_datetime``,
+``json_date``), so the response bodies are the same either way.
+
+List endpoints build their rows with ``compile_row_encoder``, which turns a
+field spec into a single list comprehension instead of a per-row function call.
+"""
+import json
+
+from bson import ObjectId
+from django.http import HttpResponse
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NATIVE_DATETIMES = orjson is not None
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    return _drf_encoder.default(obj)
+
+
+def dumps(data):
+    """Encode ``data`` as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        content = orjson.dumps(data, default=_default)
+        # match DRF: these are valid JSON but break JavaScript string literals
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+    return json.dumps(data, default=_default, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def passthrough(value):
+    return value
+
+
+# Serializers and model helpers always hand back strings, whichever encoder
+# renders them; orjson's native datetimes only apply to raw values in a body.
+def json_datetime(value):
+    return value.isoformat() if value else None
+
+
+def json_date(value):
+    return value.date().isoformat() if value else None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with phase('render'):
+            if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            return dumps(data)
+
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse for views outside DRF, encoded with ``dumps``."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+def compile_row_encoder(name, fields):
+    """Build ``name(rows) -> list of dicts`` from ``(key, source, transform)`` specs.
+
+    Each output row is ``{key: transform(row.get(source))}``; a transform of
+    None (or ``passthrough``) copies the value as is.
+    """
+    namespace = {}
+    items = []
+    for i, (key, source, transform) in enumerate(fields):
+        value = f'row.get({source!r})'
+        if transform is not None and transform is not passthrough:
+            namespace[f't{i}'] = transform
+            value = f't{i}({value})'
+        items.append(f'{key!r}: {value}')
+    code = f'def {name}(rows):\n    return [{{{", ".join(items)}}} for row in rows]\n'
+    exec(compile(code, f'<row encoder {name}>', 'exec'), namespace)
+    return namespace[name]
@@ -25,18 +25,24 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'corsheaders',
     'authapp',
+    'claimsapp',
+    'notificationsapp',
 ]
 
+# Session, CSRF, auth, messages and X-Frame-Options are the stock Django
+# middleware, wrapped so they skip requests under API_PATH_PREFIX (see backend.middleware)
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'backend.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.CsrfViewMiddleware',
+    'backend.middleware.AuthenticationMiddleware',
+    'backend.middleware.MessageMiddleware',
+    'backend.middleware.XFrameOptionsMiddleware',
 ]
+API_PATH_PREFIX = '/api/'
 
 ROOT_URLCONF = 'backend.urls'
 
@@ -57,6 +63,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
 
 # Database - lightweight default (SQLite). Migration from MongoDB shapes will be handled in models.
 DATABASES = {
@@ -66,6 +73,17 @@ DATABASES = {
     }
 }
 
+# MongoDB (mongoengine) connection pool; see backend.mongo
+MONGODB_URI = os.environ.get('MONGODB_URI') or 'mongodb://localhost:27017/patientdb'
+MONGODB_MAX_POOL_SIZE = int(os.environ.get('MONGODB_MAX_POOL_SIZE', '100'))
+MONGODB_MIN_POOL_SIZE = int(os.environ.get('MONGODB_MIN_POOL_SIZE', '0'))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGODB_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+# Comma separated, e.g. "zstd,snappy,zlib" (zstd/snappy need their optional packages)
+MONGODB_COMPRESSORS = os.environ.get('MONGODB_COMPRESSORS', '')
+# Register the client in AppConfig.ready(); when False it is built on the first request
+MONGODB_CONNECT_ON_READY = os.environ.get('MONGODB_CONNECT_ON_READY', '1') == '1'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -82,8 +100,129 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'authapp.authentication.MongoJWTAuthentication',
     ),
+    # orjson-backed when installed, stdlib json otherwise (see backend.renderers)
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# Per-process cache of verified bearer tokens (see authapp.principal_cache).
+# Set the size to 0 to disable it. Invalidations (deactivation, password or
+# role change) reach every worker on the host at once through a shared table in
+# LOGIN_THROTTLE_DIR; workers on other hosts keep serving a revoked token for
+# up to TTL seconds, so keep TTL short on multi-host deployments.
+AUTH_PRINCIPAL_CACHE_SIZE = int(os.environ.get('AUTH_PRINCIPAL_CACHE_SIZE', '10000'))
+AUTH_PRINCIPAL_CACHE_TTL = float(os.environ.get('AUTH_PRINCIPAL_CACHE_TTL', '60'))
+AUTH_PRINCIPAL_REVOCATION_SLOTS = int(os.environ.get('AUTH_PRINCIPAL_REVOCATION_SLOTS', '65536'))
+
+# Password hashing runs in a dedicated process pool (see authapp.hashing).
+# Requests beyond WORKERS + QUEUE_DEPTH in flight get a 503 with Retry-After.
+# Stored hashes with a different cost are upgraded on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASHER_WORKERS = int(os.environ.get('PASSWORD_HASHER_WORKERS', '2'))
+PASSWORD_HASHER_QUEUE_DEPTH = int(os.environ.get('PASSWORD_HASHER_QUEUE_DEPTH', '32'))
+PASSWORD_HASHER_RETRY_AFTER = int(os.environ.get('PASSWORD_HASHER_RETRY_AFTER', '1'))
+
+# Login attempts are rate limited per client IP and per account before any
+# lookup or bcrypt work, using token buckets in a memory-mapped file that all
+# workers on the host share (authapp.throttle). A rate of 0 disables that limit.
+# Behind a reverse proxy set IP_HEADER, e.g. HTTP_X_FORWARDED_FOR.
+LOGIN_THROTTLE_IP_PER_MINUTE = float(os.environ.get('LOGIN_THROTTLE_IP_PER_MINUTE', '60'))
+LOGIN_THROTTLE_IP_BURST = int(os.environ.get('LOGIN_THROTTLE_IP_BURST', '30'))
+LOGIN_THROTTLE_ACCOUNT_PER_MINUTE = float(os.environ.get('LOGIN_THROTTLE_ACCOUNT_PER_MINUTE', '5'))
+LOGIN_THROTTLE_ACCOUNT_BURST = int(os.environ.get('LOGIN_THROTTLE_ACCOUNT_BURST', '10'))
+LOGIN_THROTTLE_IP_HEADER = os.environ.get('LOGIN_THROTTLE_IP_HEADER', '')
+LOGIN_THROTTLE_SLOTS = int(os.environ.get('LOGIN_THROTTLE_SLOTS', '65536'))
+# Tables live in DIR (default /dev/shm); give each deployment on a host its own NAME
+LOGIN_THROTTLE_DIR = os.environ.get('LOGIN_THROTTLE_DIR', '')
+LOGIN_THROTTLE_NAME = os.environ.get('LOGIN_THROTTLE_NAME', 'healthclaim-login')
+
+# Logins record last_login in memory and a background thread writes them in
+# bulk at least every LAST_LOGIN_FLUSH_SECONDS (the staleness bound), or as soon
+# as MAX_PENDING users are waiting. 0 writes each login synchronously.
+LAST_LOGIN_FLUSH_SECONDS = float(os.environ.get('LAST_LOGIN_FLUSH_SECONDS', '5'))
+LAST_LOGIN_MAX_PENDING = int(os.environ.get('LAST_LOGIN_MAX_PENDING', '1000'))
+
+# PHI reads and auth events are queued in memory and written by a background
+# thread in batches of BATCH_SIZE at least every FLUSH_SECONDS (0 writes each
+# event synchronously, except from async views); see authapp.audit. STORE is mongo (the audit_event
+# collection) or file (NDJSON segments in DIR); failed mongo batches go to DIR.
+# With MAX_QUEUE events waiting a request blocks up to BLOCK_SECONDS, then drops its
+# event; async views drop it straight away rather than block the event loop.
+AUDIT_STORE = os.environ.get('AUDIT_STORE', 'mongo')
+AUDIT_DIR = os.environ.get('AUDIT_DIR', str(BASE_DIR / 'audit'))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '1'))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+AUDIT_MAX_QUEUE = int(os.environ.get('AUDIT_MAX_QUEUE', '100000'))
+AUDIT_BLOCK_SECONDS = float(os.environ.get('AUDIT_BLOCK_SECONDS', '0.5'))
+# A TTL index on ts deletes events this many days old (0: never). HIPAA asks for
+# six years of audit records, and the trail grows by every PHI read, so it is not kept forever
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', '2190'))
+
+# Per-view request phase histograms (backend.metrics), served at /api/metrics.
+# Fraction of requests timed; 0 turns the instrumentation off.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1'))
+
+# Claim listings use keyset pagination; ?limit= is clamped to the max
+CLAIMS_PAGE_SIZE = int(os.environ.get('CLAIMS_PAGE_SIZE', '25'))
+CLAIMS_MAX_PAGE_SIZE = int(os.environ.get('CLAIMS_MAX_PAGE_SIZE', '100'))
+
+# Payor review queue (claimsapp.review_queue)
+REVIEW_SLA_HOURS = int(os.environ.get('REVIEW_SLA_HOURS', '72'))
+REVIEW_LEASE_SECONDS = int(os.environ.get('REVIEW_LEASE_SECONDS', '900'))
+
+# Coverage summaries (claimsapp.coverage) are cached per process; an accumulator
+# change clears the entry locally, other workers catch up within the TTL
+COVERAGE_CACHE_SIZE = int(os.environ.get('COVERAGE_CACHE_SIZE', '10000'))
+COVERAGE_CACHE_TTL = int(os.environ.get('COVERAGE_CACHE_TTL', '60'))
+
+# Claim adjudication rules (claimsapp.adjudication): a JSON list of rules,
+# compiled once per process; empty uses the built-in DEFAULT_RULES
+ADJUDICATION_RULES_FILE = os.environ.get('ADJUDICATION_RULES_FILE', '')
+
+# Bulk claim uploads (claimsapp.ingest): spooled to disk past SPOOL_MEMORY_BYTES,
+# ingested by WORKERS background threads per process (0 = inside the request)
+# in unordered insert_many chunks of CHUNK_SIZE rows
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', '2'))
+INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', '1000'))
+INGEST_MAX_BYTES = int(os.environ.get('INGEST_MAX_BYTES', str(256 * 1024 * 1024)))
+INGEST_SPOOL_MEMORY_BYTES = int(os.environ.get('INGEST_SPOOL_MEMORY_BYTES', str(1024 * 1024)))
+INGEST_MAX_ERRORS = int(os.environ.get('INGEST_MAX_ERRORS', '1000'))
+
+# Streaming CSV/NDJSON exports (claimsapp.export): rows are fetched BATCH_SIZE
+# per cursor round trip and encoded CHUNK_ROWS at a time, so memory stays flat
+# however many rows are exported; ?gzip=1 compresses at GZIP_LEVEL (1-9)
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '2000'))
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', '1000'))
+EXPORT_GZIP_LEVEL = int(os.environ.get('EXPORT_GZIP_LEVEL', '6'))
+
+# Batch fraud scoring (claimsapp.fraud, `manage.py score_fraud`)
+FRAUD_SCORE_THRESHOLD = float(os.environ.get('FRAUD_SCORE_THRESHOLD', '0.5'))
+FRAUD_Z_THRESHOLD = float(os.environ.get('FRAUD_Z_THRESHOLD', '3'))
+FRAUD_VELOCITY_WINDOW_DAYS = int(os.environ.get('FRAUD_VELOCITY_WINDOW_DAYS', '30'))
+FRAUD_VELOCITY_LIMIT = int(os.environ.get('FRAUD_VELOCITY_LIMIT', '8'))
+FRAUD_RARE_PAIR_FREQUENCY = float(os.environ.get('FRAUD_RARE_PAIR_FREQUENCY', '0.005'))
+# Groups with fewer claims than this are not used as a baseline
+FRAUD_MIN_SUPPORT = int(os.environ.get('FRAUD_MIN_SUPPORT', '30'))
+# Incremental runs skip claims whose client-generated _id is younger than this,
+# so inserts still in flight are not passed by the watermark
+FRAUD_WATERMARK_LAG_SECONDS = int(os.environ.get('FRAUD_WATERMARK_LAG_SECONDS', '300'))
+
+# Notification push (notificationsapp.broker); one watcher query per process per interval
+NOTIFICATIONS_POLL_SECONDS = float(os.environ.get('NOTIFICATIONS_POLL_SECONDS', '1'))
+NOTIFICATIONS_KEEPALIVE_SECONDS = float(os.environ.get('NOTIFICATIONS_KEEPALIVE_SECONDS', '15'))
+NOTIFICATIONS_LONG_POLL_SECONDS = float(os.environ.get('NOTIFICATIONS_LONG_POLL_SECONDS', '25'))
+
+# In-memory user search (authapp.search): built per process in the background on
+# the first request (WARM) or else on the first search, then kept current from
+# local saves and by polling for other processes' writes every REFRESH_SECONDS
+# from a background thread (0: no polling)
+USER_SEARCH_WARM = os.environ.get('USER_SEARCH_WARM', '1') == '1'
+USER_SEARCH_REFRESH_SECONDS = float(os.environ.get('USER_SEARCH_REFRESH_SECONDS', '5'))
+USER_SEARCH_DELTA_MAX = int(os.environ.get('USER_SEARCH_DELTA_MAX', '50000'))
+USER_SEARCH_MAX_RESULTS = int(os.environ.get('USER_SEARCH_MAX_RESULTS', '50'))
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
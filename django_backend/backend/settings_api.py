@@ -0,0 +1,35 @@
+# API-only deployment profile: DJANGO_SETTINGS_MODULE=backend.settings_api
+#
+# Everything the JSON API needs and nothing else. Auth lives in Mongo, so the
+# admin, sessions, messages, staticfiles, the Django user model and the SQLite
+# database are dropped. The MongoDB client is built on the first request
+# rather than at startup. `python -m benchmarks.startup` compares import time
+# and RSS with backend.settings.
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'corsheaders',
+    'authapp',
+    'claimsapp',
+    'notificationsapp',
+]
+
+MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+DATABASES = {}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    'DEFAULT_RENDERER_CLASSES': ('backend.renderers.FastJSONRenderer',),
+    # without django.contrib.auth, anonymous requests get request.user = None
+    'UNAUTHENTICATED_USER': None,
+}
+
+MONGODB_CONNECT_ON_READY = False
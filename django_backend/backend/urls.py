@@ -1,14 +1,35 @@
 from django.urls import path, include
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 
 def health(request):
+    from authapp.audit import audit_trail
+    from authapp.last_login import last_login_buffer
+    from authapp.principal_cache import principal_cache
+    from authapp.search import user_search
+    from claimsapp.coverage import coverage_service
+    from .mongo import mongo_health
+    mongo = mongo_health()
     return JsonResponse({
-        'success': True,
-        'message': 'HealthClaim Portal Backend API is running',
-        'environment': 'development'
-    })
+        'success': mongo['ok'],
+        'message': 'HealthClaim Portal Backend API is running' if mongo['ok'] else 'MongoDB is unreachable',
+        'environment': 'development',
+        'mongo': mongo,
+        'auth_cache': principal_cache.stats(),
+        'last_login_buffer': last_login_buffer.stats(),
+        'audit': audit_trail.stats(),
+        'coverage_cache': coverage_service.cache.stats(),
+        'user_search': user_search.stats(),
+    }, status=200 if mongo['ok'] else 503)
+
+def metrics(request):
+    from .metrics import registry
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 urlpatterns = [
     path('api/health', health),
+    path('api/metrics', metrics),
     path('api/auth/', include('authapp.urls')),
+    path('api/async/auth/', include('authapp.async_urls')),
+    path('api/', include('claimsapp.urls')),
+    path('api/notifications/', include('notificationsapp.urls')),
 ]
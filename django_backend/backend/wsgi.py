@@ -1,10 +1,8 @@
 import os
 from django.core.wsgi import get_wsgi_application
-from .mongo import connect_mongo
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-# Connect to MongoDB when starting
-connect_mongo()
-
+# MongoDB is registered lazily by AuthappConfig.ready(); no connection is
+# opened here so the app can be safely preloaded before workers fork.
 application = get_wsgi_application()
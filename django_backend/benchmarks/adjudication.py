@@ -0,0 +1,118 @@
+"""Adjudication rule evaluation throughput, without the database.
+
+Builds synthetic claim documents and a rule set of DEFAULT_RULES plus per-code
+amount limits and specialty/service rules. It then times three evaluators on
+one core:
+
+* ``naive``: every rule is checked against every claim, one by one;
+* ``single``: RuleIndex.decide, the compiled per-claim path used by the API;
+* ``batch``: RuleIndex.decide_batch over columns, as the batch job runs it.
+
+It also checks that all three reach the same decisions.
+
+    python -m benchmarks.adjudication [--claims 100000] [--codes 400] [--output adjudication.json]
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from .common import add_output_argument, setup_django, write_results
+
+
+def synthetic(claims, codes, specialties, seed=7):
+    from bson import ObjectId
+    rng = random.Random(seed)
+    code_list = [f'{99000 + i}' for i in range(codes)]
+    specialty_list = [f'Specialty {i}' for i in range(specialties)]
+    rules = []
+    for i, code in enumerate(code_list[::4]):
+        rules.append({'id': f'limit-{code}', 'kind': 'amount_limit', 'service_code': code, 'max_cents': 200_000 + i * 1000, 'outcome': 'review'})
+    for specialty in specialty_list:
+        allowed = rng.sample(code_list, len(code_list) // 2)
+        rules.append({'id': f'services-{specialty}', 'kind': 'specialty_services', 'specialty': specialty, 'services': allowed, 'outcome': 'review'})
+    docs = [
+        {
+            '_id': ObjectId(), 'service_code': rng.choice(code_list), 'provider_specialty': rng.choice(specialty_list),
+            'amount_cents': int(rng.lognormvariate(10, 1.2)), 'fraud_flag': rng.random() < 0.01,
+            'service_date': datetime(2025, 1, 1),
+        }
+        for _ in range(claims)
+    ]
+    return rules, docs
+
+
+def naive_decide(rules, has_code_limit, claim, covered, duplicate):
+    # the rule-by-rule evaluation the compiled index replaces
+    fired = []
+    for i, rule in enumerate(rules):
+        kind = rule['kind']
+        if kind == 'coverage':
+            hit = not covered
+        elif kind == 'duplicate':
+            hit = duplicate
+        elif kind == 'fraud_flag':
+            hit = bool(claim.get('fraud_flag'))
+        elif kind == 'amount_limit':
+            code = rule.get('service_code')
+            applies = claim.get('service_code') == code if code else claim.get('service_code') not in has_code_limit
+            hit = applies and (claim.get('amount_cents') or 0) > rule['max_cents']
+        else:
+            hit = claim.get('provider_specialty') == rule['specialty'] and claim.get('service_code') not in rule['services']
+        if hit:
+            fired.append(i)
+    return fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--claims', type=int, default=100000)
+    parser.add_argument('--codes', type=int, default=400)
+    parser.add_argument('--specialties', type=int, default=12)
+    parser.add_argument('--naive-claims', type=int, default=5000, help='The naive evaluator is slow; time it on a prefix')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django()
+
+    import numpy as np
+    from claimsapp.adjudication import DEFAULT_RULES, ClaimBatch, RuleIndex
+
+    extra, docs = synthetic(args.claims, args.codes, args.specialties)
+    rules = DEFAULT_RULES + extra
+    index = RuleIndex(rules)
+    rng = np.random.default_rng(7)
+    covered = rng.random(len(docs)) > 0.02
+    duplicate = rng.random(len(docs)) < 0.01
+
+    started = time.perf_counter()
+    batch = ClaimBatch(docs)
+    batch.covered, batch.duplicate = covered, duplicate
+    severity, fired = index.decide_batch(batch)
+    batch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    single = [index.decide(doc, covered[i], duplicate[i]) for i, doc in enumerate(docs)]
+    single_seconds = time.perf_counter() - started
+
+    prefix = docs[:args.naive_claims]
+    has_code_limit = {rule.get('service_code') for rule in rules if rule['kind'] == 'amount_limit'}
+    started = time.perf_counter()
+    naive = [naive_decide(rules, has_code_limit, doc, covered[i], duplicate[i]) for i, doc in enumerate(prefix)]
+    naive_seconds = time.perf_counter() - started
+
+    assert [np.flatnonzero(column).tolist() for column in fired.T] == single, 'batch and single decisions differ'
+    assert naive == single[:len(prefix)], 'naive and compiled decisions differ'
+
+    results = {}
+    print(f'{len(rules)} rules, {len(docs)} claims, {args.codes} service codes')
+    print(f'{"evaluator":>10} {"claims":>9} {"claims/s":>12} {"us/claim":>9}')
+    for name, count, seconds in (('naive', len(prefix), naive_seconds), ('single', len(docs), single_seconds), ('batch', len(docs), batch_seconds)):
+        results[name] = {'n': count, 'ops_per_sec': count / seconds, 'mean_us': seconds / count * 1e6}
+        print(f'{name:>10} {count:>9} {count / seconds:>12,.0f} {seconds / count * 1e6:>9.2f}')
+    outcomes = np.bincount(severity, minlength=4)
+    print('outcomes: ' + ', '.join(f'{name} {count}' for name, count in zip(('approve', 'review', 'pend', 'deny'), outcomes.tolist())))
+    write_results(args.output, 'adjudication', results, claims=len(docs), rules=len(rules), codes=args.codes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Request-path cost of auditing an event, and how fast the batches drain.
+
+Times ``audit_trail.record`` for a ``GET /api/auth/me`` request (the queued
+path, with the writer thread running) against one synchronous ``insert_one``
+per event, which is what auditing would cost without the queue. Then records
+``--events`` events as fast as possible and reports how long the writer takes
+to store them all in batches.
+
+    python -m benchmarks.audit_trail [--events 100000] [--mongomock]
+"""
+import argparse
+import time
+
+from .common import add_output_argument, mongomock_requested, setup_django, summarize, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--mongomock', action='store_true')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django(mongomock=mongomock_requested())
+
+    from bson import ObjectId
+    from django.conf import settings
+    from django.test import RequestFactory
+    from authapp.audit import AuditTrail, MongoAuditStore, document
+    from authapp.models import AuditEvent, User
+
+    collection = AuditEvent._get_collection()
+    user = User(id=ObjectId(), email='audit@bench.example', name='Bench', role='patient', profile={'memberId': 'MEM0'})
+    request = RequestFactory().get('/api/auth/me', REMOTE_ADDR='10.0.0.1')
+    trail = AuditTrail(MongoAuditStore(), None, settings.AUDIT_FLUSH_SECONDS or 1, settings.AUDIT_BATCH_SIZE, 10 ** 7, 1)
+
+    def timed(fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    def sync_insert():
+        event = (ObjectId(), time.time(), 'user.read', 'success', user.id, user.role, user.id, '10.0.0.1', 'GET', '/api/auth/me', None)
+        collection.insert_one(document(event))
+
+    results = {
+        'queued record': summarize(timed(lambda: trail.record('user.read', request, user=user, subject_id=user.id), args.repeat)),
+        'sync insert_one': summarize(timed(sync_insert, args.repeat)),
+    }
+    print(f'{"path":>16} {"p50 us":>9} {"p99 us":>9}')
+    for name, row in results.items():
+        print(f'{name:>16} {row["p50_us"]:>9.1f} {row["p99_us"]:>9.1f}')
+
+    trail.flush()
+    written = trail.written
+    started = time.perf_counter()
+    for _ in range(args.events):
+        trail.record('user.read', request, user=user, subject_id=user.id)
+    recorded = time.perf_counter() - started
+    while trail.written - written < args.events and not trail.failures:
+        time.sleep(0.01)
+    drained = time.perf_counter() - started
+    results['drain'] = {'events': args.events, 'record_seconds': recorded, 'drain_seconds': drained, 'events_per_sec': args.events / drained}
+    print(f'{args.events} events recorded in {recorded:.2f}s and stored in {drained:.2f}s '
+          f'({args.events / drained:,.0f} events/s, {trail.flushes} batches)')
+    collection.delete_many({'actor_id': user.id})
+    write_results(args.output, 'audit_trail', results)
+
+
+if __name__ == '__main__':
+    main()
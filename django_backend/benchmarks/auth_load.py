@@ -0,0 +1,175 @@
+"""Closed-loop load generator for the auth endpoints.
+
+Creates ``--users`` throwaway patients, then for every endpoint and every
+concurrency level runs that many client threads back to back for
+``--duration`` seconds and reports latency percentiles and throughput.
+Requests go to a running server at ``--url``, or, without it, through
+Django's test client in this process (use --mongomock to skip Mongo too).
+Login cost is dominated by bcrypt, so compare runs at the same BCRYPT_ROUNDS.
+
+    python -m benchmarks.auth_load --url http://127.0.0.1:8000 --concurrency 1,8,32 --output load.json
+    python -m benchmarks.auth_load --mongomock --duration 2
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .common import add_output_argument, mongomock_requested, setup_django, summarize, write_results
+
+PASSWORD = 'benchpass1'
+
+
+def login_request(user, i):
+    return 'POST', '/api/auth/login', {'email': user['email'], 'password': PASSWORD, 'role': 'patient'}, None
+
+
+def me_request(user, i):
+    return 'GET', '/api/auth/me', None, user['token']
+
+
+def profile_request(user, i):
+    return 'PUT', '/api/auth/profile', {'profile': {'benchCounter': i}}, user['token']
+
+
+ENDPOINTS = {'login': login_request, 'me': me_request, 'profile': profile_request}
+
+
+class HttpSession:
+    """One keep-alive connection per client thread, reopened if the server drops it."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.conn = None
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = json.dumps(body) if body is not None else None
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = self.connection_class(self.netloc, timeout=30)
+            try:
+                self.conn.request(method, self.prefix + path, payload, headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+class InProcessSession:
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def request(self, method, path, body=None, token=None):
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        data = json.dumps(body) if body is not None else ''
+        return self.client.generic(method, path, data, content_type='application/json', **extra).status_code
+
+
+def run_level(make_session, build_request, users, concurrency, duration):
+    deadline = time.perf_counter() + duration
+    outcomes = []
+
+    def client(offset):
+        session = make_session()
+        latencies, errors, i = [], 0, offset
+        while time.perf_counter() < deadline:
+            user = users[i % len(users)]
+            method, path, body, token = build_request(user, i)
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                status = session.request(method, path, body, token)
+            except Exception:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                errors += 1
+        outcomes.append((latencies, errors))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [sample for samples, _ in outcomes for sample in samples]
+    stats = summarize(latencies) if latencies else {'n': 0}
+    stats['throughput_rps'] = len(latencies) / elapsed
+    stats['errors'] = sum(errors for _, errors in outcomes)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server; omit to call the app in-process')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--mongomock', action='store_true')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django(mongomock=mongomock_requested())
+
+    from bson import ObjectId
+    from django.conf import settings
+    from authapp.authentication import generate_token_for_user
+    from authapp.hashing import bcrypt_hash
+    from authapp.models import User
+
+    endpoints = args.endpoints.split(',')
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f'unknown endpoints: {", ".join(sorted(unknown))}')
+
+    run = ObjectId()
+    hashed = bcrypt_hash(PASSWORD, settings.BCRYPT_ROUNDS)
+    docs = [User(
+        email=f'load-{run}-{i}@bench.example', name=f'Load Patient {i}', role='patient', password=hashed,
+        profile={'firstName': 'Load', 'lastName': f'Patient{i}', 'dateOfBirth': '1980-01-01', 'memberId': f'LOAD{i:06d}'},
+    ) for i in range(args.users)]
+    User._get_collection().insert_many([doc.to_mongo() for doc in docs], ordered=False)
+    users = [
+        {'email': user.email, 'token': generate_token_for_user(user)}
+        for user in User.objects(email__startswith=f'load-{run}-')
+    ]
+
+    make_session = (lambda: HttpSession(args.url)) if args.url else InProcessSession
+    results = {}
+    print(f'{"endpoint":>9} {"conc":>5} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    try:
+        for endpoint in endpoints:
+            for concurrency in [int(c) for c in args.concurrency.split(',')]:
+                stats = results[f'{endpoint}@{concurrency}'] = run_level(
+                    make_session, ENDPOINTS[endpoint], users, concurrency, args.duration,
+                )
+                if not stats['n']:
+                    print(f'{endpoint:>9} {concurrency:>5} {"no requests completed":>35}')
+                    continue
+                print(f'{endpoint:>9} {concurrency:>5} {stats["throughput_rps"]:>9.1f} {stats["p50_us"] / 1000:>8.2f} '
+                      f'{stats["p95_us"] / 1000:>8.2f} {stats["p99_us"] / 1000:>8.2f} {stats["errors"]:>7}')
+    finally:
+        User.objects(email__startswith=f'load-{run}-').delete()
+    write_results(
+        args.output, 'auth_load', results,
+        url=args.url, duration=args.duration, users=args.users, bcrypt_rounds=settings.BCRYPT_ROUNDS,
+    )
+
+
+if __name__ == '__main__':
+    main()
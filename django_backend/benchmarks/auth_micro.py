@@ -0,0 +1,77 @@
+"""Microbenchmarks for the auth hot path.
+
+Times token generation, MongoJWTAuthentication.authenticate (principal cache
+hit and miss), User.to_safe_object and RegisterSerializer validation, each in
+isolation. The cache-miss case includes the user lookup, so it needs Mongo
+(or --mongomock).
+
+    python -m benchmarks.auth_micro [--repeat 2000] [--mongomock] [--output micro.json]
+"""
+import argparse
+
+from .common import add_output_argument, mongomock_requested, setup_django, summarize, timeit, write_results
+
+REGISTRATION = {
+    'email': 'bench.register@bench.example',
+    'password': 'benchpass1',
+    'name': 'Bench Provider',
+    'role': 'provider',
+    'profile': {
+        'firstName': 'Bench', 'lastName': 'Provider', 'specialty': 'Cardiology',
+        'licenseNumber': 'LIC-000001', 'npiNumber': '1234567890',
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--mongomock', action='store_true')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django(mongomock=mongomock_requested())
+
+    from bson import ObjectId
+    from django.test import RequestFactory
+    from authapp.authentication import MongoJWTAuthentication, generate_token_for_user
+    from authapp.models import User
+    from authapp.principal_cache import principal_cache
+    from authapp.serializers import RegisterSerializer
+
+    user = User(
+        email=f'bench-{ObjectId()}@bench.example', name='Bench Patient', role='patient', password='x',
+        profile={'firstName': 'Bench', 'lastName': 'Patient', 'dateOfBirth': '1980-01-01', 'memberId': 'BENCH1'},
+    )
+    user.save()
+    token = generate_token_for_user(user)
+    request = RequestFactory().get('/api/auth/me', HTTP_AUTHORIZATION=f'Bearer {token}')
+    authenticator = MongoJWTAuthentication()
+    validated = dict(REGISTRATION)
+
+    def authenticate_miss():
+        principal_cache.invalidate_user(user.id)
+        authenticator.authenticate(request)
+
+    cases = [
+        ('generate_token_for_user', lambda: generate_token_for_user(user)),
+        ('authenticate_cache_hit', lambda: authenticator.authenticate(request)),
+        ('authenticate_cache_miss', authenticate_miss),
+        ('to_safe_object', user.to_safe_object),
+        ('register_validate', lambda: RegisterSerializer().validate(validated)),
+        ('register_is_valid', lambda: RegisterSerializer(data=REGISTRATION).is_valid()),
+    ]
+
+    results = {}
+    print(f'{"case":>26} {"ops/s":>10} {"p50 us":>9} {"p95 us":>9} {"p99 us":>9}')
+    try:
+        authenticator.authenticate(request)  # prime the cache for the hit case
+        for name, fn in cases:
+            stats = results[name] = summarize(timeit(fn, repeat=args.repeat, warmup=min(100, args.repeat)))
+            print(f'{name:>26} {stats["ops_per_sec"]:>10.0f} {stats["p50_us"]:>9.2f} {stats["p95_us"]:>9.2f} {stats["p99_us"]:>9.2f}')
+    finally:
+        user.delete()
+    write_results(args.output, 'auth_micro', results, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Export throughput and peak memory as the number of rows grows.
+
+Streams synthetic claim documents through claimsapp.export (CSV, NDJSON and
+gzipped CSV), discarding the chunks, and compares with building the whole
+body at once as a list endpoint does (``list`` rows: encode all rows, then
+``dumps``). Rows come from a generator standing in for the cursor, so this
+measures the export pipeline itself; with a real cursor the driver adds one
+EXPORT_BATCH_SIZE batch. Peak memory is traced (tracemalloc) in a separate
+pass from the timed one.
+
+The ASGI modes consume the CSV export on an event loop: ``csv.asgi`` through
+the Export's async iterator, as the views do under ASGI, and ``csv.asgi-list``
+the way StreamingHttpResponse serves a plain iterator there
+(``sync_to_async(list)``, the whole body before the first byte).
+
+    python -m benchmarks.claim_export [--sizes 1000,10000,100000,1000000] [--list-max 1000000]
+"""
+import argparse
+import asyncio
+import copy
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from .common import add_output_argument, setup_django, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--list-max', type=int, default=1000000, help='Largest size to also build in memory')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django()
+
+    from asgiref.sync import sync_to_async
+    from bson import ObjectId
+    from backend.renderers import dumps
+    from claimsapp.export import CLAIMS, Export
+
+    def generated(count):
+        """CLAIMS with a generator in place of the cursor; generators have the close() Export calls."""
+        def cursor(query, sort, batch_size):
+            start, patient, provider = datetime(2024, 1, 1), ObjectId(), ObjectId()
+            return ({
+                'claim_number': f'EXP-{i:08d}', 'status': 'approved', 'service_date': start + timedelta(hours=i % 10000),
+                'submitted_at': start, 'updated_at': start, 'patient_id': patient, 'patient_name': 'Jane Doe',
+                'provider_id': provider, 'provider_name': 'Dr. Sarah Wilson', 'provider_specialty': 'Internal Medicine',
+                'service': 'Office Visit', 'service_code': '99213', 'description': 'Follow-up visit',
+                'amount_cents': 10000 + i % 5000, 'fraud_flag': False, 'fraud_score': 0.12,
+            } for i in range(count))
+        dataset = copy.copy(CLAIMS)
+        dataset.cursor = cursor
+        return dataset
+
+    def stream(size, fmt, compress):
+        sent = 0
+        for chunk in Export(generated(size), {}, None, fmt, compress=compress):
+            sent += len(chunk)
+        return sent
+
+    def stream_async(size):
+        async def consume():
+            sent = 0
+            async for chunk in aiter(Export(generated(size), {}, None, 'csv')):
+                sent += len(chunk)
+            return sent
+        return asyncio.run(consume())
+
+    def stream_async_list(size):
+        async def consume():
+            return sum(map(len, await sync_to_async(list)(Export(generated(size), {}, None, 'csv'))))
+        return asyncio.run(consume())
+
+    def build_list(size):
+        return len(dumps(CLAIMS.encode(list(generated(size).cursor({}, None, None)))))
+
+    def measure(fn):
+        started = time.perf_counter()
+        sent = fn()
+        seconds = time.perf_counter() - started
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {'seconds': seconds, 'bytes': sent, 'peak_bytes': peak}
+
+    results = {}
+    print(f'{"rows":>9} {"mode":>13} {"rows/s":>10} {"MB out":>8} {"peak MB":>8}')
+    for size in [int(s) for s in args.sizes.split(',')]:
+        modes = {
+            'csv': lambda: stream(size, 'csv', False),
+            'ndjson': lambda: stream(size, 'ndjson', False),
+            'csv.gz': lambda: stream(size, 'csv', True),
+            'csv.asgi': lambda: stream_async(size),
+        }
+        if size <= args.list_max:
+            modes['csv.asgi-list'] = lambda: stream_async_list(size)
+            modes['list'] = lambda: build_list(size)
+        for mode, fn in modes.items():
+            row = results[f'{mode}@{size}'] = measure(fn)
+            row['rows_per_sec'] = size / row['seconds']
+            print(f'{size:>9} {mode:>13} {row["rows_per_sec"]:>10,.0f} {row["bytes"] / 2 ** 20:>8.1f} {row["peak_bytes"] / 2 ** 20:>8.2f}')
+    write_results(args.output, 'claim_export', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Bulk claim ingestion throughput and memory.
+
+Generates an NDJSON file of synthetic claims for one provider and ingests it
+two ways:
+
+* ``per_row``: one Claim.save() per row, which is what one-request-per-claim
+  costs before any HTTP overhead;
+* ``pipeline``: claimsapp.ingest.Ingestor, streaming the file through
+  parse -> validate -> chunked unordered insert_many.
+
+It reports rows/s for each, and for the pipeline also the peak Python memory
+(tracemalloc), which should track the chunk size rather than the file size.
+Run it against a real mongod: mongomock checks unique indexes by scanning
+the collection on every insert, so its insert_many numbers measure that scan.
+
+    python -m benchmarks.claim_ingest [--rows 20000] [--chunk-size 1000] [--mongomock]
+"""
+import argparse
+import io
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from .common import add_output_argument, mongomock_requested, setup_django, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--per-row', type=int, default=2000, help='Rows for the (slow) per-row baseline')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--mongomock', action='store_true')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django(mongomock=mongomock_requested())
+
+    from bson import ObjectId
+    from authapp.models import User
+    from claimsapp.ingest import Ingestor
+    from claimsapp.models import Claim, IngestJob
+    from claimsapp.rollups import ROLLUP_FIELDS, claim_rollups
+
+    run = ObjectId()
+    patient = User(email=f'bench-{run}@bench.example', name='Bench Patient', role='patient', profile={'memberId': f'BENCH{run}'}, password='x')
+    patient.save()
+    provider = (ObjectId(), 'Bench Clinic', 'Cardiology')
+    start = datetime(2024, 1, 1)
+
+    def row(i, prefix):
+        return {
+            'claim_number': f'{prefix}-{run}-{i}', 'member_id': f'BENCH{run}', 'service': 'Office Visit',
+            'service_code': '99213', 'amount': f'{100 + i % 400}.00', 'service_date': (start + timedelta(hours=i)).strftime('%Y-%m-%d'),
+        }
+
+    results = {}
+    started = time.perf_counter()
+    for i in range(args.per_row):
+        r = row(i, 'ROW')
+        Claim(
+            claim_number=r['claim_number'], patient_id=patient.id, provider_id=provider[0], patient_name=patient.name,
+            provider_name=provider[1], provider_specialty=provider[2], service=r['service'], service_code=r['service_code'],
+            amount_cents=int(float(r['amount']) * 100), service_date=datetime.strptime(r['service_date'], '%Y-%m-%d'),
+        ).save()
+    seconds = time.perf_counter() - started
+    results['per_row'] = {'n': args.per_row, 'ops_per_sec': args.per_row / seconds}
+
+    body = ''.join(json.dumps(row(i, 'BULK')) + '\n' for i in range(args.rows)).encode()
+    job = IngestJob(provider_id=provider[0], format='ndjson', bytes=len(body))
+    job.save()
+    tracemalloc.start()
+    started = time.perf_counter()
+    Ingestor(chunk_size=args.chunk_size).run(job.id, io.BytesIO(body), 'ndjson', provider)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    job.reload()
+    results['pipeline'] = {'n': job.inserted, 'ops_per_sec': job.inserted / seconds, 'peak_mb': round(peak / 2 ** 20, 2)}
+
+    print(f'{"path":>9} {"rows":>8} {"rows/s":>10} {"peak MB":>8}')
+    for name, stats in results.items():
+        print(f'{name:>9} {stats["n"]:>8} {stats["ops_per_sec"]:>10,.0f} {stats.get("peak_mb", ""):>8}')
+    print(f'file {len(body) / 2 ** 20:.1f} MB, {job.failed} failed rows')
+
+    # the pipeline counted its claims in the dashboard rollups; take them out again
+    claim_rollups.removed(Claim._get_collection().find({'patient_id': patient.id, 'provider_id': provider[0]}, ROLLUP_FIELDS))
+    Claim.objects(patient_id=patient.id).delete()
+    IngestJob.objects(id=job.id).delete()
+    patient.delete()
+    write_results(args.output, 'claim_ingest', results, rows=args.rows, chunk_size=args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
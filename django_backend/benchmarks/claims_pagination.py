@@ -0,0 +1,78 @@
+"""Claim listing latency as a member's history grows.
+
+Creates one patient per history size, inserts that many claims, then times the
+first page and a page from the middle of the history through the
+PatientClaimsView. With keyset pagination both should stay flat.
+
+    python -m benchmarks.claims_pagination [--sizes 10,100,1000,10000] [--mongomock]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from .common import add_output_argument, mongomock_requested, setup_django, summarize, timeit, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--mongomock', action='store_true')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django(mongomock=mongomock_requested())
+
+    from bson import ObjectId
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from authapp.authentication import AuthUserWrapper
+    from authapp.models import User
+    from claimsapp.models import Claim
+    from claimsapp.views import PatientClaimsView
+
+    Claim.ensure_indexes()
+    factory = APIRequestFactory()
+    view = PatientClaimsView.as_view()
+    provider_id = ObjectId()
+    run = ObjectId()
+
+    results = {}
+    print(f'{"claims":>8} {"page":>7} {"p50 us":>10} {"p95 us":>10} {"p99 us":>10}')
+    for size in [int(s) for s in args.sizes.split(',')]:
+        patient = User(email=f'bench-{run}-{size}@bench.example', name='Bench Patient', role='patient', profile={'memberId': f'BENCH{size}'}, password='x')
+        patient.save()
+        start = datetime(2020, 1, 1)
+        docs = [
+            Claim(
+                claim_number=f'BENCH-{run}-{size}-{i}', patient_id=patient.id, provider_id=provider_id,
+                patient_name=patient.name, provider_name='Bench Clinic', service='Office Visit',
+                amount_cents=12500, status='processing', service_date=start + timedelta(hours=i),
+            ).to_mongo()
+            for i in range(size)
+        ]
+        for i in range(0, len(docs), 5000):
+            Claim._get_collection().insert_many(docs[i:i + 5000], ordered=False)
+
+        def fetch(cursor=None):
+            params = {'cursor': cursor} if cursor else {}
+            request = factory.get('/api/patient/claims/', params)
+            force_authenticate(request, user=AuthUserWrapper(patient))
+            return view(request)
+
+        # walk to the middle of the history once to get a deep cursor
+        cursor, pages = None, 0
+        while pages < size // 50:
+            cursor = fetch(cursor).get('X-Next-Cursor')
+            pages += 1
+            if not cursor:
+                break
+
+        for label, cursor_value in (('first', None), ('deep', cursor)):
+            stats = results[f'{label}@{size}'] = summarize(timeit(lambda: fetch(cursor_value), repeat=args.repeat))
+            print(f'{size:>8} {label:>7} {stats["p50_us"]:>10.0f} {stats["p95_us"]:>10.0f} {stats["p99_us"]:>10.0f}')
+
+        Claim.objects(patient_id=patient.id).delete()
+        patient.delete()
+    write_results(args.output, 'claims_pagination', results, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# Shared setup for the scripts in this directory. Run them from django_backend/,
+# e.g. `python -m benchmarks.claims_pagination`. They use MONGODB_URI like the
+# app does; pass --mongomock to run against an in-process stand-in instead
+# (numbers are then only useful for relative comparisons). With --output they
+# also write their results as JSON, which benchmarks.compare diffs across commits.
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+def setup_django(mongomock=False):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    if mongomock:
+        import mongoengine
+        import mongomock as _mongomock
+        import backend.mongo
+
+        def connect_mock():
+            if not mongoengine.connection._connections:
+                mongoengine.connect('patientdb', host='mongodb://localhost', mongo_client_class=_mongomock.MongoClient)
+
+        backend.mongo.connect_mongo = connect_mock
+    import django
+    django.setup()
+    from backend.mongo import connect_mongo
+    connect_mongo()
+
+
+def mongomock_requested():
+    return '--mongomock' in sys.argv
+
+
+def timeit(fn, repeat=50, warmup=5):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    mean = statistics.fmean(samples)
+    return {
+        'n': len(samples),
+        'ops_per_sec': 1 / mean if mean else None,
+        'mean_us': mean * 1e6,
+        'p50_us': percentile(samples, 50) * 1e6,
+        'p95_us': percentile(samples, 95) * 1e6,
+        'p99_us': percentile(samples, 99) * 1e6,
+    }
+
+
+def add_output_argument(parser):
+    parser.add_argument('--output', help='also write the results as JSON to this path')
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'mongomock': mongomock_requested(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+    }
+
+
+def write_results(path, benchmark, results, **params):
+    """Save ``{case: summarize(...)}`` plus run metadata for benchmarks.compare."""
+    if not path:
+        return
+    with open(path, 'w') as f:
+        json.dump({
+            'benchmark': benchmark,
+            'environment': environment(),
+            'params': params,
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+    print(f'Results written to {path}')
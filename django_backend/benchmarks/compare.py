@@ -0,0 +1,65 @@
+"""Compare two benchmark result files written with --output.
+
+Prints the change in each latency percentile (and throughput, for load runs)
+for every case present in both files, and exits with status 1 if any latency
+grew, or throughput fell, by more than --tolerance.
+
+    python -m benchmarks.compare baseline.json candidate.json [--tolerance 0.10]
+"""
+import argparse
+import json
+import sys
+
+LATENCIES = ('p50_us', 'p95_us', 'p99_us')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, candidate, tolerance):
+    rows, regressions = [], []
+    for case in sorted(set(baseline['results']) & set(candidate['results'])):
+        before, after = baseline['results'][case], candidate['results'][case]
+        metrics = [(name, before.get(name), after.get(name), False) for name in LATENCIES]
+        if 'throughput_rps' in before:
+            metrics.append(('throughput_rps', before['throughput_rps'], after.get('throughput_rps'), True))
+        for name, old, new, higher_is_better in metrics:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            rows.append((case, name, old, new, change))
+            if worse > tolerance:
+                regressions.append((case, name, change))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed relative slowdown (default 0.10)')
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    if baseline['benchmark'] != candidate['benchmark']:
+        parser.error(f'{args.baseline} is {baseline["benchmark"]} but {args.candidate} is {candidate["benchmark"]}')
+    print(f'{baseline["benchmark"]}: {baseline["environment"].get("commit")} -> {candidate["environment"].get("commit")}')
+
+    rows, regressions = compare(baseline, candidate, args.tolerance)
+    print(f'{"case":>28} {"metric":>15} {"baseline":>12} {"candidate":>12} {"change":>8}')
+    for case, name, old, new, change in rows:
+        print(f'{case:>28} {name:>15} {old:>12.2f} {new:>12.2f} {change:>+8.1%}')
+
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:')
+        for case, name, change in regressions:
+            print(f'  {case} {name} {change:+.1%}')
+        sys.exit(1)
+    print('\nNo regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Dashboard stat latency as a provider's claim volume grows.
+
+Creates one provider per size, inserts that many claims (counting them in the
+rollups as ingestion does), then times the provider's stat cards two ways:
+
+* ``aggregate``: a $group by status over all of the provider's claims, which
+  is what the page would cost without rollups;
+* ``rollup``: ClaimRollups.summary, one _id lookup.
+
+The aggregate grows with the claim count; the rollup read should stay flat.
+
+    python -m benchmarks.dashboard_rollups [--sizes 100,1000,10000,100000] [--mongomock]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from .common import add_output_argument, mongomock_requested, setup_django, summarize, timeit, write_results
+
+STATUSES = ['submitted', 'processing', 'under_review', 'approved', 'denied', 'paid']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--mongomock', action='store_true')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django(mongomock=mongomock_requested())
+
+    from bson import ObjectId
+    from claimsapp.models import Claim
+    from claimsapp.rollups import ROLLUP_FIELDS, claim_rollups
+
+    Claim.ensure_indexes()
+    collection = Claim._get_collection()
+    run = ObjectId()
+
+    def aggregate(provider_id):
+        return list(collection.aggregate([
+            {'$match': {'provider_id': provider_id}},
+            {'$group': {'_id': '$status', 'claims': {'$sum': 1}, 'amount_cents': {'$sum': '$amount_cents'},
+                        'fraud_flagged': {'$sum': {'$cond': ['$fraud_flag', 1, 0]}}}},
+        ]))
+
+    results = {}
+    print(f'{"claims":>8} {"read":>10} {"p50 us":>10} {"p95 us":>10} {"p99 us":>10}')
+    for size in [int(s) for s in args.sizes.split(',')]:
+        provider_id = ObjectId()
+        start = datetime(2024, 1, 1)
+        docs = [
+            {
+                'claim_number': f'DASH-{run}-{size}-{i}', 'patient_id': ObjectId(), 'provider_id': provider_id,
+                'service': 'Office Visit', 'amount_cents': 10000 + i % 500, 'status': STATUSES[i % len(STATUSES)],
+                'service_date': start + timedelta(hours=i), 'submitted_at': start + timedelta(hours=i), 'fraud_flag': i % 97 == 0,
+            }
+            for i in range(size)
+        ]
+        for i in range(0, len(docs), 5000):
+            collection.insert_many(docs[i:i + 5000], ordered=False)
+            claim_rollups.added(docs[i:i + 5000])
+
+        expected = {row['_id']: row['claims'] for row in aggregate(provider_id)}
+        assert claim_rollups.summary('provider', provider_id)['byStatus'] == {
+            status: {'count': n, 'amountCents': sum(d['amount_cents'] for d in docs if d['status'] == status)} for status, n in expected.items()
+        }, 'rollup and aggregate disagree'
+
+        for label, fn in (('aggregate', lambda: aggregate(provider_id)), ('rollup', lambda: claim_rollups.summary('provider', provider_id))):
+            stats = results[f'{label}@{size}'] = summarize(timeit(fn, repeat=args.repeat))
+            print(f'{size:>8} {label:>10} {stats["p50_us"]:>10.0f} {stats["p95_us"]:>10.0f} {stats["p99_us"]:>10.0f}')
+
+        claim_rollups.removed(collection.find({'provider_id': provider_id}, ROLLUP_FIELDS))
+        collection.delete_many({'provider_id': provider_id})
+    write_results(args.output, 'dashboard_rollups', results, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
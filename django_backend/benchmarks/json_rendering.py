@@ -0,0 +1,117 @@
+"""JSON rendering cost for list and auth payloads.
+
+Compares the previous path (a serialize() call per row, isoformat() on every
+datetime, DRF's stdlib JSONRenderer) against the compiled row encoders with
+FastJSONRenderer, for 1-row and 10k-row payloads. No database is needed.
+
+    python -m benchmarks.json_rendering [--rows 1,10000] [--repeat 50]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from .common import add_output_argument, setup_django, summarize, timeit, write_results
+
+
+def legacy_claim(claim, format_amount, progress):
+    status = claim.get('status')
+    return {
+        'id': claim.get('claim_number'),
+        'patient': claim.get('patient_name'),
+        'provider': claim.get('provider_name'),
+        'service': claim.get('service'),
+        'amount': format_amount(claim.get('amount_cents') or 0),
+        'status': status,
+        'date': claim['service_date'].strftime('%Y-%m-%d') if claim.get('service_date') else None,
+        'description': claim.get('description'),
+        'progress': progress.get(status, 0),
+    }
+
+
+def legacy_notification(notification, timesince):
+    created_at = notification.get('created_at')
+    return {
+        'id': str(notification['_id']),
+        'type': notification.get('type'),
+        'title': notification.get('title'),
+        'message': notification.get('message'),
+        'claim': notification.get('claim_number'),
+        'read': notification.get('read', False),
+        'time': f'{timesince(created_at, now=datetime.utcnow()).split(",")[0]} ago' if created_at else None,
+        'createdAt': created_at.isoformat() if created_at else None,
+    }
+
+
+def legacy_user(user):
+    return {
+        'id': str(user.id),
+        'email': user.email,
+        'name': user.name,
+        'role': user.role,
+        'profile': user.profile,
+        'is_active': user.is_active,
+        'last_login': user.last_login.isoformat() if user.last_login else None,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+        'updated_at': user.updated_at.isoformat() if user.updated_at else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1,10000')
+    parser.add_argument('--repeat', type=int, default=50)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django()
+
+    from bson import ObjectId
+    from rest_framework.renderers import JSONRenderer
+    from authapp.models import User
+    from backend.renderers import NATIVE_DATETIMES, FastJSONRenderer
+    from claimsapp.serializers import PROGRESS, ClaimSerializer, format_amount
+    from django.utils.timesince import timesince
+    from notificationsapp.serializers import NotificationSerializer
+
+    stdlib, fast = JSONRenderer(), FastJSONRenderer()
+    now = datetime(2024, 6, 1, 12, 30, 15, 250000)
+    print(f'orjson: {"yes" if NATIVE_DATETIMES else "not installed (fast path falls back to stdlib)"}')
+    print(f'{"payload":>14} {"rows":>6} {"path":>8} {"p50 us":>10} {"p95 us":>10} {"p99 us":>10}')
+
+    results = {}
+
+    def report(payload, rows, cases):
+        for label, fn in cases:
+            stats = results[f'{payload}/{label}@{rows}'] = summarize(timeit(fn, repeat=args.repeat))
+            print(f'{payload:>14} {rows:>6} {label:>8} {stats["p50_us"]:>10.1f} {stats["p95_us"]:>10.1f} {stats["p99_us"]:>10.1f}')
+
+    for count in [int(n) for n in args.rows.split(',')]:
+        claims = [{
+            '_id': ObjectId(), 'claim_number': f'CLM-2024-{i:06d}', 'patient_name': 'Jane Doe',
+            'provider_name': 'Northside Clinic', 'service': 'Office Visit', 'amount_cents': 12550 + i,
+            'status': 'processing', 'service_date': now - timedelta(hours=i), 'description': 'Follow-up visit',
+        } for i in range(count)]
+        report('claims', count, [
+            ('legacy', lambda: stdlib.render([legacy_claim(c, format_amount, PROGRESS) for c in claims])),
+            ('fast', lambda: fast.render(ClaimSerializer.serialize_many(claims))),
+        ])
+
+        notifications = [{
+            '_id': ObjectId(), 'user_id': ObjectId(), 'type': 'claim', 'title': 'Claim updated',
+            'message': 'Your claim moved to processing', 'claim_number': f'CLM-2024-{i:06d}',
+            'read': False, 'created_at': now - timedelta(minutes=i),
+        } for i in range(count)]
+        report('notifications', count, [
+            ('legacy', lambda: stdlib.render([legacy_notification(n, timesince) for n in notifications])),
+            ('fast', lambda: fast.render(NotificationSerializer.serialize_many(notifications))),
+        ])
+
+    user = User(id=ObjectId(), email='bench@bench.example', name='Bench', role='patient',
+                profile={'memberId': 'BENCH1', 'plan': 'Gold'}, last_login=now, created_at=now, updated_at=now)
+    report('auth /me', 1, [
+        ('legacy', lambda: stdlib.render({'success': True, 'user': legacy_user(user)})),
+        ('fast', lambda: fast.render({'success': True, 'user': user.to_safe_object()})),
+    ])
+    write_results(args.output, 'json_rendering', results, repeat=args.repeat, orjson=NATIVE_DATETIMES)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Per-request cost of the middleware stack on API routes.
+
+Runs the same API requests through Django's handler with three stacks: the
+stock Django middleware, the default settings (browser middleware skipping
+/api/, see backend.middleware) and the API-only profile. Both the WSGI (sync)
+and ASGI (async) handler paths are measured. The requests need no database:
+an unauthenticated /api/auth/me (403) and an empty login (400).
+
+    python -m benchmarks.middleware_stack [--repeat 2000] [--output stack.json]
+"""
+import argparse
+import asyncio
+
+from .common import add_output_argument, setup_django, summarize, timeit, write_results
+
+STOCK = [
+    'backend.metrics.MetricsMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django()
+
+    import logging
+    from django.conf import settings
+    from django.core.handlers.base import BaseHandler
+    from django.test import RequestFactory, override_settings
+    from backend import settings_api
+
+    logging.getLogger('django.request').setLevel(logging.ERROR)  # the 4xx responses are expected
+    factory = RequestFactory()
+    requests = {
+        'me': lambda: factory.get('/api/auth/me'),
+        'login': lambda: factory.post('/api/auth/login', '{}', content_type='application/json'),
+    }
+    stacks = {'stock': STOCK, 'lean': settings.MIDDLEWARE, 'api_profile': settings_api.MIDDLEWARE}
+    loop = asyncio.new_event_loop()
+
+    results = {}
+    print(f'{"stack":>12} {"mode":>6} {"request":>8} {"p50 us":>9} {"p95 us":>9} {"p99 us":>9}')
+    for stack, middleware in stacks.items():
+        with override_settings(MIDDLEWARE=middleware):
+            sync_handler, async_handler = BaseHandler(), BaseHandler()
+            sync_handler.load_middleware()
+            async_handler.load_middleware(is_async=True)
+            for name, build in requests.items():
+                cases = [
+                    ('sync', lambda: sync_handler.get_response(build())),
+                    ('async', lambda: loop.run_until_complete(async_handler.get_response_async(build()))),
+                ]
+                for mode, fn in cases:
+                    stats = results[f'{stack}/{mode}/{name}'] = summarize(timeit(fn, repeat=args.repeat, warmup=50))
+                    print(f'{stack:>12} {mode:>6} {name:>8} {stats["p50_us"]:>9.1f} {stats["p95_us"]:>9.1f} {stats["p99_us"]:>9.1f}')
+    loop.close()
+    write_results(args.output, 'middleware_stack', results, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Write size and latency of a one-field profile edit as profiles grow.
+
+Compares the previous update (the merged profile written back whole) with the
+dotted ``$set`` that User.update_fields sends, for profiles of increasing size.
+Sizes are the BSON-encoded update documents sent to Mongo.
+
+    python -m benchmarks.profile_updates [--keys 10,100,1000] [--mongomock]
+"""
+import argparse
+from datetime import datetime
+
+from .common import add_output_argument, mongomock_requested, setup_django, summarize, timeit, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', default='10,100,1000')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--mongomock', action='store_true')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django(mongomock=mongomock_requested())
+
+    import bson
+    from bson import ObjectId
+    from authapp.models import User
+
+    collection = User._get_collection()
+    run = ObjectId()
+    results = {}
+    print(f'{"keys":>6} {"path":>7} {"bytes":>8} {"p50 us":>10} {"p95 us":>10} {"p99 us":>10}')
+    for keys in [int(k) for k in args.keys.split(',')]:
+        profile = {f'field{i}': f'value {i} ' * 4 for i in range(keys)}
+        user = User(email=f'bench-{run}-{keys}@bench.example', name='Bench', role='patient', profile=profile, password='x')
+        user.save()
+        counter = iter(range(10 ** 9))
+
+        def legacy():
+            merged = {**user.profile, 'phone': f'555-{next(counter):07d}'}
+            update = {'$set': {'name': user.name, 'profile': merged, 'updated_at': datetime.utcnow()}}
+            collection.update_one({'_id': user.id}, update)
+            return update
+
+        def dotted():
+            changes = user.profile_changes({'phone': f'555-{next(counter):07d}'})
+            query, update = user.versioned_update(changes, user.version)
+            collection.update_one(query, update)
+            user.apply_update(update)
+            return update
+
+        for label, fn in [('legacy', legacy), ('dotted', dotted)]:
+            size = len(bson.encode(fn()))
+            stats = results[f'{label}@{keys}'] = summarize(timeit(fn, repeat=args.repeat))
+            stats['update_bytes'] = size
+            print(f'{keys:>6} {label:>7} {size:>8} {stats["p50_us"]:>10.1f} {stats["p95_us"]:>10.1f} {stats["p99_us"]:>10.1f}')
+        user.delete()
+    write_results(args.output, 'profile_updates', results, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
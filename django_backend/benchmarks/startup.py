@@ -0,0 +1,101 @@
+"""Cold-start time and memory per settings profile.
+
+Starts a fresh interpreter per run and measures how long it takes to build
+the WSGI application and serve a first request (an unauthenticated
+/api/auth/me, so no database is needed). It also records resident memory and
+the number of loaded modules at each point. --importtime adds the packages
+that cost the most import time in each profile.
+
+    python -m benchmarks.startup [--profiles backend.settings,backend.settings_api] [--runs 5] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from .common import add_output_argument, summarize, write_results
+
+CHILD = r'''
+import json, os, sys, time
+started = time.perf_counter()
+os.environ['DJANGO_SETTINGS_MODULE'] = sys.argv[1]
+os.environ.setdefault('DJANGO_DEBUG', '0')
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+ready = time.perf_counter()
+ready_rss, ready_modules = rss_mb(), len(sys.modules)
+
+from django.test import Client
+Client().get('/api/auth/me')
+served = time.perf_counter()
+print(json.dumps({
+    'startup': ready - started, 'first_request': served - ready,
+    'rss_mb': ready_rss, 'rss_after_request_mb': rss_mb(),
+    'modules': ready_modules, 'modules_after_request': len(sys.modules),
+}))
+'''
+
+
+def run_child(profile, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD, profile]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.getcwd(), check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def import_costs(stderr):
+    # "import time: self [us] | cumulative | imported package"; sum self time per top-level package
+    costs = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        costs[name.strip().split('.')[0]] += int(self_us)
+    return sorted(costs.items(), key=lambda item: -item[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='backend.settings,backend.settings_api')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true')
+    parser.add_argument('--top', type=int, default=12)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    results = {}
+    print(f'{"profile":>22} {"startup ms":>11} {"1st req ms":>11} {"RSS MB":>8} {"RSS req MB":>11} {"modules":>8}')
+    for profile in args.profiles.split(','):
+        runs = [run_child(profile)[0] for _ in range(args.runs)]
+        startup = summarize([run['startup'] for run in runs])
+        startup['rss_mb'] = statistics.median(run['rss_mb'] for run in runs)
+        startup['modules'] = statistics.median(run['modules'] for run in runs)
+        first = summarize([run['first_request'] for run in runs])
+        first['rss_mb'] = statistics.median(run['rss_after_request_mb'] for run in runs)
+        first['modules'] = statistics.median(run['modules_after_request'] for run in runs)
+        results[f'{profile}/startup'], results[f'{profile}/first_request'] = startup, first
+        print(f'{profile:>22} {startup["p50_us"] / 1000:>11.1f} {first["p50_us"] / 1000:>11.1f} '
+              f'{startup["rss_mb"]:>8.1f} {first["rss_mb"]:>11.1f} {startup["modules"]:>8.0f}')
+
+    if args.importtime:
+        for profile in args.profiles.split(','):
+            print(f'\nSlowest packages to import under {profile} (self time, ms):')
+            for name, self_us in import_costs(run_child(profile, importtime=True)[1])[:args.top]:
+                print(f'  {name:<28} {self_us / 1000:>8.1f}')
+
+    write_results(args.output, 'startup', results, runs=args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""User search latency and index size, without the database.
+
+Generates seed_db's synthetic population (90% patients, 9% providers, 1%
+payors), builds authapp.search's index from it as if from a cursor, and times
+ranked, role-filtered queries of several shapes with limit 20. A regex scan
+over the same documents, which is what a ``$regex`` query on the profile
+fields has to do, is timed on a few of them for comparison.
+
+    python -m benchmarks.user_search [--users 1000000] [--repeat 200]
+"""
+import argparse
+import re
+import time
+
+from .common import add_output_argument, setup_django, summarize, timeit, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--scan-repeat', type=int, default=3)
+    add_output_argument(parser)
+    args = parser.parse_args()
+    setup_django()
+
+    from bson import ObjectId
+    from authapp.management.commands.seed_db import synthetic_users
+    from authapp.search import PROFILE_KEYS, UserSearchIndex
+
+    counts = {'patient': args.users * 90 // 100, 'provider': args.users * 9 // 100}
+    counts['payor'] = args.users - counts['patient'] - counts['provider']
+    docs = [dict(doc, _id=ObjectId()) for role, count in counts.items() for doc in synthetic_users(role, count, 42)]
+
+    index = UserSearchIndex(refresh_seconds=0)
+    started = time.perf_counter()
+    index.build(cursor=docs)
+    build_seconds = time.perf_counter() - started
+    stats = index.stats()
+    print(f'{len(docs)} users indexed in {build_seconds:.1f}s, {stats["bytes"] / 2 ** 20:.1f} MB')
+
+    sample = docs[len(docs) // 3]
+    provider = docs[counts['patient'] + 7]
+    queries = {
+        'last name prefix': ('joh', ('patient', 'provider')),
+        'first + last': (sample['name'], ('patient', 'provider')),
+        'memberId exact': (sample['profile']['memberId'], ('patient',)),
+        'memberId partial': (sample['profile']['memberId'][-6:], ('patient',)),
+        'npiNumber exact': (provider['profile']['npiNumber'], ('provider',)),
+        'licenseNumber prefix': (provider['profile']['licenseNumber'][:6], ('provider',)),
+        'one letter': ('m', ('patient', 'provider')),
+    }
+    results = {'build': {'n': len(docs), 'seconds': build_seconds, 'bytes': stats['bytes']}}
+    print(f'{"query":>22} {"hits":>5} {"p50 us":>9} {"p99 us":>9}')
+    for name, (query, roles) in queries.items():
+        hits = len(index.search(query, roles=roles, limit=20))
+        summary = results[name] = summarize(timeit(lambda: index.search(query, roles=roles, limit=20), repeat=args.repeat))
+        print(f'{name:>22} {hits:>5} {summary["p50_us"]:>9.1f} {summary["p99_us"]:>9.1f}')
+
+    def scan(query):
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        return [doc for doc in docs if pattern.search(doc['name']) or any(pattern.search(str(doc['profile'].get(key, ''))) for key in PROFILE_KEYS)][:20]
+
+    for name in ('last name prefix', 'memberId partial'):
+        summary = results[f'regex scan: {name}'] = summarize(timeit(lambda: scan(queries[name][0]), repeat=args.scan_repeat, warmup=0))
+        print(f'{"regex scan: " + name:>22} {"":>5} {summary["p50_us"]:>9.0f}')
+    write_results(args.output, 'user_search', results, users=len(docs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+"""Claim adjudication: payor rules compiled into lookup tables.
+
+Rules are data: DEFAULT_RULES, or the JSON list in ADJUDICATION_RULES_FILE.
+They are compiled once per process into a RuleIndex, which holds amount limits
+keyed by service code, allowed services keyed by specialty, and the per-claim
+flag checks. Deciding one claim is then a few dict lookups rather than a walk
+over every rule. In batch mode the same index is expanded into NumPy tables
+over the batch's distinct service codes and specialties, so each rule costs
+one vector comparison for the whole batch.
+
+Every rule has an outcome. The most severe outcome that fires wins (deny >
+pend > review > approve), and the ids of all rules that fired are stored on
+the claim. Approved claims are charged to the member's accumulators (see
+claimsapp.coverage), and claims sent for review go on the review queue. If a
+batch keeps losing the race for a member's accumulator, that member's claims
+are put back to submitted, uncharged, for the next run.
+
+Rule kinds:
+
+* ``coverage``: the member has no plan terms, or the service predates the plan.
+* ``duplicate``: an earlier claim that was not denied has the same member,
+  provider, service code and service day.
+* ``fraud_flag``: the batch fraud scorer flagged the claim.
+* ``amount_limit``: ``amount_cents`` is above ``max_cents``. ``service_code``
+  narrows a limit to one code, and code-specific limits replace the general
+  ones for that code.
+* ``specialty_services``: a provider of ``specialty`` bills a code that is not
+  in ``services``.
+"""
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+from django.conf import settings
+from pymongo import UpdateOne
+
+from notificationsapp.services import notify_claims
+from .coverage import MAX_ATTEMPTS, AccumulatorBusy, coverage_service, cost_share, plan_year_start
+from .fraud import Factorizer
+from .models import Claim
+from .review_queue import review_queue
+from .rollups import claim_fields, claim_rollups
+
+OUTCOMES = ['approve', 'review', 'pend', 'deny']  # by severity
+STATUS_FOR_OUTCOME = {'approve': 'approved', 'review': 'processing', 'pend': 'pending_docs', 'deny': 'denied'}
+OPEN_STATUSES = ['submitted', 'processing', 'under_review', 'pending_docs']
+FLAG_KINDS = ('coverage', 'duplicate', 'fraud_flag')
+RULE_KINDS = FLAG_KINDS + ('amount_limit', 'specialty_services')
+EPOCH = datetime(1970, 1, 1)
+PROJECTION = {
+    'claim_number': 1, 'patient_id': 1, 'provider_id': 1, 'provider_specialty': 1, 'service_code': 1,
+    'amount_cents': 1, 'service_date': 1, 'submitted_at': 1, 'fraud_flag': 1, 'status': 1, 'payor_id': 1,
+    'adjudication_reasons': 1, 'adjudication_run': 1, 'adjudicated_at': 1,
+}
+
+DEFAULT_RULES = [
+    {'id': 'not_covered', 'kind': 'coverage', 'outcome': 'deny'},
+    {'id': 'duplicate', 'kind': 'duplicate', 'outcome': 'deny'},
+    {'id': 'fraud_flagged', 'kind': 'fraud_flag', 'outcome': 'review'},
+    {'id': 'over_review_limit', 'kind': 'amount_limit', 'max_cents': 1_000_000, 'outcome': 'review'},
+    {'id': 'over_documentation_limit', 'kind': 'amount_limit', 'max_cents': 5_000_000, 'outcome': 'pend'},
+]
+
+
+def load_rules():
+    path = settings.ADJUDICATION_RULES_FILE
+    if not path:
+        return DEFAULT_RULES
+    with open(path) as f:
+        return json.load(f)
+
+
+def validate_rule(rule):
+    name = rule.get('id')
+    if not name or not isinstance(name, str):
+        raise ValueError(f'Rule without an id: {rule!r}')
+    if rule.get('kind') not in RULE_KINDS:
+        raise ValueError(f'Rule {name!r}: kind must be one of {", ".join(RULE_KINDS)}')
+    if rule.get('outcome') not in OUTCOMES[1:]:
+        raise ValueError(f'Rule {name!r}: outcome must be one of {", ".join(OUTCOMES[1:])}')
+    if rule['kind'] == 'amount_limit' and not isinstance(rule.get('max_cents'), int):
+        raise ValueError(f'Rule {name!r}: amount_limit needs an integer max_cents')
+    if rule['kind'] == 'specialty_services' and not (rule.get('specialty') and isinstance(rule.get('services'), list)):
+        raise ValueError(f'Rule {name!r}: specialty_services needs a specialty and a list of services')
+    return rule
+
+
+def service_day(when):
+    start = datetime(when.year, when.month, when.day)
+    return start, start + timedelta(days=1)
+
+
+class RuleIndex:
+    def __init__(self, rules):
+        self.rules = [validate_rule(rule) for rule in rules]
+        self.ids = [rule['id'] for rule in self.rules]
+        if len(set(self.ids)) != len(self.ids):
+            raise ValueError('Adjudication rule ids must be unique')
+        self.severity = np.array([OUTCOMES.index(rule['outcome']) for rule in self.rules], np.int8)
+        self.flags = {kind: [] for kind in FLAG_KINDS}
+        self.limits = {}  # service code -> [(max_cents, rule)]
+        self.default_limits = []
+        self.specialties = {}  # specialty -> [(allowed service codes, rule)]
+        for i, rule in enumerate(self.rules):
+            kind = rule['kind']
+            if kind in FLAG_KINDS:
+                self.flags[kind].append(i)
+            elif kind == 'amount_limit':
+                target = self.limits.setdefault(rule['service_code'], []) if rule.get('service_code') else self.default_limits
+                target.append((rule['max_cents'], i))
+            else:
+                self.specialties.setdefault(rule['specialty'], []).append((frozenset(rule['services']), i))
+        self._reasons = {}
+
+    def decide(self, claim, covered, duplicate):
+        """Indexes of the rules that fire for one claim document."""
+        fired = []
+        if not covered:
+            fired += self.flags['coverage']
+        if duplicate:
+            fired += self.flags['duplicate']
+        if claim.get('fraud_flag'):
+            fired += self.flags['fraud_flag']
+        amount = claim.get('amount_cents') or 0
+        service = claim.get('service_code')
+        fired += [i for max_cents, i in self.limits.get(service, self.default_limits) if amount > max_cents]
+        fired += [i for allowed, i in self.specialties.get(claim.get('provider_specialty'), ()) if service not in allowed]
+        return sorted(fired)
+
+    def outcome(self, fired):
+        return OUTCOMES[max((self.severity[i] for i in fired), default=0)]
+
+    def decide_batch(self, batch):
+        """(severity per claim, fired) for a ClaimBatch; ``fired`` is a rules x claims boolean matrix."""
+        n = len(batch)
+        fired = np.zeros((len(self.rules), n), bool)
+
+        def fire(i, mask):
+            fired[i] = mask
+
+        for kind, mask in (('coverage', ~batch.covered), ('duplicate', batch.duplicate), ('fraud_flag', batch.fraud)):
+            for i in self.flags[kind]:
+                fire(i, mask)
+        # per-rule tables over the batch's distinct codes; the extra last slot is code -1 (missing)
+        services = batch.services.keys + [None]
+        for max_cents, i in self.default_limits:
+            applies = np.array([code not in self.limits for code in services])
+            fire(i, applies[batch.service] & (batch.amount > max_cents))
+        for code, limits in self.limits.items():
+            position = batch.services.index.get(code)
+            if position is None:
+                continue
+            for max_cents, i in limits:
+                fire(i, (batch.service == position) & (batch.amount > max_cents))
+        for specialty, rules in self.specialties.items():
+            position = batch.specialties.index.get(specialty)
+            if position is None:
+                continue
+            of_specialty = batch.specialty == position
+            for allowed, i in rules:
+                permitted = np.array([code in allowed for code in services])
+                fire(i, of_specialty & ~permitted[batch.service])
+        severity = (fired * self.severity[:, None]).max(axis=0, initial=0).astype(np.int8)
+        return severity, fired
+
+    def reasons_batch(self, fired):
+        """Fired rule ids per claim; claims sharing a pattern share one list."""
+        patterns = np.packbits(fired, axis=0).T.copy()
+        reasons = []
+        for pattern in patterns:
+            key = pattern.tobytes()
+            ids = self._reasons.get(key)
+            if ids is None:
+                ids = self._reasons[key] = [self.ids[i] for i in np.flatnonzero(np.unpackbits(pattern)[:len(self.ids)])]
+            reasons.append(ids)
+        return reasons
+
+    def hits(self, fired):
+        return dict(zip(self.ids, np.count_nonzero(fired, axis=1).tolist()))
+
+
+class ClaimBatch:
+    """Columns of one chunk of raw claim documents."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.services = Factorizer()
+        self.specialties = Factorizer()
+        n = len(docs)
+        self.service = np.fromiter((self.services.code(d.get('service_code')) for d in docs), np.int64, n)
+        self.specialty = np.fromiter((self.specialties.code(d.get('provider_specialty')) for d in docs), np.int64, n)
+        self.amount = np.fromiter((d.get('amount_cents') or 0 for d in docs), np.int64, n)
+        self.fraud = np.fromiter((bool(d.get('fraud_flag')) for d in docs), bool, n)
+        self.covered = np.ones(n, bool)
+        self.duplicate = np.zeros(n, bool)
+
+    def __len__(self):
+        return len(self.docs)
+
+
+def is_covered(plan, service_date):
+    return plan is not None and (plan.effective_date is None or plan.effective_date <= service_date)
+
+
+def duplicate_key(claim):
+    return claim.get('patient_id'), claim.get('provider_id'), claim.get('service_code'), (claim['service_date'] - EPOCH).days
+
+
+def accumulator_key(doc, year):
+    return f'{doc["patient_id"]}:{year}'
+
+
+def charge(docs, plans, year_of, balances):
+    """Cost shares ``{i: share}`` for the claims in ``year_of``, in order, drawing down ``balances`` as they go."""
+    shares = {}
+    for i, year in year_of.items():
+        doc = docs[i]
+        balance = balances[accumulator_key(doc, year)]
+        share = shares[i] = cost_share(plans[doc['patient_id']], balance[0], balance[1], doc.get('amount_cents') or 0)
+        balance[0] += share['deductible_cents']
+        balance[1] += share['member_cents']
+    return shares
+
+
+def totals(docs, year_of, shares):
+    """``{(member_id, plan_year): [deductible, oop, claims]}`` summed over ``shares``."""
+    result = {}
+    for i, share in shares.items():
+        total = result.setdefault((docs[i]['patient_id'], year_of[i]), [0, 0, 0])
+        total[0] += share['deductible_cents']
+        total[1] += share['member_cents']
+        total[2] += 1
+    return result
+
+
+class Adjudicator:
+    def __init__(self, rules=None, chunk_size=5000, log=None):
+        self._rules = rules
+        self._index = None
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = RuleIndex(load_rules() if self._rules is None else self._rules)
+        return self._index
+
+    def adjudicate(self, claim):
+        """Decide one open claim now; None if it is closed or changed underneath us."""
+        if claim.status not in OPEN_STATUSES:
+            return None
+        try:
+            plan = coverage_service.get_plan(claim.patient_id)
+        except ValueError:
+            plan = None
+        start, end = service_day(claim.service_date)
+        duplicate = Claim._get_collection().find_one({
+            'patient_id': claim.patient_id, 'provider_id': claim.provider_id, 'service_code': claim.service_code,
+            'service_date': {'$gte': start, '$lt': end}, 'status': {'$ne': 'denied'}, '_id': {'$lt': claim.id},
+        }, {'_id': 1}) is not None
+        fired = self.index.decide(claim.to_mongo().to_dict(), is_covered(plan, claim.service_date), duplicate)
+        outcome = self.index.outcome(fired)
+        reasons = [self.index.ids[i] for i in fired]
+        now = datetime.utcnow()
+        run_id = ObjectId()
+        before = claim_fields(claim)
+        result = Claim._get_collection().update_one({'_id': claim.id, 'status': claim.status}, {'$set': {
+            'status': STATUS_FOR_OUTCOME[outcome], 'adjudication_reasons': reasons,
+            'adjudication_run': run_id, 'adjudicated_at': now, 'updated_at': now,
+        }})
+        if not result.matched_count:
+            return None
+        share = None
+        if outcome == 'approve' and plan is not None:
+            try:
+                share = coverage_service.apply_claim(claim)
+            except AccumulatorBusy:
+                # back to the open status it had, uncharged, so the payor can simply retry
+                Claim._get_collection().update_one({'_id': claim.id, 'adjudication_run': run_id}, {'$set': {
+                    'status': claim.status, 'adjudication_reasons': claim.adjudication_reasons,
+                    'adjudication_run': claim.adjudication_run, 'adjudicated_at': claim.adjudicated_at, 'updated_at': now,
+                }})
+                raise
+        claim.status = STATUS_FOR_OUTCOME[outcome]
+        claim_rollups.changed([(before, {'status': claim.status})])
+        claim.adjudication_reasons = reasons
+        if outcome == 'review':
+            review_queue.enqueue(claim, fraud_flag=bool(claim.fraud_flag))
+        notify_claims([(claim.to_mongo(), claim.status)])
+        return {'outcome': outcome, 'status': claim.status, 'reasons': reasons, 'cost_share': share}
+
+    def run(self, limit=None):
+        """Adjudicate every submitted claim in chunks; returns counts and the per-rule hit report."""
+        started = time.perf_counter()
+        run_id = ObjectId()
+        report = {'run': str(run_id), 'claims': 0, 'written': 0, 'busy': 0, 'outcomes': Counter(), 'hits': Counter(), 'decide_seconds': 0.0}
+        cursor = Claim._get_collection().find({'status': 'submitted'}, PROJECTION).sort('_id', 1).batch_size(self.chunk_size)
+        if limit:
+            cursor = cursor.limit(limit)
+        chunk = []
+        for doc in cursor:
+            chunk.append(doc)
+            if len(chunk) == self.chunk_size:
+                self.process(chunk, run_id, report)
+                chunk = []
+        if chunk:
+            self.process(chunk, run_id, report)
+        seconds = time.perf_counter() - started
+        report['seconds'] = round(seconds, 3)
+        report['decide_seconds'] = round(report['decide_seconds'], 4)
+        report['claims_per_second'] = round(report['claims'] / max(seconds, 1e-9))
+        report['decide_claims_per_second'] = round(report['claims'] / max(report['decide_seconds'], 1e-9))
+        report['outcomes'] = dict(report['outcomes'])
+        report['hits'] = {rule_id: report['hits'][rule_id] for rule_id in self.index.ids}
+        return report
+
+    def load_context(self, batch):
+        docs = batch.docs
+        plans = coverage_service.get_plans({d['patient_id'] for d in docs})
+        batch.covered = np.fromiter((is_covered(plans.get(d['patient_id']), d['service_date']) for d in docs), bool, len(docs))
+        if self.index.flags['duplicate']:
+            # the earliest claim that was not denied is the original for each key; later ones are duplicates
+            first = {}
+            cursor = Claim._get_collection().find({
+                'patient_id': {'$in': list({d['patient_id'] for d in docs})},
+                'service_date': {'$gte': service_day(min(d['service_date'] for d in docs))[0],
+                                 '$lt': service_day(max(d['service_date'] for d in docs))[1]},
+                'status': {'$ne': 'denied'},
+            }, {'patient_id': 1, 'provider_id': 1, 'service_code': 1, 'service_date': 1})
+            for row in cursor:
+                key = duplicate_key(row)
+                if key not in first or row['_id'] < first[key]:
+                    first[key] = row['_id']
+            batch.duplicate = np.fromiter((first.get(duplicate_key(d), d['_id']) != d['_id'] for d in docs), bool, len(docs))
+        return plans
+
+    def process(self, docs, run_id, report):
+        batch = ClaimBatch(docs)
+        plans = self.load_context(batch)
+        decide_started = time.perf_counter()
+        severity, fired = self.index.decide_batch(batch)
+        report['decide_seconds'] += time.perf_counter() - decide_started
+
+        # cost shares in claim order against running balances, so one member's claims in a chunk stack up
+        approved = np.nonzero(severity == 0)[0]
+        year_of = {}
+        for i in approved:
+            plan = plans.get(docs[i]['patient_id'])
+            if plan is not None:
+                year_of[i] = plan_year_start(plan.effective_date, docs[i]['service_date']).year
+        balances = coverage_service.load_accumulators({accumulator_key(docs[i], year) for i, year in year_of.items()})
+        shares = charge(docs, plans, year_of, balances)
+
+        now = datetime.utcnow()
+        reasons = self.index.reasons_batch(fired)
+        ops = []
+        for i, doc in enumerate(docs):
+            outcome = OUTCOMES[severity[i]]
+            update = {
+                'status': STATUS_FOR_OUTCOME[outcome], 'adjudication_reasons': reasons[i],
+                'adjudication_run': run_id, 'adjudicated_at': now, 'updated_at': now,
+            }
+            query = {'_id': doc['_id'], 'status': 'submitted'}
+            if i in shares:
+                update.update(shares[i], accumulated_at=now)
+                query['accumulated_at'] = None
+            ops.append(UpdateOne(query, {'$set': update}))
+        result = Claim._get_collection().bulk_write(ops, ordered=False)
+        if result.matched_count == len(docs):
+            written = set(range(len(docs)))
+        else:
+            # some claims changed since they were read; only count what this run wrote
+            ours = {row['_id'] for row in Claim._get_collection().find(
+                {'_id': {'$in': [d['_id'] for d in docs]}, 'adjudication_run': run_id}, {'_id': 1})}
+            written = {i for i, doc in enumerate(docs) if doc['_id'] in ours}
+
+        charged = {i: share for i, share in shares.items() if i in written}
+        busy = set()
+        for _ in range(MAX_ATTEMPTS):
+            conflicts = coverage_service.increment(totals(docs, year_of, charged), {key: balance[2] for key, balance in balances.items()})
+            if not conflicts:
+                break
+            # another writer charged these members after their balances were read: recompute from the new ones
+            balances = coverage_service.load_accumulators(conflicts)
+            charged = charge(docs, plans, {i: year_of[i] for i in charged if accumulator_key(docs[i], year_of[i]) in conflicts}, balances)
+            Claim._get_collection().bulk_write([
+                UpdateOne({'_id': docs[i]['_id'], 'adjudication_run': run_id}, {'$set': share}) for i, share in charged.items()
+            ], ordered=False)
+        else:
+            # still contended: leave those members' claims submitted and uncharged for the next run
+            busy = {i for i in charged if accumulator_key(docs[i], year_of[i]) in conflicts}
+            self.reopen(docs, busy, charged, run_id)
+            written -= busy
+        claim_rollups.changed([(docs[i], {'status': STATUS_FOR_OUTCOME[OUTCOMES[severity[i]]]}) for i in sorted(written)])
+        review_queue.enqueue_many([docs[i] for i in np.nonzero(severity == OUTCOMES.index('review'))[0] if i in written])
+        notify_claims([(docs[i], STATUS_FOR_OUTCOME[OUTCOMES[severity[i]]]) for i in sorted(written)])
+
+        report['claims'] += len(docs)
+        report['written'] += len(written)
+        report['busy'] += len(busy)
+        report['outcomes'].update(dict(zip(OUTCOMES, np.bincount(severity, minlength=len(OUTCOMES)).tolist())))
+        report['hits'].update(self.index.hits(fired))
+        self.log(f'   adjudicated {report["claims"]} claims')
+
+    def reopen(self, docs, indexes, shares, run_id):
+        """Put claims this run approved back to submitted, as they were before and without their cost shares."""
+        now = datetime.utcnow()
+        fields = ('adjudication_reasons', 'adjudication_run', 'adjudicated_at')
+        ops = [UpdateOne({'_id': docs[i]['_id'], 'adjudication_run': run_id, 'status': 'approved'}, {
+            '$set': {'status': 'submitted', 'accumulated_at': None, 'updated_at': now, **{key: docs[i][key] for key in fields if key in docs[i]}},
+            '$unset': {**dict.fromkeys(shares[i], ''), **{key: '' for key in fields if key not in docs[i]}},
+        }) for i in indexes]
+        if ops:
+            Claim._get_collection().bulk_write(ops, ordered=False)
+
+adjudicator = Adjudicator()
@@ -0,0 +1,431 @@
+"""Member coverage: plan terms, benefit accumulators and eligibility lookups.
+
+Plan terms live in the patient profile as display strings ("$1,500"). They are
+parsed once into a Coverage document in integer cents, and re-parsed when a
+profile edit touches one of PLAN_KEYS. Deductible and out-of-pocket spend is
+kept per member and plan year in an Accumulator document that apply_claim
+increments as each claim is adjudicated, so a lookup is one small read and
+never re-sums claim history. ``manage.py rebuild_accumulators`` recomputes
+them from the applied claims if they are ever in doubt.
+
+Lookups are served from a per-process LRU (CoverageCache). apply_claim and
+save_plan drop the member's entry in this process; other processes see the
+change within COVERAGE_CACHE_TTL seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .models import Accumulator, Claim, Coverage
+from .serializers import format_amount
+
+# profile key -> Coverage field; money values are parsed to cents
+PLAN_KEYS = {
+    'insuranceProvider': 'insurance_provider',
+    'planType': 'plan_type',
+    'memberId': 'member_number',
+    'groupNumber': 'group_number',
+    'effectiveDate': 'effective_date',
+    'copay': 'copay_cents',
+    'deductible': 'deductible_cents',
+    'outOfPocketMax': 'oop_max_cents',
+}
+MONEY_KEYS = ('copay', 'deductible', 'outOfPocketMax')
+MAX_ATTEMPTS = 10
+
+
+class AccumulatorBusy(Exception):
+    """Raised when an accumulator kept changing underneath MAX_ATTEMPTS compare-and-set attempts."""
+
+    def __init__(self, key):
+        super().__init__(f'Accumulator {key} is too contended to update')
+        self.key = key
+
+
+def parse_cents(value):
+    """'$1,500' / '25.50' / 30 -> integer cents; None for an empty value."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        if value < 0:
+            raise ValueError(f'Not an amount: {value!r}')
+        return value * 100
+    try:
+        amount = Decimal(str(value).replace('$', '').replace(',', '').strip())
+    except InvalidOperation:
+        raise ValueError(f'Not an amount: {value!r}')
+    if not amount.is_finite() or amount < 0 or amount != amount.quantize(Decimal('0.01')):
+        raise ValueError(f'Not an amount: {value!r}')
+    return int(amount * 100)
+
+
+def parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+
+
+def plan_from_changes(user, changes):
+    """Re-parsed Coverage if a profile edit touches plan terms, else None; ValueError if unparseable."""
+    profile = {key[8:]: value for key, value in changes.items() if key.startswith('profile.')}
+    if user.role != 'patient' or not PLAN_KEYS.keys() & profile.keys():
+        return None
+    return coverage_from_profile(user.id, {**user.profile, **profile})
+
+
+def coverage_from_profile(member_id, profile):
+    coverage = Coverage(id=member_id)
+    for key, field in PLAN_KEYS.items():
+        value = profile.get(key)
+        if key in MONEY_KEYS:
+            value = parse_cents(value) or 0
+        elif key == 'effectiveDate':
+            value = parse_date(value)
+        setattr(coverage, field, value)
+    coverage.updated_at = datetime.utcnow()
+    return coverage
+
+
+def plan_year_start(effective_date, when):
+    """Start of the plan year containing ``when``; plan years renew on the effective date."""
+    anchor = effective_date or datetime(when.year, 1, 1)
+    for year in (when.year, when.year - 1):
+        try:
+            start = datetime(year, anchor.month, anchor.day)
+        except ValueError:  # 29 February
+            start = datetime(year, anchor.month, 28)
+        if start <= when:
+            return start
+    return start
+
+
+def next_anniversary(start):
+    try:
+        return start.replace(year=start.year + 1)
+    except ValueError:
+        return start.replace(year=start.year + 1, day=28)
+
+
+def cost_share(coverage, deductible_met, oop_met, amount_cents):
+    """Split ``amount_cents`` into deductible, copay, member and plan shares."""
+    deductible = min(amount_cents, max(coverage.deductible_cents - deductible_met, 0))
+    copay = min(coverage.copay_cents, amount_cents - deductible)
+    # once the out-of-pocket maximum is reached the plan pays everything
+    member = min(deductible + copay, max(coverage.oop_max_cents - oop_met, 0))
+    deductible = min(deductible, member)
+    return {
+        'deductible_cents': deductible,
+        'copay_cents': member - deductible,
+        'member_cents': member,
+        'plan_paid_cents': amount_cents - member,
+    }
+
+
+class CoverageCache:
+    """Bounded per-process LRU of coverage summaries keyed by member id."""
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, member_id, as_of):
+        if not self.max_size:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(member_id)
+            # a summary is only good for the plan year it was computed in
+            if entry is None or entry[0] <= now or not entry[1] <= as_of < entry[2]:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(member_id)
+            self.hits += 1
+            return entry[3]
+
+    def set(self, member_id, start, end, summary):
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries[member_id] = (time.monotonic() + self.ttl, start, end, summary)
+            self._entries.move_to_end(member_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, member_id):
+        with self._lock:
+            if self._entries.pop(member_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+
+class CoverageService:
+    def __init__(self, cache):
+        self.cache = cache
+
+    @property
+    def accumulators(self):
+        return Accumulator._get_collection()
+
+    def get_plan(self, member_id, profile=None):
+        """The member's Coverage, parsed from the profile on first use; None if not a patient."""
+        coverage = Coverage.objects(id=member_id).first()
+        if coverage is not None:
+            return coverage
+        if profile is None:
+            from authapp.models import User
+            user = User.objects(id=member_id, role='patient').only('profile').first()
+            if user is None:
+                return None
+            profile = user.profile
+        coverage = coverage_from_profile(member_id, profile)
+        coverage.save()
+        return coverage
+
+    def get_plans(self, member_ids):
+        """get_plan for many members at once; members without usable plan terms are left out."""
+        plans = {coverage.id: coverage for coverage in Coverage.objects(id__in=list(member_ids))}
+        missing = [member_id for member_id in member_ids if member_id not in plans]
+        if missing:
+            from authapp.models import User
+            created = []
+            for row in User.objects(id__in=missing, role='patient').only('profile').as_pymongo():
+                try:
+                    created.append(coverage_from_profile(row['_id'], row.get('profile') or {}))
+                except ValueError:
+                    continue
+            if created:
+                try:
+                    Coverage._get_collection().insert_many([c.to_mongo() for c in created], ordered=False)
+                except BulkWriteError:
+                    pass  # parsed concurrently by another request; the terms are the same
+                plans.update((c.id, c) for c in created)
+        return plans
+
+    def save_plan(self, coverage):
+        """Store plan terms re-parsed after the patient's profile changed."""
+        coverage.save()
+        self.cache.invalidate(str(coverage.id))
+        return coverage
+
+    def summary(self, member_id, user=None, as_of=None):
+        """Eligibility, plan terms and remaining benefits; None if not a patient. Cached per member."""
+        as_of = as_of or datetime.utcnow()
+        key = str(member_id)
+        cached = self.cache.get(key, as_of)
+        if cached is not None:
+            return cached
+        if user is None:
+            from authapp.models import User
+            user = User.objects(id=member_id, role='patient').only('role', 'profile', 'is_active').first()
+        if user is None or user.role != 'patient':
+            return None
+        coverage = self.get_plan(member_id, user.profile)
+        start = plan_year_start(coverage.effective_date, as_of)
+        end = next_anniversary(start)
+        accumulator = self.accumulators.find_one({'_id': f'{member_id}:{start.year}'}) or {}
+        summary = self._summarize(coverage, accumulator, start, end, as_of, user.is_active)
+        self.cache.set(key, start, end, summary)
+        return summary
+
+    def _summarize(self, coverage, accumulator, start, end, as_of, is_active):
+        deductible_met = accumulator.get('deductible_cents', 0)
+        oop_met = accumulator.get('oop_cents', 0)
+        cents = {
+            'copayCents': coverage.copay_cents,
+            'deductibleCents': coverage.deductible_cents,
+            'deductibleMetCents': deductible_met,
+            'deductibleRemainingCents': max(coverage.deductible_cents - deductible_met, 0),
+            'outOfPocketMaxCents': coverage.oop_max_cents,
+            'outOfPocketMetCents': oop_met,
+            'outOfPocketRemainingCents': max(coverage.oop_max_cents - oop_met, 0),
+        }
+        return {
+            'memberId': coverage.member_number,
+            'insuranceProvider': coverage.insurance_provider,
+            'planType': coverage.plan_type,
+            'groupNumber': coverage.group_number,
+            'effectiveDate': coverage.effective_date.date().isoformat() if coverage.effective_date else None,
+            'eligible': bool(is_active) and (coverage.effective_date is None or coverage.effective_date <= as_of),
+            'planYearStart': start.date().isoformat(),
+            'planYearEnd': end.date().isoformat(),
+            **cents,
+            # display strings, e.g. "$1,500"
+            **{name[:-5]: format_amount(value) for name, value in cents.items()},
+        }
+
+    def estimate(self, summary, amount_cents):
+        """What the member would pay for a claim of ``amount_cents`` today."""
+        terms = Coverage(
+            copay_cents=summary['copayCents'],
+            deductible_cents=summary['deductibleCents'],
+            oop_max_cents=summary['outOfPocketMaxCents'],
+        )
+        share = cost_share(terms, summary['deductibleMetCents'], summary['outOfPocketMetCents'], amount_cents)
+        return {
+            'amountCents': amount_cents,
+            'deductibleCents': share['deductible_cents'],
+            'copayCents': share['copay_cents'],
+            'memberCents': share['member_cents'],
+            'planPaysCents': share['plan_paid_cents'],
+        }
+
+    def apply_claim(self, claim, amount_cents=None):
+        """Charge an adjudicated claim against the member's accumulators, once.
+
+        The share is computed first and written to the claim together with
+        ``accumulated_at`` (the once-only guard), and only then added to the
+        accumulator, so a claim marked applied always carries the share that
+        ``rebuild`` replays. Returns that share, or None if the claim was
+        already applied (or its member has no coverage).
+        """
+        coverage = self.get_plan(claim.patient_id)
+        if coverage is None:
+            return None
+        amount = claim.amount_cents if amount_cents is None else amount_cents
+        plan_year = plan_year_start(coverage.effective_date, claim.service_date).year
+        key = f'{claim.patient_id}:{plan_year}'
+        claims = Claim._get_collection()
+        now = datetime.utcnow()
+        owned = False
+        for _ in range(MAX_ATTEMPTS):
+            current = self.accumulators.find_one({'_id': key}) or {}
+            version = current.get('version', 0)
+            share = cost_share(coverage, current.get('deductible_cents', 0), current.get('oop_cents', 0), amount)
+            # after the first pass the claim is ours: rewrite the share recomputed after a conflict
+            marked = claims.update_one(
+                {'_id': claim.id, 'accumulated_at': now if owned else None},
+                {'$set': {'accumulated_at': now, **share}},
+            )
+            if not marked.matched_count:
+                return None
+            owned = True
+            try:
+                updated = self.accumulators.find_one_and_update(
+                    {'_id': key, 'version': version} if version else {'_id': key, 'version': {'$in': [0, None]}},
+                    {
+                        '$inc': {'deductible_cents': share['deductible_cents'], 'oop_cents': share['member_cents'], 'claims': 1, 'version': 1},
+                        '$set': {'updated_at': now},
+                        '$setOnInsert': {'member_id': claim.patient_id, 'plan_year': plan_year},
+                    },
+                    upsert=not version,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except DuplicateKeyError:
+                continue  # a concurrent claim created the accumulator first
+            if updated is not None:
+                break
+        else:
+            # leave the claim unapplied so a later attempt can charge it
+            claims.update_one({'_id': claim.id, 'accumulated_at': now}, {'$set': {'accumulated_at': None}, '$unset': dict.fromkeys(share, '')})
+            raise AccumulatorBusy(key)
+        self.cache.invalidate(str(claim.patient_id))
+        return share
+
+    def load_accumulators(self, keys):
+        """``{<member id>:<plan year>: [deductible_cents, oop_cents, version]}`` for the given keys."""
+        found = {row['_id']: [row.get('deductible_cents', 0), row.get('oop_cents', 0), row.get('version', 0)]
+                 for row in self.accumulators.find({'_id': {'$in': list(keys)}})}
+        return {key: found.get(key, [0, 0, 0]) for key in keys}
+
+    def increment(self, totals, versions):
+        """Add batch totals ``{(member_id, plan_year): (deductible, oop, claims)}`` to the accumulators.
+
+        Like apply_claim, each total is only added if its accumulator is still
+        at the version in ``versions`` that its shares were computed from.
+        Returns the keys that had changed; those are left untouched.
+        """
+        now = datetime.utcnow()
+        keys = [f'{member_id}:{year}' for member_id, year in totals]
+        ops = []
+        for key, ((member_id, year), (deductible, oop, claims)) in zip(keys, totals.items()):
+            version = versions.get(key, 0)
+            # on a version mismatch the upsert tries to insert a second document with this _id, so every conflict is an 11000
+            ops.append(UpdateOne(
+                {'_id': key, 'version': version} if version else {'_id': key, 'version': {'$in': [0, None]}},
+                {
+                    '$inc': {'deductible_cents': deductible, 'oop_cents': oop, 'claims': claims, 'version': 1},
+                    '$set': {'updated_at': now},
+                    '$setOnInsert': {'member_id': member_id, 'plan_year': year},
+                },
+                upsert=True,
+            ))
+        conflicts = set()
+        if ops:
+            try:
+                self.accumulators.bulk_write(ops, ordered=False)
+            except BulkWriteError as exc:
+                if exc.details.get('writeConcernErrors') or any(e['code'] != 11000 for e in exc.details['writeErrors']):
+                    raise
+                conflicts = {keys[e['index']] for e in exc.details['writeErrors']}
+        for member_id, _ in totals:
+            self.cache.invalidate(str(member_id))
+        return conflicts
+
+    def rebuild(self, member_ids=None):
+        """Recompute accumulators from applied claims; returns the number written."""
+        match = {'accumulated_at': {'$ne': None}, 'member_cents': {'$ne': None}}
+        if member_ids:
+            match['patient_id'] = {'$in': list(member_ids)}
+        totals = {}
+        plans = {}
+        rows = Claim._get_collection().find(match, {'patient_id': 1, 'service_date': 1, 'deductible_cents': 1, 'member_cents': 1})
+        for row in rows:
+            member_id = row['patient_id']
+            if member_id not in plans:
+                plans[member_id] = self.get_plan(member_id)
+            coverage = plans[member_id]
+            effective_date = coverage.effective_date if coverage else None
+            year = plan_year_start(effective_date, row['service_date']).year
+            total = totals.setdefault((member_id, year), [0, 0, 0])
+            total[0] += row.get('deductible_cents') or 0
+            total[1] += row.get('member_cents') or 0
+            total[2] += 1
+        query = {'member_id': {'$in': list(member_ids)}} if member_ids else {}
+        self.accumulators.delete_many(query)
+        now = datetime.utcnow()
+        documents = [
+            {
+                '_id': f'{member_id}:{year}', 'member_id': member_id, 'plan_year': year,
+                'deductible_cents': deductible, 'oop_cents': oop, 'claims': claims, 'version': 1, 'updated_at': now,
+            }
+            for (member_id, year), (deductible, oop, claims) in totals.items()
+        ]
+        if documents:
+            self.accumulators.insert_many(documents, ordered=False)
+        self.cache.clear()
+        return len(documents)
+
+
+coverage_service = CoverageService(CoverageCache(
+    max_size=getattr(settings, 'COVERAGE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'COVERAGE_CACHE_TTL', 60),
+))
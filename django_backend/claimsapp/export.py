@@ -0,0 +1,271 @@
+"""Streaming CSV / NDJSON exports of claims and members.
+
+An Export is an iterator of byte chunks, handed to a StreamingHttpResponse by
+the export views or written to a file by ``manage.py export``. Under ASGI the
+views hand over its async iterator instead, which produces each chunk in a
+worker thread: given a plain iterator, Django would build the whole body with
+``sync_to_async(list)`` before sending any of it.
+
+    cursor (projection, EXPORT_BATCH_SIZE) -> EXPORT_CHUNK_ROWS rows -> csv / ndjson -> [gzip] -> bytes
+
+Only one driver batch and one encoded chunk are held at a time, so memory does
+not grow with the size of the export. Every query is answered in an index's
+order (``_id``, ``role_created_at``, or the owner's ``*_service_date`` index),
+never by an in-memory sort. When the export ends, or the client goes away,
+the cursor is closed and the row count, bytes and rows/s are logged.
+"""
+import csv
+import io
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from authapp.models import User
+from backend.renderers import compile_row_encoder, dumps, passthrough
+from .models import Claim, CLAIM_STATUSES
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+# a spreadsheet runs a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def iso_datetime(value):
+    return value.isoformat() if value else None
+
+
+def iso_date(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+def optional_id(value):
+    return str(value) if value else None
+
+
+# numbers and flags: copied as is, like None, but exempt from the CSV formula guard
+number = passthrough
+SAFE_TRANSFORMS = (iso_datetime, iso_date, str, optional_id, number)
+
+
+def csv_cell(value):
+    """Text that a spreadsheet would evaluate is prefixed with ``'``; other values are left alone."""
+    if value.__class__ is str and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_safe(transform):
+    if transform is None:
+        return csv_cell
+    if transform in SAFE_TRANSFORMS:
+        return transform
+    return lambda value: csv_cell(transform(value))
+
+
+def profile_value(key):
+    def get(profile):
+        return (profile or {}).get(key)
+    return get
+
+
+class Dataset:
+    """A collection and the ``(column, source field, transform)`` specs it is exported with."""
+
+    def __init__(self, name, document, columns):
+        self.name = name
+        self.document = document
+        self.header = [key for key, _, _ in columns]
+        self.projection = {source: 1 for _, source, _ in columns}
+        self.projection.setdefault('_id', 0)
+        self.encode = compile_row_encoder(f'export_{name}', columns)
+        # CSV cells are also guarded against formula injection, except where the transform only yields ids, dates or numbers
+        self.encode_for_csv = compile_row_encoder(f'export_{name}_csv', [(key, source, csv_safe(transform)) for key, source, transform in columns])
+
+    def cursor(self, query, sort, batch_size):
+        # a copy: mongomock adds _id to the projection it is given
+        return self.document._get_collection().find(query, dict(self.projection), sort=sort, batch_size=batch_size)
+
+
+CLAIMS = Dataset('claims', Claim, [
+    ('claim_number', 'claim_number', None),
+    ('status', 'status', None),
+    ('service_date', 'service_date', iso_date),
+    ('submitted_at', 'submitted_at', iso_datetime),
+    ('updated_at', 'updated_at', iso_datetime),
+    ('patient_id', 'patient_id', str),
+    ('patient_name', 'patient_name', None),
+    ('provider_id', 'provider_id', str),
+    ('provider_name', 'provider_name', None),
+    ('provider_specialty', 'provider_specialty', None),
+    ('payor_id', 'payor_id', optional_id),
+    ('service', 'service', None),
+    ('service_code', 'service_code', None),
+    ('description', 'description', None),
+    ('amount_cents', 'amount_cents', number),
+    ('deductible_cents', 'deductible_cents', number),
+    ('copay_cents', 'copay_cents', number),
+    ('member_cents', 'member_cents', number),
+    ('plan_paid_cents', 'plan_paid_cents', number),
+    ('fraud_flag', 'fraud_flag', number),
+    ('fraud_score', 'fraud_score', number),
+    ('adjudicated_at', 'adjudicated_at', iso_datetime),
+])
+
+MEMBER_PROFILE_KEYS = ('memberId', 'groupNumber', 'insuranceProvider', 'planType', 'effectiveDate', 'dateOfBirth')
+MEMBERS = Dataset('members', User, [
+    ('id', '_id', str),
+    ('name', 'name', None),
+    ('email', 'email', None),
+    ('is_active', 'is_active', number),
+    ('created_at', 'created_at', iso_datetime),
+    # each column reads the profile field, which the projection fetches once
+    *((key, 'profile', profile_value(key)) for key in MEMBER_PROFILE_KEYS),
+])
+
+
+def parse_day(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)') from None
+
+
+def claim_query(owner_field=None, owner_id=None, status=None, since=None, until=None):
+    """(query, sort) for the claims of one owner, or of the whole book when ``owner_field`` is None.
+
+    ``since`` and ``until`` are inclusive service dates as YYYY-MM-DD strings.
+    """
+    query = {}
+    if owner_field:
+        query[owner_field] = owner_id
+    if status:
+        if status not in CLAIM_STATUSES:
+            raise ValueError(f'Unknown status {status}')
+        query['status'] = status
+    if since or until:
+        query['service_date'] = {}
+        if since:
+            query['service_date']['$gte'] = parse_day(since, 'since')
+        if until:
+            query['service_date']['$lt'] = parse_day(until, 'until') + timedelta(days=1)
+    # an owner's claims come from its <owner>_service_date index; the whole book in _id order
+    sort = [('service_date', -1), ('_id', -1)] if owner_field else [('_id', 1)]
+    return query, sort
+
+
+def member_query():
+    return {'role': 'patient'}, [('created_at', -1)]
+
+
+def encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(map(dict.values, rows))
+    return buffer.getvalue().encode('utf-8')
+
+
+def encode_ndjson(rows):
+    return b'\n'.join(map(dumps, rows)) + b'\n'
+
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+
+class Export:
+    """One streamed export. Iterate it once for the body; ``stats()`` reports the throughput."""
+
+    def __init__(self, dataset, query, sort, fmt, compress=False, batch_size=None, chunk_rows=None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f'Export format must be one of {", ".join(EXPORT_FORMATS)}')
+        self.dataset = dataset
+        self.query = query
+        self.sort = sort
+        self.format = fmt
+        self.compress = compress
+        self.batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        self.chunk_rows = chunk_rows or settings.EXPORT_CHUNK_ROWS
+        self.rows = 0
+        self.bytes = 0
+        self.sent = 0
+        self.seconds = 0.0
+        self.finished = False
+
+    @property
+    def content_type(self):
+        return 'application/gzip' if self.compress else CONTENT_TYPES[self.format]
+
+    @property
+    def filename(self):
+        name = f'{self.dataset.name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{self.format}'
+        return f'{name}.gz' if self.compress else name
+
+    def __iter__(self):
+        started = time.perf_counter()
+        encode = ENCODERS[self.format]
+        rows_of = self.dataset.encode_for_csv if self.format == 'csv' else self.dataset.encode
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(settings.EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if self.compress else None
+        cursor = self.dataset.cursor(self.query, self.sort, self.batch_size)
+        try:
+            if self.format == 'csv':
+                yield from self._out(self._header(), compressor)
+            while True:
+                rows = list(islice(cursor, self.chunk_rows))
+                if not rows:
+                    break
+                self.rows += len(rows)
+                yield from self._out(encode(rows_of(rows)), compressor)
+            if compressor is not None:
+                tail = compressor.flush()
+                self.sent += len(tail)
+                yield tail
+            self.finished = True
+        finally:
+            cursor.close()
+            self.seconds = time.perf_counter() - started
+            stats = self.stats()
+            logger.info('Export of %s %s: %d rows, %d bytes (%d sent) in %.1fs, %.0f rows/s',
+                        self.dataset.name, 'finished' if self.finished else 'aborted',
+                        self.rows, self.bytes, self.sent, self.seconds, stats['rowsPerSecond'])
+
+    async def __aiter__(self):
+        chunks = iter(self)
+        # a thread of its own per chunk: the cursor round trips and encoding stay off the event loop
+        next_chunk = sync_to_async(next, thread_sensitive=False)
+        try:
+            while (chunk := await next_chunk(chunks, None)) is not None:
+                yield chunk
+        finally:
+            await sync_to_async(chunks.close, thread_sensitive=False)()
+
+    def _header(self):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(self.dataset.header)
+        return buffer.getvalue().encode('utf-8')
+
+    def _out(self, data, compressor):
+        self.bytes += len(data)
+        if compressor is not None:
+            data = compressor.compress(data)
+            if not data:
+                return  # buffered in the compressor until it has a block to emit
+        self.sent += len(data)
+        yield data
+
+    def stats(self):
+        return {
+            'dataset': self.dataset.name,
+            'format': self.format,
+            'gzip': self.compress,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'sent': self.sent,
+            'seconds': self.seconds,
+            'rowsPerSecond': self.rows / self.seconds if self.seconds else 0.0,
+        }
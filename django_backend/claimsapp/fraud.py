@@ -0,0 +1,328 @@
+"""Vectorised batch fraud scoring for claims.
+
+Claims are streamed from Mongo one chunk at a time into columnar NumPy arrays,
+so memory is bounded by the chunk size, not the backlog. Three feature
+families are then computed for the whole chunk at once:
+
+* amount z-scores against the claim's provider and its service code;
+* claim velocity, the number of claims a member has in the trailing window;
+* unusual service/specialty pairs, i.e. a service code that a specialty
+  almost never bills.
+
+Per-group statistics are kept in ``fraud_baseline`` as Welford aggregates and
+merged chunk by chunk, so each chunk (and an incremental run, which only takes
+claims above the stored ``_id`` watermark) scores against the baselines of
+everything seen so far. The watermark advances after every chunk is written.
+``_id``s are generated by clients before the insert commits, so a run only
+takes claims whose ``_id`` is at least FRAUD_WATERMARK_LAG_SECONDS old: an
+insert still in flight commits below the watermark otherwise and is never
+scored. The newest claims wait for the next run instead.
+Components are combined noisy-or style; claims at or above
+FRAUD_SCORE_THRESHOLD are flagged and written back with one unordered
+bulk_write per chunk.
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .models import Claim, FraudBaseline, JobWatermark
+from .review_queue import review_queue
+from .rollups import ROLLUP_FIELDS, claim_rollups
+
+WATERMARK = 'fraud_scoring'
+PROJECTION = {
+    'patient_id': 1, 'provider_id': 1, 'provider_specialty': 1,
+    'service_code': 1, 'amount_cents': 1, 'service_date': 1,
+}
+EPOCH = datetime(1970, 1, 1)
+DAY_BITS = 20  # member code and day number share one int64 sort key
+
+# weight of each component in the noisy-or combination
+WEIGHTS = {
+    'amount_outlier': 0.7,
+    'high_velocity': 0.6,
+    'unusual_service_for_specialty': 0.4,
+}
+
+
+class Factorizer:
+    """Maps arbitrary keys to dense integer codes; None maps to -1."""
+
+    def __init__(self):
+        self.index = {}
+        self.keys = []
+
+    def code(self, key):
+        if key is None:
+            return -1
+        code = self.index.get(key)
+        if code is None:
+            code = self.index[key] = len(self.keys)
+            self.keys.append(key)
+        return code
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class ClaimColumns:
+    def __init__(self):
+        self.ids = []
+        self.patients = Factorizer()
+        self.providers = Factorizer()
+        self.specialties = Factorizer()
+        self.services = Factorizer()
+        self.pairs = Factorizer()
+        self._chunks = []
+
+    def add_chunk(self, docs):
+        patient = self.patients.code
+        provider = self.providers.code
+        specialty = self.specialties.code
+        service = self.services.code
+        pair = self.pairs.code
+        n = len(docs)
+        self.ids.extend(d['_id'] for d in docs)
+        self._chunks.append((
+            np.fromiter((patient(d.get('patient_id')) for d in docs), np.int64, n),
+            np.fromiter((provider(d.get('provider_id')) for d in docs), np.int64, n),
+            np.fromiter((specialty(d.get('provider_specialty')) for d in docs), np.int64, n),
+            np.fromiter((service(d.get('service_code')) for d in docs), np.int64, n),
+            np.fromiter((
+                pair((d['provider_specialty'], d['service_code']))
+                if d.get('provider_specialty') and d.get('service_code') else -1
+                for d in docs
+            ), np.int64, n),
+            np.fromiter((d.get('amount_cents') or 0 for d in docs), np.float64, n) / 100.0,
+            np.fromiter(((d['service_date'] - EPOCH).days for d in docs), np.int64, n),
+        ))
+
+    def finish(self):
+        if self._chunks:
+            columns = [np.concatenate(parts) for parts in zip(*self._chunks)]
+        else:
+            columns = [np.empty(0, np.int64)] * 5 + [np.empty(0, np.float64), np.empty(0, np.int64)]
+        (self.patient, self.provider, self.specialty, self.service,
+         self.pair, self.amount, self.day) = columns
+        self._chunks = []
+        return self
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def chunked(cursor, size):
+    chunk = []
+    for doc in cursor:
+        chunk.append(doc)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def group_stats(codes, values, size):
+    mask = codes >= 0
+    codes, values = codes[mask], values[mask]
+    n = np.bincount(codes, minlength=size).astype(np.int64)
+    mean = np.bincount(codes, weights=values, minlength=size) / np.maximum(n, 1)
+    m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=size)
+    return n, mean, m2
+
+
+def merge_baselines(kind, keys, n_b, mean_b, m2_b, chunk_size=10000):
+    """Merge batch aggregates into the stored ones (Chan et al.) and persist them."""
+    size = len(keys)
+    n_a, mean_a, m2_a = np.zeros(size, np.int64), np.zeros(size), np.zeros(size)
+    ids = [f'{kind}:{key}' for key in keys]
+    position = {_id: i for i, _id in enumerate(ids)}
+    collection = FraudBaseline._get_collection()
+    for start in range(0, size, chunk_size):
+        for doc in collection.find({'_id': {'$in': ids[start:start + chunk_size]}}):
+            i = position[doc['_id']]
+            n_a[i], mean_a[i], m2_a[i] = doc['n'], doc['mean'], doc['m2']
+
+    n = n_a + n_b
+    safe_n = np.maximum(n, 1)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / safe_n
+    m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / safe_n
+
+    changed = np.nonzero(n_b)[0]
+    for start in range(0, len(changed), chunk_size):
+        collection.bulk_write([
+            UpdateOne({'_id': ids[i]}, {'$set': {'n': int(n[i]), 'mean': float(mean[i]), 'm2': float(m2[i])}}, upsert=True)
+            for i in changed[start:start + chunk_size]
+        ], ordered=False)
+    return n, mean, m2
+
+
+def zscores(values, codes, n, mean, m2, min_support):
+    std = np.sqrt(m2 / np.maximum(n - 1, 1))
+    valid = (codes >= 0)
+    safe = np.where(valid, codes, 0)
+    supported = valid & (n[safe] >= min_support) & (std[safe] > 0)
+    z = np.zeros(len(values))
+    z[supported] = (values[supported] - mean[safe][supported]) / std[safe][supported]
+    return z
+
+
+def member_velocity(columns, window_days, chunk_size):
+    """Claims per member within [day - window, day] for every claim in columns."""
+    # pull the members' recent history (just two fields) for context
+    members = columns.patients.keys
+    since = EPOCH + timedelta(days=int(columns.day.min()) - window_days)
+    code = columns.patients.index
+    patient_parts, day_parts = [], []
+    for start in range(0, len(members), chunk_size):
+        cursor = Claim._get_collection().find(
+            {'patient_id': {'$in': members[start:start + chunk_size]}, 'service_date': {'$gte': since}},
+            {'patient_id': 1, 'service_date': 1, '_id': 0},
+        ).batch_size(chunk_size)
+        docs = list(cursor)
+        patient_parts.append(np.fromiter((code[d['patient_id']] for d in docs), np.int64, len(docs)))
+        day_parts.append(np.fromiter(((d['service_date'] - EPOCH).days for d in docs), np.int64, len(docs)))
+    context_patient = np.concatenate(patient_parts) if patient_parts else np.empty(0, np.int64)
+    context_day = np.concatenate(day_parts) if day_parts else np.empty(0, np.int64)
+
+    keys = np.sort((context_patient << DAY_BITS) + context_day)
+    upper = (columns.patient << DAY_BITS) + columns.day
+    lower = upper - window_days
+    return np.searchsorted(keys, upper, side='right') - np.searchsorted(keys, lower, side='left')
+
+
+class FraudScorer:
+    def __init__(self, chunk_size=50000, threshold=None, log=None, lag_seconds=None):
+        self.chunk_size = chunk_size
+        self.threshold = settings.FRAUD_SCORE_THRESHOLD if threshold is None else threshold
+        self.lag_seconds = settings.FRAUD_WATERMARK_LAG_SECONDS if lag_seconds is None else lag_seconds
+        self.log = log or (lambda message: None)
+
+    def run(self, full=False):
+        started = time.perf_counter()
+        if full:
+            FraudBaseline.objects.delete()
+            self.clear_flags()
+            query = {}
+        else:
+            watermark = JobWatermark.objects(id=WATERMARK).first()
+            query = {'_id': {'$gt': watermark.last_id}} if watermark and watermark.last_id else {}
+        if self.lag_seconds:
+            cutoff = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=self.lag_seconds))
+            query.setdefault('_id', {})['$lt'] = cutoff
+
+        result = {'scored': 0, 'flagged': 0, 'load_seconds': 0.0, 'score_seconds': 0.0, 'write_seconds': 0.0}
+        chunks = self.load(query)
+        while True:
+            began = time.perf_counter()
+            columns = next(chunks, None)
+            if columns is None:
+                break
+            loaded = time.perf_counter()
+
+            scores, reasons = self.score(columns)
+            flagged = np.nonzero(scores >= self.threshold)[0]
+            scored = time.perf_counter()
+
+            self.write_back(columns, scores, reasons, flagged)
+            JobWatermark.objects(id=WATERMARK).update_one(
+                set__last_id=columns.ids[-1], set__updated_at=datetime.utcnow(), upsert=True,
+            )
+            finished = time.perf_counter()
+
+            result['scored'] += len(columns)
+            result['flagged'] += len(flagged)
+            result['load_seconds'] += loaded - began
+            result['score_seconds'] += scored - loaded
+            result['write_seconds'] += finished - scored
+            self.log(f"   scored {result['scored']} claims, flagged {result['flagged']}")
+
+        if not result['scored']:
+            self.log('No new claims to score')
+            return {'scored': 0, 'flagged': 0, 'seconds': time.perf_counter() - started}
+        seconds = time.perf_counter() - started
+        for key in ('load_seconds', 'score_seconds', 'write_seconds'):
+            result[key] = round(result[key], 3)
+        result['seconds'] = round(seconds, 3)
+        result['claims_per_second'] = round(result['scored'] / max(seconds, 1e-9))
+        return result
+
+    def clear_flags(self):
+        collection = Claim._get_collection()
+        cursor = collection.find({'fraud_flag': True}, ROLLUP_FIELDS).batch_size(self.chunk_size)
+        for docs in chunked(cursor, self.chunk_size):
+            collection.update_many(
+                {'_id': {'$in': [doc['_id'] for doc in docs]}},
+                {'$set': {'fraud_flag': False}, '$unset': {'fraud_score': '', 'fraud_reasons': ''}},
+            )
+            claim_rollups.changed([(doc, {'fraud_flag': False}) for doc in docs])
+
+    def load(self, query):
+        """Yield the matching claims as ClaimColumns, ``chunk_size`` at a time in ``_id`` order."""
+        cursor = Claim._get_collection().find(query, PROJECTION).sort('_id', 1).batch_size(self.chunk_size)
+        for docs in chunked(cursor, self.chunk_size):
+            columns = ClaimColumns()
+            columns.add_chunk(docs)
+            yield columns.finish()
+
+    def score(self, columns):
+        min_support = settings.FRAUD_MIN_SUPPORT
+        amount = columns.amount
+
+        provider_stats = merge_baselines('provider', columns.providers.keys, *group_stats(columns.provider, amount, len(columns.providers)))
+        service_stats = merge_baselines('service', columns.services.keys, *group_stats(columns.service, amount, len(columns.services)))
+        z = np.maximum(
+            zscores(amount, columns.provider, *provider_stats, min_support),
+            zscores(amount, columns.service, *service_stats, min_support),
+        )
+        z_limit = settings.FRAUD_Z_THRESHOLD
+        amount_component = np.clip((z - z_limit) / z_limit, 0, 1)
+
+        velocity = member_velocity(columns, settings.FRAUD_VELOCITY_WINDOW_DAYS, self.chunk_size)
+        v_limit = settings.FRAUD_VELOCITY_LIMIT
+        velocity_component = np.clip((velocity - v_limit) / v_limit, 0, 1)
+
+        zeros = np.zeros(len(columns))
+        specialty_n = merge_baselines('specialty', columns.specialties.keys, *group_stats(columns.specialty, zeros, len(columns.specialties)))[0]
+        pair_keys = [f'{spec}|{code}' for spec, code in columns.pairs.keys]
+        pair_n = merge_baselines('pair', pair_keys, *group_stats(columns.pair, zeros, len(columns.pairs)))[0]
+        has_pair = columns.pair >= 0
+        pair_count = np.where(has_pair, pair_n[np.where(has_pair, columns.pair, 0)], 0)
+        spec_count = np.where(has_pair, specialty_n[np.where(has_pair, columns.specialty, 0)], 0)
+        rare = has_pair & (spec_count >= min_support) & (pair_count < settings.FRAUD_RARE_PAIR_FREQUENCY * spec_count)
+        pair_component = rare.astype(np.float64)
+
+        components = {
+            'amount_outlier': amount_component,
+            'high_velocity': velocity_component,
+            'unusual_service_for_specialty': pair_component,
+        }
+        keep = np.ones(len(columns))
+        for name, component in components.items():
+            keep *= 1 - WEIGHTS[name] * component
+        return 1 - keep, components
+
+    def write_back(self, columns, scores, components, flagged):
+        if not len(flagged):
+            return
+        collection = Claim._get_collection()
+        ids = [columns.ids[i] for i in flagged]
+        newly = list(collection.find({'_id': {'$in': ids}, 'fraud_flag': {'$ne': True}}, ROLLUP_FIELDS))
+        now = datetime.utcnow()
+        ops = []
+        for i in flagged:
+            reasons = [name for name, component in components.items() if component[i] > 0]
+            ops.append(UpdateOne({'_id': columns.ids[i]}, {'$set': {
+                'fraud_score': round(float(scores[i]), 4),
+                'fraud_flag': True,
+                'fraud_reasons': reasons,
+                'scored_at': now,
+            }}))
+        collection.bulk_write(ops, ordered=False)
+        claim_rollups.changed([(doc, {'fraud_flag': True}) for doc in newly])
+        review_queue.reprioritize_many(ids, fraud_flag=True)
@@ -0,0 +1,337 @@
+"""Bulk claim ingestion for providers.
+
+The upload is spooled to a temporary file (in memory up to
+INGEST_SPOOL_MEMORY_BYTES, then on disk), and the request returns a job id
+straight away. A background thread then runs the file through a generator
+pipeline, so no more than one chunk of rows is in memory at a time:
+
+    parse (ndjson / csv / x12) -> validate -> chunk -> resolve members -> insert_many
+
+Each chunk is written with one unordered ``insert_many``, and the job's
+counters and the first INGEST_MAX_ERRORS row errors go into ``ingest_job``
+after every chunk, where ``GET .../bulk/<job id>`` reads them. A job in a
+process that dies stays ``running``; its inserted rows are kept, and
+re-uploading the file reports them as duplicate claim numbers.
+
+NDJSON and CSV rows have the fields ``claim_number``, ``member_id`` (the
+patient's profile memberId) or ``patient_id``, ``service``, ``service_code``,
+``description``, ``amount`` (dollars, "$1,250.00") or ``amount_cents``, and
+``service_date`` (YYYY-MM-DD). The x12 format is a simplified 837 flat file.
+Its segments end with ``~`` or a newline, its elements are separated by
+``*``, and all other segments are ignored::
+
+    NM1*QC*<member id>~                         patient for the CLM segments that follow
+    CLM*<claim number>*<amount>~                starts a claim
+    SV1*<service code>*<service>*<description>~
+    DTP*472*<YYYYMMDD>~                         service date
+"""
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from pymongo.errors import BulkWriteError
+
+from .coverage import parse_cents
+from .models import Claim, IngestJob
+from .rollups import claim_rollups
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+SEGMENT_END = re.compile(r'[~\n]')
+
+
+class IngestError(ValueError):
+    pass
+
+
+def ndjson_rows(stream):
+    for row_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_no, None, 'Invalid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield row_no, None, 'Expected a JSON object'
+            continue
+        yield row_no, row, None
+
+
+def csv_rows(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        # line_num is the file line the row ends on, which is what an editor shows
+        yield reader.line_num, row, None
+
+
+def segments(stream):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    while True:
+        block = stream.read(READ_SIZE)
+        pending += decoder.decode(block, final=not block)
+        parts = SEGMENT_END.split(pending)
+        pending = parts.pop() if block else ''
+        for part in parts:
+            if part.strip():
+                yield part.strip()
+        if not block:
+            if pending.strip():
+                yield pending.strip()
+            return
+
+
+def x12_rows(stream):
+    member, claim, claim_no = None, None, 0
+    for segment_no, segment in enumerate(segments(stream), 1):
+        elements = segment.split('*')
+        tag = elements[0].upper()
+        if tag in ('NM1', 'CLM') and claim is not None:
+            yield claim_no, claim, None
+            claim = None
+        if tag == 'NM1' and len(elements) > 2 and elements[1].upper() == 'QC':
+            member = elements[2]
+        elif tag == 'CLM':
+            claim_no = segment_no
+            claim = {
+                'member_id': member,
+                'claim_number': elements[1] if len(elements) > 1 else None,
+                'amount': elements[2] if len(elements) > 2 else None,
+            }
+        elif claim is not None and tag == 'SV1':
+            claim.update(zip(('service_code', 'service', 'description'), elements[1:4]))
+        elif claim is not None and tag == 'DTP' and len(elements) > 2 and elements[1] == '472':
+            claim['service_date'] = elements[-1]
+    if claim is not None:
+        yield claim_no, claim, None
+
+
+PARSERS = {'ndjson': ndjson_rows, 'csv': csv_rows, 'x12': x12_rows}
+
+
+def text(row, key, required=False, max_length=200):
+    value = row.get(key)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise IngestError(f'{key} is required')
+    if len(value) > max_length:
+        raise IngestError(f'{key} is longer than {max_length} characters')
+    return value or None
+
+
+def parse_service_date(value, today):
+    value = str(value or '').strip()
+    for pattern in ('%Y-%m-%d', '%Y%m%d'):
+        try:
+            date = datetime.strptime(value[:10], pattern)
+            break
+        except ValueError:
+            continue
+    else:
+        raise IngestError('service_date must be YYYY-MM-DD')
+    if date > today:
+        raise IngestError('service_date is in the future')
+    return date
+
+
+def parse_amount_cents(value):
+    """An integral number or a string of digits; int() alone would accept 12.9, True and ' 1_0 '."""
+    if isinstance(value, bool):
+        pass
+    elif isinstance(value, int):
+        return value
+    elif isinstance(value, float) and value.is_integer():
+        return int(value)
+    elif isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        return int(value.strip())
+    raise IngestError('amount_cents must be an integer')
+
+
+def validate(row, today):
+    """The claim fields of one parsed row; raises IngestError."""
+    if row.get('amount_cents') not in (None, ''):
+        amount_cents = parse_amount_cents(row['amount_cents'])
+    else:
+        try:
+            amount_cents = parse_cents(row.get('amount'))
+        except ValueError as exc:
+            raise IngestError(str(exc))
+    if amount_cents is None or amount_cents <= 0:
+        raise IngestError('amount must be greater than zero')
+    member_id, patient_id = text(row, 'member_id', max_length=64), text(row, 'patient_id', max_length=24)
+    if not member_id and not patient_id:
+        raise IngestError('member_id or patient_id is required')
+    if patient_id:
+        try:
+            patient_id = ObjectId(patient_id)
+        except InvalidId:
+            raise IngestError('patient_id is not a valid id')
+    return {
+        'claim_number': text(row, 'claim_number', required=True, max_length=64),
+        'member_id': member_id,
+        'patient_id': patient_id,
+        'service': text(row, 'service', required=True),
+        'service_code': text(row, 'service_code', max_length=32),
+        'description': text(row, 'description', max_length=2000),
+        'amount_cents': amount_cents,
+        'service_date': parse_service_date(row.get('service_date'), today),
+    }
+
+
+def validated(rows):
+    today = datetime.utcnow()
+    for row_no, row, error in rows:
+        if error is None:
+            try:
+                row = validate(row, today)
+            except IngestError as exc:
+                row, error = None, str(exc)
+        yield row_no, row, error
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve_patients(rows):
+    """{member_id or patient_id: (patient _id, name)} for the patients in a chunk."""
+    from authapp.models import User
+    members = list({row['member_id'] for row in rows if row['member_id'] and not row['patient_id']})
+    ids = list({row['patient_id'] for row in rows if row['patient_id']})
+    found = {}
+    collection = User._get_collection()
+    projection = {'name': 1, 'profile.memberId': 1}
+    if members:
+        for user in collection.find({'role': 'patient', 'profile.memberId': {'$in': members}}, projection):
+            found[user['profile']['memberId']] = (user['_id'], user.get('name'))
+    if ids:
+        for user in collection.find({'_id': {'$in': ids}, 'role': 'patient'}, projection):
+            found[user['_id']] = (user['_id'], user.get('name'))
+    return found
+
+
+class Ingestor:
+    def __init__(self, chunk_size=None, max_errors=None):
+        self.chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+        self.max_errors = settings.INGEST_MAX_ERRORS if max_errors is None else max_errors
+
+    def run(self, job_id, stream, fmt, provider):
+        """Ingest ``stream`` for ``provider`` (id, name, specialty), recording progress on the job."""
+        jobs = IngestJob._get_collection()
+        started = time.perf_counter()
+        jobs.update_one({'_id': job_id}, {'$set': {'state': 'running', 'started_at': datetime.utcnow()}})
+        rows = 0
+        try:
+            for chunk in chunked(validated(PARSERS[fmt](stream)), self.chunk_size):
+                inserted, errors = self.write_chunk(chunk, provider)
+                rows += len(chunk)
+                elapsed = time.perf_counter() - started
+                jobs.update_one({'_id': job_id}, {
+                    '$inc': {'rows': len(chunk), 'inserted': inserted, 'failed': len(errors)},
+                    '$push': {'errors': {'$each': errors, '$slice': self.max_errors}},
+                    '$set': {'rows_per_second': round(rows / max(elapsed, 1e-9), 1)},
+                })
+        except Exception as exc:
+            logger.exception('Claim ingestion job %s failed', job_id)
+            jobs.update_one({'_id': job_id}, {'$set': {'state': 'failed', 'message': str(exc), 'finished_at': datetime.utcnow()}})
+            return
+        finally:
+            stream.close()
+        jobs.update_one({'_id': job_id}, {'$set': {
+            'state': 'done', 'finished_at': datetime.utcnow(),
+            'rows_per_second': round(rows / max(time.perf_counter() - started, 1e-9), 1),
+        }})
+
+    def write_chunk(self, chunk, provider):
+        """Insert one chunk; returns (inserted, [{'row', 'error'}])."""
+        errors = [{'row': row_no, 'error': error} for row_no, _, error in chunk if error]
+        valid = [(row_no, row) for row_no, row, error in chunk if not error]
+        patients = resolve_patients([row for _, row in valid])
+        provider_id, provider_name, provider_specialty = provider
+        now = datetime.utcnow()
+        docs, row_nos = [], []
+        for row_no, row in valid:
+            patient = patients.get(row['patient_id'] or row['member_id'])
+            if patient is None:
+                errors.append({'row': row_no, 'error': 'Unknown member'})
+                continue
+            docs.append({
+                'claim_number': row['claim_number'],
+                'patient_id': patient[0],
+                'provider_id': provider_id,
+                'patient_name': patient[1],
+                'provider_name': provider_name,
+                'provider_specialty': provider_specialty,
+                'service': row['service'],
+                'service_code': row['service_code'],
+                'description': row['description'],
+                'amount_cents': row['amount_cents'],
+                'status': 'submitted',
+                'service_date': row['service_date'],
+                'submitted_at': now,
+                'updated_at': now,
+                'fraud_flag': False,
+            })
+            row_nos.append(row_no)
+        if not docs:
+            return 0, errors
+        failed = set()
+        try:
+            Claim._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            for failure in exc.details.get('writeErrors', []):
+                message = 'Duplicate claim_number' if failure.get('code') == 11000 else failure.get('errmsg', 'Write failed')
+                errors.append({'row': row_nos[failure['index']], 'error': message})
+                failed.add(failure['index'])
+        claim_rollups.added(doc for i, doc in enumerate(docs) if i not in failed)
+        inserted = len(docs) - len(failed)
+        errors.sort(key=lambda e: e['row'])
+        return inserted, errors
+
+
+class IngestRunner:
+    """Runs ingestion jobs on a small thread pool; with ``workers=0`` they run inline.
+
+    The pool is created lazily and recreated after a fork.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, job_id, stream, fmt, provider):
+        if not self.workers:
+            Ingestor().run(job_id, stream, fmt, provider)
+            return
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='claim-ingest')
+                self._pid = os.getpid()
+            self._executor.submit(Ingestor().run, job_id, stream, fmt, provider)
+
+
+ingest_runner = IngestRunner(getattr(settings, 'INGEST_WORKERS', 2))
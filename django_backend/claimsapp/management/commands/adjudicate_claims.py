@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from backend.mongo import connect_mongo
+from claimsapp.adjudication import Adjudicator
+
+
+class Command(BaseCommand):
+    help = 'Adjudicate every submitted claim in batch and print how often each rule fired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Claims decided and written per batch')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many claims')
+
+    def handle(self, *args, **options):
+        connect_mongo()
+        adjudicator = Adjudicator(chunk_size=options['chunk_size'], log=self.stdout.write)
+        report = adjudicator.run(limit=options['limit'])
+        if not report['claims']:
+            self.stdout.write('No submitted claims to adjudicate')
+            return
+        outcomes = ', '.join(f'{count} {outcome}' for outcome, count in report['outcomes'].items() if count)
+        self.stdout.write(
+            f"✅ Adjudicated {report['claims']} claims in {report['seconds']}s ({report['claims_per_second']:,} claims/s; "
+            f"rules alone {report['decide_claims_per_second']:,} claims/s): {outcomes}"
+        )
+        if report['busy']:
+            self.stdout.write(
+                f"⚠️ {report['busy']} approved claims were left submitted because their members' benefits "
+                f"were being updated by another writer; run again to decide them"
+            )
+        width = max(len(rule_id) for rule_id in report['hits'])
+        for rule_id, hits in report['hits'].items():
+            self.stdout.write(f'   {rule_id:<{width}} {hits:>9}  {hits / report["claims"]:6.1%}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from backend.mongo import connect_mongo
+from claimsapp.rollups import claim_rollups
+
+
+class Command(BaseCommand):
+    help = 'Compare the dashboard claim rollups with the claims and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Increment drifted fields back to the recomputed values')
+        parser.add_argument('--show', type=int, default=20, help='Drifted fields to print')
+
+    def handle(self, *args, **options):
+        connect_mongo()
+        drift = claim_rollups.check()
+        if not drift:
+            self.stdout.write('✅ Claim rollups match the claims')
+            return
+        buckets = len({row['id'] for row in drift})
+        self.stdout.write(f'⚠️ {len(drift)} fields differ in {buckets} rollups')
+        for row in drift[:options['show']]:
+            self.stdout.write(f"   {row['id']} {row['field']}: expected {row['expected']}, stored {row['actual']}")
+        if options['fix']:
+            claim_rollups.fix(drift)
+            self.stdout.write(f'✅ Fixed {len(drift)} fields')
@@ -0,0 +1,55 @@
+import sys
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.core.management.base import BaseCommand, CommandError
+from backend.mongo import connect_mongo
+from claimsapp.export import CLAIMS, EXPORT_FORMATS, MEMBERS, Export, claim_query, member_query
+
+
+class Command(BaseCommand):
+    help = 'Stream claims or members to a CSV or NDJSON file (or stdout) with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['claims', 'members'])
+        parser.add_argument('--type', choices=EXPORT_FORMATS, default='csv', help='Output format')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--provider', help="Only this provider's claims (user id)")
+        parser.add_argument('--status', help='Only claims with this status')
+        parser.add_argument('--since', help='Only claims with a service date on or after YYYY-MM-DD')
+        parser.add_argument('--until', help='Only claims with a service date on or before YYYY-MM-DD')
+        parser.add_argument('--batch-size', type=int, default=None, help='Documents per cursor round trip (default: EXPORT_BATCH_SIZE)')
+        parser.add_argument('--chunk-rows', type=int, default=None, help='Rows encoded and written at a time (default: EXPORT_CHUNK_ROWS)')
+
+    def handle(self, *args, **options):
+        connect_mongo()
+        try:
+            if options['dataset'] == 'claims':
+                provider = ObjectId(options['provider']) if options['provider'] else None
+                query, sort = claim_query('provider_id' if provider else None, provider, options['status'], options['since'], options['until'])
+                dataset = CLAIMS
+            else:
+                query, sort = member_query()
+                dataset = MEMBERS
+        except (InvalidId, ValueError) as exc:
+            raise CommandError(str(exc))
+        export = Export(dataset, query, sort, options['type'], compress=options['gzip'],
+                        batch_size=options['batch_size'], chunk_rows=options['chunk_rows'])
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in export:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+        stats = export.stats()
+        # the data may be on stdout, so the summary goes to stderr then
+        report = self.stdout if options['output'] else self.stderr
+        size = f"{stats['bytes'] / 2 ** 20:.1f} MB"
+        if export.compress:
+            size += f", {stats['sent'] / 2 ** 20:.1f} MB gzipped"
+        report.write(f"✅ Exported {stats['rows']:,} {dataset.name} ({size}) in {stats['seconds']:.1f}s ({stats['rowsPerSecond']:,.0f} rows/s)")
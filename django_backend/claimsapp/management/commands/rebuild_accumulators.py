@@ -0,0 +1,16 @@
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from backend.mongo import connect_mongo
+from claimsapp.coverage import coverage_service
+
+
+class Command(BaseCommand):
+    help = 'Recompute deductible and out-of-pocket accumulators from the claims already applied to them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--member', action='append', default=[], help='Patient user id to rebuild (repeatable; default: everyone)')
+
+    def handle(self, *args, **options):
+        connect_mongo()
+        written = coverage_service.rebuild([ObjectId(m) for m in options['member']])
+        self.stdout.write(f'✅ Rebuilt {written} accumulators')
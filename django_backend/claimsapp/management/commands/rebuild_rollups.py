@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from backend.mongo import connect_mongo
+from claimsapp.rollups import claim_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard claim rollups from scratch; stop claim writers first, increments made meanwhile are lost'
+
+    def handle(self, *args, **options):
+        connect_mongo()
+        written = claim_rollups.rebuild()
+        self.stdout.write(f'✅ Rebuilt {written} claim rollups')
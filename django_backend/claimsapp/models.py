@@ -0,0 +1,196 @@
+from mongoengine import Document, StringField, DateTimeField, IntField, ObjectIdField, BooleanField, FloatField, ListField, DictField
+from datetime import datetime
+
+
+INGEST_FORMATS = ['ndjson', 'csv', 'x12']
+ROLLUP_SCOPES = ['all', 'provider', 'payor']
+CLAIM_STATUSES = ['submitted', 'processing', 'under_review', 'pending_docs', 'approved', 'denied', 'paid']
+
+
+class Claim(Document):
+    claim_number = StringField(required=True, unique=True)
+    patient_id = ObjectIdField(required=True)
+    provider_id = ObjectIdField(required=True)
+    payor_id = ObjectIdField()
+    # Denormalised display names so listings never join against the user collection
+    patient_name = StringField()
+    provider_name = StringField()
+    provider_specialty = StringField()
+    service = StringField(required=True)
+    service_code = StringField()
+    description = StringField()
+    amount_cents = IntField(required=True, min_value=0)
+    status = StringField(required=True, choices=CLAIM_STATUSES, default='submitted')
+    service_date = DateTimeField(required=True)
+    submitted_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+    # Written by the batch scorer in claimsapp.fraud
+    fraud_score = FloatField()
+    fraud_flag = BooleanField(default=False)
+    fraud_reasons = ListField(StringField())
+    scored_at = DateTimeField()
+    # Written by claimsapp.adjudication; the ids of the rules that fired
+    adjudication_reasons = ListField(StringField())
+    adjudication_run = ObjectIdField()
+    adjudicated_at = DateTimeField()
+    # Member cost share, written once by claimsapp.coverage.apply_claim
+    deductible_cents = IntField()
+    copay_cents = IntField()
+    member_cents = IntField()
+    plan_paid_cents = IntField()
+    accumulated_at = DateTimeField()
+
+    meta = {
+        'collection': 'claim',
+        'indexes': [
+            # Keyset listing per owner: equality on the owner, then the sort key
+            {'fields': ['patient_id', '-service_date', '-id'], 'name': 'patient_service_date'},
+            {'fields': ['provider_id', '-service_date', '-id'], 'name': 'provider_service_date'},
+            {'fields': ['payor_id', '-service_date', '-id'], 'name': 'payor_service_date'},
+            {'fields': ['payor_id', 'status', '-service_date', '-id'], 'name': 'payor_status_service_date'},
+            {'fields': ['status', '-service_date'], 'name': 'status_service_date'},
+            # Fraud alerts listing; partial so the (few) flagged claims are all it holds
+            {'fields': ['-service_date', '-id'], 'name': 'fraud_alerts', 'partialFilterExpression': {'fraud_flag': True}},
+        ],
+    }
+
+    def save(self, *args, **kwargs):
+        self.updated_at = datetime.utcnow()
+        return super().save(*args, **kwargs)
+
+
+class ReviewItem(Document):
+    """One claim waiting for (or under) payor review. See claimsapp.review_queue."""
+    claim_id = ObjectIdField(required=True, unique=True)
+    claim_number = StringField(required=True)
+    amount_cents = IntField(required=True)
+    fraud_flag = BooleanField(default=False)
+    sla_deadline = DateTimeField(required=True)
+    # Lower is more urgent; see review_queue.compute_priority
+    priority = FloatField(required=True)
+    state = StringField(required=True, choices=['open', 'done'], default='open')
+    lease_owner = ObjectIdField()
+    # Epoch for unleased items, so "available" is a single range predicate
+    lease_until = DateTimeField(default=lambda: datetime(1970, 1, 1))
+    enqueued_at = DateTimeField(default=datetime.utcnow)
+    completed_at = DateTimeField()
+
+    meta = {
+        'collection': 'review_queue',
+        'indexes': [
+            # claim_next: equality on state, sort on priority, range on lease_until
+            {'fields': ['state', 'priority', 'lease_until'], 'name': 'state_priority_lease'},
+            # age percentiles read enqueued_at from this index without touching documents
+            {'fields': ['state', 'enqueued_at'], 'name': 'state_enqueued_at'},
+            {'fields': ['state', 'sla_deadline'], 'name': 'state_sla_deadline'},
+            {'fields': ['lease_owner', 'state'], 'name': 'lease_owner_state'},
+        ],
+    }
+
+
+class FraudBaseline(Document):
+    """Running per-group statistics used by the fraud scorer.
+
+    ``_id`` is ``<kind>:<key>`` (provider, service, specialty or pair).
+    ``n``/``mean``/``m2`` are Welford aggregates merged batch by batch.
+    """
+    id = StringField(primary_key=True)
+    n = IntField(default=0)
+    mean = FloatField(default=0.0)
+    m2 = FloatField(default=0.0)
+
+    meta = {'collection': 'fraud_baseline'}
+
+
+class JobWatermark(Document):
+    """Highest claim ``_id`` a batch job has processed, for incremental runs."""
+    id = StringField(primary_key=True)
+    last_id = ObjectIdField()
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {'collection': 'job_watermark'}
+
+
+class Coverage(Document):
+    """A member's plan terms in integer cents. ``_id`` is the patient's user id.
+
+    Parsed once from the display strings in the patient profile ("$1,500");
+    see claimsapp.coverage.
+    """
+    id = ObjectIdField(primary_key=True)
+    insurance_provider = StringField()
+    plan_type = StringField()
+    member_number = StringField()
+    group_number = StringField()
+    effective_date = DateTimeField()
+    copay_cents = IntField(default=0, min_value=0)
+    deductible_cents = IntField(default=0, min_value=0)
+    oop_max_cents = IntField(default=0, min_value=0)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {'collection': 'coverage'}
+
+
+class Accumulator(Document):
+    """Deductible and out-of-pocket spend of one member in one plan year.
+
+    ``_id`` is ``<member id>:<plan year>``. Incremented as claims are applied;
+    ``version`` guards the read-compute-increment against concurrent claims.
+    """
+    id = StringField(primary_key=True)
+    member_id = ObjectIdField(required=True)
+    plan_year = IntField(required=True)
+    deductible_cents = IntField(default=0)
+    oop_cents = IntField(default=0)
+    claims = IntField(default=0)
+    version = IntField(default=0)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {'collection': 'accumulator'}
+
+
+class IngestJob(Document):
+    """One bulk claim upload; claimsapp.ingest updates the counters after every chunk."""
+    provider_id = ObjectIdField(required=True)
+    format = StringField(required=True, choices=INGEST_FORMATS)
+    state = StringField(required=True, choices=['queued', 'running', 'done', 'failed'], default='queued')
+    bytes = IntField(default=0)
+    rows = IntField(default=0)
+    inserted = IntField(default=0)
+    failed = IntField(default=0)
+    # the first INGEST_MAX_ERRORS of {'row': n, 'error': message}
+    errors = ListField(DictField())
+    message = StringField()
+    rows_per_second = FloatField()
+    submitted_at = DateTimeField(default=datetime.utcnow)
+    started_at = DateTimeField()
+    finished_at = DateTimeField()
+
+    meta = {
+        'collection': 'ingest_job',
+        'indexes': [{'fields': ['provider_id', '-submitted_at'], 'name': 'provider_submitted_at'}],
+    }
+
+
+class ClaimRollup(Document):
+    """Claim counts and amounts by status for one owner and submission day.
+
+    ``_id`` is ``<scope>:<owner id>:<YYYY-MM-DD>``, or ``<scope>:<owner id>:total``
+    for the lifetime bucket; scope ``all`` (owner ``-``) is the whole book.
+    Maintained with ``$inc`` by claimsapp.rollups.
+    """
+    id = StringField(primary_key=True)
+    scope = StringField(required=True, choices=ROLLUP_SCOPES)
+    owner_id = ObjectIdField()
+    # None for the lifetime bucket
+    day = DateTimeField()
+    # status -> claims, status -> summed amount_cents
+    counts = DictField()
+    amount_cents = DictField()
+    fraud_flagged = IntField(default=0)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'claim_rollup',
+        'indexes': [{'fields': ['scope', 'owner_id', 'day'], 'name': 'scope_owner_day'}],
+    }
@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from django.conf import settings
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, object_id):
+    raw = json.dumps([sort_value.isoformat(), str(object_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, object_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), ObjectId(object_id)
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+
+def page_size(requested):
+    # Clamp ?limit= to the server-side cap so one request can never pull a full history
+    try:
+        size = int(requested) if requested else settings.CLAIMS_PAGE_SIZE
+    except (TypeError, ValueError):
+        size = settings.CLAIMS_PAGE_SIZE
+    return max(1, min(size, settings.CLAIMS_MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, sort_field, cursor, limit, fields):
+    """Return one page of raw documents ordered by (sort_field, _id) descending.
+
+    Instead of skip/offset the query resumes strictly after the last row of
+    the previous page, so with an index on (owner, -sort_field, -_id) every page
+    costs the same regardless of how deep it is.
+    """
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        queryset = queryset.filter(__raw__={'$or': [
+            {sort_field: {'$lt': sort_value}},
+            {sort_field: sort_value, '_id': {'$lt': last_id}},
+        ]})
+    rows = list(
+        queryset.order_by(f'-{sort_field}', '-id')
+        .only(*fields)
+        .limit(limit + 1)
+        .as_pymongo()
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort_field], last['_id'])
+    return rows, next_cursor
@@ -0,0 +1,192 @@
+"""SLA-aware work queue for payor claim review.
+
+The queue is a Mongo collection ordered by an index on (state, priority,
+lease_until), so enqueue, re-prioritise and claim-next are each a single
+B-tree operation (O(log n)) and are shared by every worker process. Leasing
+is one find_one_and_update, so two reviewers can never receive the same
+claim; a lease that is not completed or renewed expires and the item becomes
+available again.
+
+Priority is an *effective deadline*: the SLA deadline pulled earlier for large
+amounts and for fraud-flagged claims. Because it is an absolute timestamp the
+ordering never drifts with time and nothing has to be rescored periodically.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from pymongo import ReturnDocument, UpdateOne
+
+from notificationsapp.services import CLAIM_FIELDS, notify_claims
+from .models import Claim, ReviewItem
+from .rollups import ROLLUP_FIELDS, claim_rollups
+
+EPOCH = datetime(1970, 1, 1)
+AMOUNT_BOOST_HOURS_PER_1000 = 1.0
+AMOUNT_BOOST_MAX_HOURS = 24.0
+FRAUD_BOOST_HOURS = 48.0
+# stats() reads the exact ages up to this many open items and a random sample of this many beyond
+STATS_SAMPLE_SIZE = 1000
+
+
+def compute_priority(sla_deadline, amount_cents, fraud_flag):
+    boost = min(AMOUNT_BOOST_MAX_HOURS, amount_cents / 100_000 * AMOUNT_BOOST_HOURS_PER_1000)
+    if fraud_flag:
+        boost += FRAUD_BOOST_HOURS
+    return (sla_deadline - EPOCH).total_seconds() - boost * 3600
+
+
+class ReviewQueue:
+    def __init__(self, lease_seconds=None):
+        self.lease_seconds = lease_seconds
+
+    @property
+    def collection(self):
+        return ReviewItem._get_collection()
+
+    def _lease_duration(self):
+        return timedelta(seconds=self.lease_seconds or settings.REVIEW_LEASE_SECONDS)
+
+    def enqueue(self, claim, fraud_flag=False, sla_deadline=None):
+        """Add a claim (or refresh it if already queued). Returns its priority."""
+        query, update = self._enqueue_update(claim.id, claim.claim_number, claim.amount_cents, claim.submitted_at, fraud_flag, sla_deadline)
+        self.collection.update_one(*self._reopen_update(claim.id))
+        self.collection.update_one(query, update, upsert=True)
+        return update['$set']['priority']
+
+    def enqueue_many(self, claims):
+        """Bulk enqueue of raw claim documents (``_id``, ``claim_number``, ``amount_cents``, ...)."""
+        ops = [
+            UpdateOne(*self._enqueue_update(c['_id'], c['claim_number'], c['amount_cents'], c.get('submitted_at'), bool(c.get('fraud_flag'))), upsert=True)
+            for c in claims
+        ]
+        if ops:
+            # reopen first: the upsert sets state to open, after which a done item no longer matches
+            self.collection.bulk_write([UpdateOne(*self._reopen_update(c['_id'])) for c in claims], ordered=False)
+            self.collection.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    def _reopen_update(self, claim_id):
+        # a finished item comes back unleased; the lease of an item still open is left alone
+        return {'claim_id': claim_id, 'state': 'done'}, {
+            '$set': {'state': 'open', 'lease_until': EPOCH},
+            '$unset': {'lease_owner': '', 'completed_at': ''},
+        }
+
+    def _enqueue_update(self, claim_id, claim_number, amount_cents, submitted_at, fraud_flag, sla_deadline=None):
+        if sla_deadline is None:
+            sla_deadline = (submitted_at or datetime.utcnow()) + timedelta(hours=settings.REVIEW_SLA_HOURS)
+        return {'claim_id': claim_id}, {
+            '$set': {
+                'claim_number': claim_number,
+                'amount_cents': amount_cents,
+                'fraud_flag': fraud_flag,
+                'sla_deadline': sla_deadline,
+                'priority': compute_priority(sla_deadline, amount_cents, fraud_flag),
+                'state': 'open',
+            },
+            '$setOnInsert': {'lease_until': EPOCH, 'enqueued_at': datetime.utcnow()},
+        }
+
+    def reprioritize(self, claim_id, amount_cents=None, fraud_flag=None, sla_deadline=None):
+        """Recompute the priority of an open item after its inputs changed."""
+        priorities = self.reprioritize_many([claim_id], amount_cents, fraud_flag, sla_deadline)
+        return priorities.get(claim_id)
+
+    def reprioritize_many(self, claim_ids, amount_cents=None, fraud_flag=None, sla_deadline=None):
+        """reprioritize for many claims: one $in read and one bulk_write. Returns {claim_id: priority} for the open ones."""
+        items = self.collection.find(
+            {'claim_id': {'$in': list(claim_ids)}, 'state': 'open'},
+            {'claim_id': 1, 'amount_cents': 1, 'fraud_flag': 1, 'sla_deadline': 1},
+        )
+        ops, priorities = [], {}
+        for item in items:
+            changes = {
+                'amount_cents': item['amount_cents'] if amount_cents is None else amount_cents,
+                'fraud_flag': item['fraud_flag'] if fraud_flag is None else fraud_flag,
+                'sla_deadline': item['sla_deadline'] if sla_deadline is None else sla_deadline,
+            }
+            changes['priority'] = priorities[item['claim_id']] = compute_priority(changes['sla_deadline'], changes['amount_cents'], changes['fraud_flag'])
+            ops.append(UpdateOne({'_id': item['_id'], 'state': 'open'}, {'$set': changes}))
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        return priorities
+
+    def claim_next(self, reviewer_id):
+        """Atomically lease the most urgent available item to reviewer_id."""
+        now = datetime.utcnow()
+        item = self.collection.find_one_and_update(
+            {'state': 'open', 'lease_until': {'$lte': now}},
+            {'$set': {'lease_owner': reviewer_id, 'lease_until': now + self._lease_duration()}},
+            sort=[('priority', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if item is not None:
+            change = {'payor_id': reviewer_id, 'status': 'under_review'}
+            before = Claim._get_collection().find_one_and_update(
+                {'_id': item['claim_id']}, {'$set': {**change, 'updated_at': now}}, projection={**ROLLUP_FIELDS, **CLAIM_FIELDS},
+            )
+            if before is not None:
+                claim_rollups.changed([(before, change)])
+                if before['status'] != 'under_review':
+                    notify_claims([(before, 'under_review')])
+        return item
+
+    def renew(self, claim_id, reviewer_id):
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'claim_id': claim_id, 'state': 'open', 'lease_owner': reviewer_id, 'lease_until': {'$gt': now}},
+            {'$set': {'lease_until': now + self._lease_duration()}},
+        )
+        return result.modified_count == 1
+
+    def release(self, claim_id, reviewer_id):
+        result = self.collection.update_one(
+            {'claim_id': claim_id, 'state': 'open', 'lease_owner': reviewer_id},
+            {'$set': {'lease_until': EPOCH}, '$unset': {'lease_owner': ''}},
+        )
+        return result.modified_count == 1
+
+    def complete(self, claim_id, reviewer_id):
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'claim_id': claim_id, 'state': 'open', 'lease_owner': reviewer_id, 'lease_until': {'$gt': now}},
+            {'$set': {'state': 'done', 'completed_at': now}},
+        )
+        if result.modified_count != 1:
+            return False
+        claim = Claim._get_collection().find_one({'_id': claim_id}, CLAIM_FIELDS)
+        if claim is not None:
+            notify_claims([(claim, 'review_complete')])
+        return True
+
+    def peek(self, limit=20):
+        return list(self.collection.find({'state': 'open'}).sort('priority', 1).limit(limit))
+
+    def leased_by(self, reviewer_id):
+        return list(self.collection.find({'lease_owner': reviewer_id, 'state': 'open', 'lease_until': {'$gt': datetime.utcnow()}}))
+
+    def stats(self, percentiles=(50, 90, 99)):
+        now = datetime.utcnow()
+        depth = self.collection.count_documents({'state': 'open'})
+        leased = self.collection.count_documents({'state': 'open', 'lease_until': {'$gt': now}})
+        overdue = self.collection.count_documents({'state': 'open', 'sla_deadline': {'$lt': now}})
+        ages = {f'p{pct}': None for pct in percentiles}
+        if depth:
+            # one read of at most STATS_SAMPLE_SIZE ages instead of a skip() per percentile
+            if depth <= STATS_SAMPLE_SIZE:
+                rows = self.collection.find({'state': 'open'}, {'enqueued_at': 1, '_id': 0})
+            else:
+                rows = self.collection.aggregate([
+                    {'$match': {'state': 'open'}},
+                    {'$sample': {'size': STATS_SAMPLE_SIZE}},
+                    {'$project': {'enqueued_at': 1, '_id': 0}},
+                ])
+            enqueued = sorted(row['enqueued_at'] for row in rows)
+            for pct in percentiles if enqueued else ():
+                # the pct-th percentile age is the enqueued_at (100 - pct)% of the way from the oldest
+                offset = min(len(enqueued) - 1, int(len(enqueued) * (100 - pct) / 100))
+                ages[f'p{pct}'] = round((now - enqueued[offset]).total_seconds(), 1)
+        return {'depth': depth, 'leased': leased, 'available': depth - leased, 'overdue': overdue, 'age_seconds': ages}
+
+
+review_queue = ReviewQueue()
@@ -0,0 +1,240 @@
+"""Pre-aggregated claim counts for the payor and provider dashboards.
+
+Each claim counts towards one ClaimRollup per owner it has (the whole book,
+its provider and, once a reviewer leases it, its payor), in two buckets: the
+day it was submitted and the owner's lifetime total. A bucket holds claim
+counts and summed amounts by status, plus the number of fraud-flagged claims.
+
+Every write that creates claims or changes their status, payor or fraud flag
+passes the claims' old fields and the change to ClaimRollups, which turns them
+into one ``$inc`` per touched bucket. A dashboard read is then a single
+``_id`` lookup whatever the claim volume, and a daily series reads one small
+document per day.
+
+The increments are not in a transaction with the claim write, so a process
+that dies between the two leaves the rollups off. ``manage.py check_rollups``
+recomputes the expected buckets from the claims and reports (or ``--fix``es)
+drift; ``manage.py rebuild_rollups`` replaces them all (with writers stopped). Both use the same
+contribution function as the live path. A check that runs while claims are
+being written can see drift that is only in flight; drift that persists
+across two checks is real.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .models import Claim, ClaimRollup
+from .serializers import format_amount
+
+# the claim fields a rollup depends on; pass at least these to added/changed
+FIELDS = ('status', 'provider_id', 'payor_id', 'amount_cents', 'fraud_flag', 'submitted_at')
+ROLLUP_FIELDS = dict.fromkeys(FIELDS, 1)
+PENDING_STATUSES = ('submitted', 'processing', 'under_review', 'pending_docs')
+PROCESSED_STATUSES = ('approved', 'denied', 'paid')
+PAYOUT_STATUSES = ('approved', 'paid')
+MAX_DAYS = 366
+
+
+def claim_fields(claim):
+    """The rollup fields of a Claim document, as a raw dict."""
+    doc = {field: getattr(claim, field) for field in FIELDS}
+    doc['_id'] = claim.id
+    return doc
+
+
+def owners(doc):
+    yield 'all', None
+    yield 'provider', doc.get('provider_id')
+    if doc.get('payor_id'):
+        yield 'payor', doc['payor_id']
+
+
+def bucket_day(doc):
+    when = doc.get('submitted_at') or doc['_id'].generation_time.replace(tzinfo=None)
+    return datetime(when.year, when.month, when.day)
+
+
+def rollup_id(scope, owner_id, day):
+    return f'{scope}:{owner_id or "-"}:{day.strftime("%Y-%m-%d") if day else "total"}'
+
+
+def contribute(deltas, doc, sign):
+    """Add (sign 1) or take away (sign -1) one claim in ``deltas`` {(scope, owner, day): Counter}."""
+    status = doc.get('status') or 'submitted'
+    amount = doc.get('amount_cents') or 0
+    day = bucket_day(doc)
+    for scope, owner_id in owners(doc):
+        for bucket in (day, None):
+            fields = deltas[scope, owner_id, bucket]
+            fields[f'counts.{status}'] += sign
+            fields[f'amount_cents.{status}'] += sign * amount
+            if doc.get('fraud_flag'):
+                fields['fraud_flagged'] += sign
+
+
+def increment(_id, key, fields, now):
+    """The upsert adding ``fields`` to one bucket; ``key`` is None for a bucket that must already exist."""
+    inc = {field: delta for field, delta in fields.items() if delta}
+    if not inc:
+        return None
+    update = {'$inc': inc, '$set': {'updated_at': now}}
+    if key is None:
+        return UpdateOne({'_id': _id}, update)
+    scope, owner_id, day = key
+    update['$setOnInsert'] = {'scope': scope, 'owner_id': owner_id, 'day': day}
+    return UpdateOne({'_id': _id}, update, upsert=True)
+
+
+def bucket_document(key, fields, now):
+    """The ClaimRollup document holding ``fields`` (as made by ``contribute``) for one bucket."""
+    scope, owner_id, day = key
+    doc = {'_id': rollup_id(scope, owner_id, day), 'scope': scope, 'owner_id': owner_id, 'day': day,
+           'counts': {}, 'amount_cents': {}, 'fraud_flagged': 0, 'updated_at': now}
+    for field, value in fields.items():
+        if '.' in field:
+            group, status = field.split('.', 1)
+            doc[group][status] = value
+        else:
+            doc[field] = value
+    return doc
+
+
+def flatten(doc):
+    fields = Counter({f'counts.{status}': n for status, n in (doc.get('counts') or {}).items()})
+    fields.update({f'amount_cents.{status}': n for status, n in (doc.get('amount_cents') or {}).items()})
+    fields['fraud_flagged'] += doc.get('fraud_flagged') or 0
+    return fields
+
+
+def stats(doc):
+    counts = doc.get('counts') or {}
+    amounts = doc.get('amount_cents') or {}
+    payouts = sum(amounts.get(status, 0) for status in PAYOUT_STATUSES)
+    return {
+        'claims': sum(counts.values()),
+        'pendingClaims': sum(counts.get(status, 0) for status in PENDING_STATUSES),
+        'processedClaims': sum(counts.get(status, 0) for status in PROCESSED_STATUSES),
+        'approvedClaims': sum(counts.get(status, 0) for status in PAYOUT_STATUSES),
+        'deniedClaims': counts.get('denied', 0),
+        'approvedCents': payouts,
+        'approvedAmount': format_amount(payouts),
+        'fraudAlerts': doc.get('fraud_flagged') or 0,
+        'byStatus': {status: {'count': n, 'amountCents': amounts.get(status, 0)} for status, n in counts.items() if n},
+    }
+
+
+class ClaimRollups:
+    @property
+    def collection(self):
+        return ClaimRollup._get_collection()
+
+    def added(self, docs):
+        """Count newly inserted claims (raw documents with ROLLUP_FIELDS)."""
+        deltas = defaultdict(Counter)
+        for doc in docs:
+            contribute(deltas, doc, 1)
+        self.apply(deltas)
+
+    def removed(self, docs):
+        deltas = defaultdict(Counter)
+        for doc in docs:
+            contribute(deltas, doc, -1)
+        self.apply(deltas)
+
+    def changed(self, changes):
+        """Move claims between buckets; ``changes`` is [(old fields, {field: new value})]."""
+        deltas = defaultdict(Counter)
+        for before, update in changes:
+            contribute(deltas, before, -1)
+            contribute(deltas, {**before, **update}, 1)
+        self.apply(deltas)
+
+    def apply(self, deltas):
+        now = datetime.utcnow()
+        self.write([increment(rollup_id(*key), key, fields, now) for key, fields in deltas.items()])
+
+    def write(self, ops):
+        ops = [op for op in ops if op is not None]
+        if not ops:
+            return
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as exc:
+            # two first increments of a new bucket raced on the upsert; the loser retries as an update
+            failures = exc.details.get('writeErrors', [])
+            if any(failure.get('code') != 11000 for failure in failures):
+                raise
+            self.collection.bulk_write([ops[failure['index']] for failure in failures], ordered=False)
+
+    def summary(self, scope, owner_id=None, days=0):
+        """Lifetime stats for one owner, plus the last ``days`` days one by one."""
+        result = stats(self.collection.find_one({'_id': rollup_id(scope, owner_id, None)}) or {})
+        if days:
+            today = bucket_day({'submitted_at': datetime.utcnow()})
+            rows = self.collection.find({'scope': scope, 'owner_id': owner_id, 'day': {'$gt': today - timedelta(days=days)}}).sort('day', 1)
+            result['days'] = [{'day': row['day'].strftime('%Y-%m-%d'), **stats(row)} for row in rows]
+        return result
+
+    def expected(self, batch_size=5000):
+        """Recompute every bucket from the claims: {(scope, owner, day): Counter}."""
+        deltas = defaultdict(Counter)
+        for doc in Claim._get_collection().find({}, ROLLUP_FIELDS).batch_size(batch_size):
+            contribute(deltas, doc, 1)
+        return deltas
+
+    def check(self):
+        """Buckets whose stored fields differ from the claims: [{'id', 'field', 'expected', 'actual'}]."""
+        expected = {rollup_id(*key): (key, fields) for key, fields in self.expected().items()}
+        stored = {row['_id']: row for row in self.collection.find()}
+        drift = []
+        for _id in sorted(expected.keys() | stored.keys()):
+            want = expected[_id][1] if _id in expected else Counter()
+            have = flatten(stored[_id]) if _id in stored else Counter()
+            for field in sorted(want.keys() | have.keys()):
+                if want[field] != have[field]:
+                    key = expected[_id][0] if _id in expected else None
+                    drift.append({'id': _id, 'key': key, 'field': field, 'expected': want[field], 'actual': have[field]})
+        return drift
+
+    def fix(self, drift):
+        """Increment drifted fields by the difference, leaving concurrent increments intact."""
+        deltas, keys = defaultdict(Counter), {}
+        for row in drift:
+            deltas[row['id']][row['field']] += row['expected'] - row['actual']
+            keys[row['id']] = row['key']
+        now = datetime.utcnow()
+        self.write([increment(_id, keys[_id], fields, now) for _id, fields in deltas.items()])
+
+    def rebuild(self, batch_size=5000):
+        """Replace every rollup with one recomputed from the claims; returns the number written.
+
+        The claims are streamed (memory grows with the number of buckets, not
+        claims) into a scratch collection, which is indexed and then renamed
+        over the live one, so dashboards never see missing or half-built
+        rollups. Increments that land on the live collection while this runs
+        are dropped with it, so stop the writers (ingestion, adjudication, the
+        review queue and fraud scoring) first; check_rollups shows anything missed.
+        """
+        live = self.collection
+        scratch = live.database[f'{live.name}_rebuild']
+        scratch.drop()
+        for spec in ClaimRollup._meta['index_specs']:
+            scratch.create_index(spec['fields'], **{key: value for key, value in spec.items() if key != 'fields'})
+        now = datetime.utcnow()
+        written = 0
+        batch = []
+        for key, fields in self.expected(batch_size).items():
+            batch.append(bucket_document(key, fields, now))
+            if len(batch) == batch_size:
+                scratch.insert_many(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            scratch.insert_many(batch, ordered=False)
+            written += len(batch)
+        scratch.rename(live.name, dropTarget=True)
+        return written
+
+claim_rollups = ClaimRollups()
@@ -0,0 +1,81 @@
+# Claims are listed from raw pymongo documents (see pagination.keyset_page),
+# so these helpers work on dicts rather than Claim instances.
+from backend.renderers import compile_row_encoder, json_date
+
+LIST_FIELDS = ['claim_number', 'provider_name', 'patient_name', 'service', 'amount_cents', 'status', 'service_date', 'description']
+FRAUD_FIELDS = LIST_FIELDS + ['fraud_score', 'fraud_reasons']
+
+PROGRESS = {
+    'submitted': 25,
+    'processing': 65,
+    'under_review': 65,
+    'pending_docs': 65,
+    'approved': 100,
+    'paid': 100,
+}
+
+
+def format_amount(cents):
+    dollars, cents = divmod(cents, 100)
+    return f'${dollars:,}' if not cents else f'${dollars:,}.{cents:02d}'
+
+
+def claim_amount(cents):
+    return format_amount(cents or 0)
+
+
+def claim_progress(status):
+    return PROGRESS.get(status, 0)
+
+
+class ClaimSerializer:
+    FIELDS = [
+        ('id', 'claim_number', None),
+        ('patient', 'patient_name', None),
+        ('provider', 'provider_name', None),
+        ('service', 'service', None),
+        ('amount', 'amount_cents', claim_amount),
+        ('status', 'status', None),
+        ('date', 'service_date', json_date),
+        ('description', 'description', None),
+        ('progress', 'status', claim_progress),
+    ]
+    serialize_many = staticmethod(compile_row_encoder('serialize_claims', FIELDS))
+
+    @classmethod
+    def serialize(cls, claim):
+        return cls.serialize_many((claim,))[0]
+
+
+class FraudAlertSerializer(ClaimSerializer):
+    FIELDS = ClaimSerializer.FIELDS + [
+        ('fraudScore', 'fraud_score', None),
+        ('fraudReasons', 'fraud_reasons', lambda reasons: reasons or []),
+    ]
+    serialize_many = staticmethod(compile_row_encoder('serialize_fraud_alerts', FIELDS))
+
+
+def priority_label(priority, now_seconds):
+    hours_left = (priority - now_seconds) / 3600
+    if hours_left < 24:
+        return 'High'
+    if hours_left < 72:
+        return 'Medium'
+    return 'Low'
+
+
+class ReviewItemSerializer:
+    @staticmethod
+    def serialize(item, claim=None, now_seconds=0):
+        claim = claim or {}
+        return {
+            'id': item['claim_number'],
+            'patient': claim.get('patient_name'),
+            'provider': claim.get('provider_name'),
+            'amount': format_amount(item['amount_cents']),
+            'status': claim.get('status'),
+            'priority': priority_label(item['priority'], now_seconds),
+            'fraudFlag': item.get('fraud_flag', False),
+            'slaDeadline': item['sla_deadline'].isoformat(),
+            'leasedUntil': item['lease_until'].isoformat() if item.get('lease_owner') else None,
+        }
@@ -0,0 +1,24 @@
+from django.urls import re_path
+from . import views
+
+urlpatterns = [
+    re_path(r'^patient/claims/?$', views.PatientClaimsView.as_view()),
+    re_path(r'^patient/coverage/?$', views.CoverageView.as_view()),
+    re_path(r'^(?:provider|payor)/members/(?P<member_id>[0-9a-f]{24})/coverage/?$', views.CoverageView.as_view()),
+    re_path(r'^provider/dashboard/?$', views.ProviderDashboardView.as_view()),
+    re_path(r'^provider/claims/?$', views.ProviderClaimsView.as_view()),
+    re_path(r'^provider/claims/export/?$', views.ProviderClaimExportView.as_view()),
+    re_path(r'^provider/claims/bulk/?$', views.BulkClaimUploadView.as_view()),
+    re_path(r'^provider/claims/bulk/(?P<job_id>[^/]+)/?$', views.BulkClaimJobView.as_view()),
+    re_path(r'^payor/dashboard/?$', views.PayorDashboardView.as_view()),
+    re_path(r'^payor/search/?$', views.PeopleSearchView.as_view()),
+    re_path(r'^payor/claims/?$', views.PayorClaimsView.as_view()),
+    re_path(r'^payor/claims/export/?$', views.PayorClaimExportView.as_view()),
+    re_path(r'^payor/members/export/?$', views.MemberExportView.as_view()),
+    re_path(r'^payor/claims/(?P<claim_number>[^/]+)/adjudicate/?$', views.AdjudicateClaimView.as_view()),
+    re_path(r'^payor/fraud-alerts/?$', views.FraudAlertsView.as_view()),
+    re_path(r'^payor/review-queue/?$', views.ReviewQueueView.as_view()),
+    re_path(r'^payor/review-queue/next/?$', views.ReviewQueueNextView.as_view()),
+    re_path(r'^payor/review-queue/stats/?$', views.ReviewQueueStatsView.as_view()),
+    re_path(r'^payor/review-queue/(?P<claim_number>[^/]+)/(?P<action>renew|release|complete)/?$', views.ReviewQueueItemView.as_view()),
+]
@@ -0,0 +1,437 @@
+import tempfile
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from authapp.audit import audit_trail
+from authapp.models import User
+from authapp.search import PROFILE_KEYS, user_search
+from .adjudication import adjudicator
+from .coverage import AccumulatorBusy, coverage_service, parse_cents
+from .export import CLAIMS, MEMBERS, Export, claim_query, member_query
+from .ingest import READ_SIZE, ingest_runner
+from .models import Claim, CLAIM_STATUSES, INGEST_FORMATS, IngestJob
+from .pagination import InvalidCursor, keyset_page, page_size
+from .review_queue import EPOCH, review_queue
+from .rollups import MAX_DAYS, claim_rollups
+from .serializers import ClaimSerializer, FraudAlertSerializer, ReviewItemSerializer, FRAUD_FIELDS, LIST_FIELDS
+
+
+class ClaimListView(APIView):
+    """Keyset-paginated claim listing for the authenticated user.
+
+    The body stays a plain array (the shape the frontend expects); the cursor
+    for the next page is returned in the ``X-Next-Cursor`` and ``Link`` headers.
+    Query params: ``cursor``, ``limit`` (capped by CLAIMS_MAX_PAGE_SIZE), ``status``.
+    """
+    permission_classes = [IsAuthenticated]
+    role = None
+    owner_field = None
+    fields = LIST_FIELDS
+    serializer = ClaimSerializer
+    audit_action = 'claims.list'
+
+    def get_queryset(self, request):
+        return Claim.objects(**{self.owner_field: ObjectId(str(request.user.id))})
+
+    def get(self, request):
+        if request.user.role != self.role:
+            return Response({'error': 'Forbidden'}, status=403)
+
+        queryset = self.get_queryset(request)
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            if status_filter not in CLAIM_STATUSES:
+                return Response({'error': f'Unknown status {status_filter}'}, status=400)
+            queryset = queryset.filter(status=status_filter)
+
+        limit = page_size(request.query_params.get('limit'))
+        try:
+            rows, next_cursor = keyset_page(queryset, 'service_date', request.query_params.get('cursor'), limit, self.fields)
+        except InvalidCursor as exc:
+            return Response({'error': str(exc)}, status=400)
+
+        audit_trail.record(self.audit_action, request, user=request.user, subject_id=request.user.id if self.role == 'patient' else None,
+                           claims=[row['claim_number'] for row in rows])
+        response = Response(self.serializer.serialize_many(rows))
+        if next_cursor:
+            params = request.query_params.copy()
+            params['cursor'] = next_cursor
+            params['limit'] = limit
+            response['X-Next-Cursor'] = next_cursor
+            response['Link'] = f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+        return response
+
+
+class PatientClaimsView(ClaimListView):
+    role = 'patient'
+    owner_field = 'patient_id'
+
+
+class ProviderClaimsView(ClaimListView):
+    role = 'provider'
+    owner_field = 'provider_id'
+
+
+class PayorClaimsView(ClaimListView):
+    role = 'payor'
+    owner_field = 'payor_id'
+
+
+class FraudAlertsView(ClaimListView):
+    """Claims flagged by the batch scorer, newest first (served by the partial fraud_alerts index)."""
+    role = 'payor'
+    fields = FRAUD_FIELDS
+    serializer = FraudAlertSerializer
+    audit_action = 'claims.fraud_alerts'
+
+    def get_queryset(self, request):
+        return Claim.objects(fraud_flag=True)
+
+
+class ExportView(APIView):
+    """GET a streamed CSV file, or NDJSON with ``?type=ndjson``; ``?gzip=1`` compresses it (see claimsapp.export).
+
+    Rows go from the cursor to the client a chunk at a time, so the response
+    never holds the whole export in memory. By default the claims are exported,
+    filtered by ``?status=`` and the inclusive service dates ``?since=`` / ``?until=``:
+    the caller's own with ``owner_field`` set, otherwise the whole book.
+    """
+    permission_classes = [IsAuthenticated]
+    role = None
+    dataset = CLAIMS
+    owner_field = None
+
+    def get_query(self, request):
+        params = request.query_params
+        owner_id = ObjectId(str(request.user.id)) if self.owner_field else None
+        return claim_query(self.owner_field, owner_id, params.get('status'), params.get('since'), params.get('until'))
+
+    def get(self, request):
+        if request.user.role != self.role:
+            return Response({'error': 'Forbidden'}, status=403)
+        params = request.query_params
+        try:
+            query, sort = self.get_query(request)
+            export = Export(self.dataset, query, sort, params.get('type') or 'csv', compress=params.get('gzip') in ('1', 'true'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=400)
+        audit_trail.record(f'{self.dataset.name}.export', request, user=request.user, params=params.dict())
+        # under ASGI a sync iterator would be read into memory whole before the first byte is sent
+        body = aiter(export) if isinstance(request._request, ASGIRequest) else export
+        response = StreamingHttpResponse(body, content_type=export.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+        # let nginx pass the chunks on instead of buffering the whole file
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class ProviderClaimExportView(ExportView):
+    role = 'provider'
+    owner_field = 'provider_id'
+
+
+class PayorClaimExportView(ExportView):
+    role = 'payor'
+
+
+class MemberExportView(ExportView):
+    """Every patient with their plan details, newest first."""
+    role = 'payor'
+    dataset = MEMBERS
+
+    def get_query(self, request):
+        return member_query()
+
+
+class ReviewQueueBaseView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def serialize_items(self, items):
+        claims = {
+            c['_id']: c for c in Claim.objects(id__in=[i['claim_id'] for i in items])
+            .only('patient_name', 'provider_name', 'status').as_pymongo()
+        }
+        now_seconds = (datetime.utcnow() - EPOCH).total_seconds()
+        return [ReviewItemSerializer.serialize(i, claims.get(i['claim_id']), now_seconds) for i in items]
+
+
+def _claim_id(claim_number):
+    claim = Claim.objects(claim_number=claim_number).only('id').first()
+    return claim.id if claim else None
+
+
+class ReviewQueueView(ReviewQueueBaseView):
+    """GET: the most urgent open items ("Claims Requiring Review")."""
+
+    def get(self, request):
+        if request.user.role != 'payor':
+            return Response({'error': 'Forbidden'}, status=403)
+        limit = page_size(request.query_params.get('limit'))
+        items = review_queue.peek(limit)
+        audit_trail.record('review_queue.read', request, user=request.user, claims=[i['claim_number'] for i in items])
+        return Response(self.serialize_items(items))
+
+
+class ReviewQueueNextView(ReviewQueueBaseView):
+    """POST: lease the next item to the calling reviewer (204 when the queue is empty)."""
+
+    def post(self, request):
+        if request.user.role != 'payor':
+            return Response({'error': 'Forbidden'}, status=403)
+        item = review_queue.claim_next(ObjectId(str(request.user.id)))
+        if item is None:
+            return Response(status=204)
+        audit_trail.record('review_queue.next', request, user=request.user, claims=[item['claim_number']])
+        return Response(self.serialize_items([item])[0])
+
+
+class ReviewQueueItemView(ReviewQueueBaseView):
+    """POST .../<claim_number>/<action>/ where action is renew, release or complete."""
+    actions = {
+        'renew': review_queue.renew,
+        'release': review_queue.release,
+        'complete': review_queue.complete,
+    }
+
+    def post(self, request, claim_number, action):
+        if request.user.role != 'payor':
+            return Response({'error': 'Forbidden'}, status=403)
+        claim_id = _claim_id(claim_number)
+        if claim_id is None:
+            return Response({'error': 'Not Found'}, status=404)
+        if not self.actions[action](claim_id, ObjectId(str(request.user.id))):
+            return Response({'error': 'You do not hold a lease on this claim'}, status=409)
+        return Response({'success': True})
+
+
+class AdjudicateClaimView(APIView):
+    """POST: run the adjudication rules on one open claim now."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, claim_number):
+        if request.user.role != 'payor':
+            return Response({'error': 'Forbidden'}, status=403)
+        claim = Claim.objects(claim_number=claim_number).first()
+        if claim is None:
+            return Response({'error': 'Not Found'}, status=404)
+        try:
+            decision = adjudicator.adjudicate(claim)
+        except AccumulatorBusy:
+            # the claim was left open and uncharged
+            response = Response({'error': "The member's benefits are being updated, please retry"}, status=503)
+            response['Retry-After'] = '1'
+            return response
+        if decision is None:
+            return Response({'error': f'Claim is already {claim.status}'}, status=409)
+        audit_trail.record('claims.adjudicate', request, user=request.user, subject_id=claim.patient_id, claims=[claim.claim_number])
+        share = decision['cost_share']
+        return Response({
+            'id': claim.claim_number,
+            'outcome': decision['outcome'],
+            'status': decision['status'],
+            'reasons': decision['reasons'],
+            'memberCents': share['member_cents'] if share else None,
+            'planPaysCents': share['plan_paid_cents'] if share else None,
+        })
+
+
+class ReviewQueueStatsView(ReviewQueueBaseView):
+    def get(self, request):
+        if request.user.role != 'payor':
+            return Response({'error': 'Forbidden'}, status=403)
+        return Response(review_queue.stats())
+
+
+class CoverageView(APIView):
+    """GET: eligibility, plan terms and remaining deductible and out-of-pocket.
+
+    Patients read their own at ``patient/coverage``; providers and payors look a
+    member up by user id at ``<role>/members/<id>/coverage``. ``?amount=`` adds
+    the member's estimated share of a claim of that amount.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, member_id=None):
+        user = request.user
+        if member_id is None:
+            if user.role != 'patient':
+                return Response({'error': 'Forbidden'}, status=403)
+            member_id, member = ObjectId(str(user.id)), user
+        else:
+            if user.role not in ('provider', 'payor'):
+                return Response({'error': 'Forbidden'}, status=403)
+            member_id, member = ObjectId(member_id), None
+        try:
+            summary = coverage_service.summary(member_id, member)
+            amount = parse_cents(request.query_params.get('amount'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=400)
+        if summary is None:
+            return Response({'error': 'Not Found'}, status=404)
+        audit_trail.record('coverage.read', request, user=user, subject_id=member_id)
+        if amount is not None:
+            summary = {**summary, 'estimate': coverage_service.estimate(summary, amount)}
+        return Response(summary)
+
+
+class DashboardView(APIView):
+    """GET: the stat cards for ``provider/dashboard`` or ``payor/dashboard``.
+
+    Read from the pre-aggregated rollups, so the cost does not grow with the
+    claim count. Providers see their own claims; payors see the whole book and
+    the claims they have taken for review. ``?days=`` adds a per-day series.
+    """
+    permission_classes = [IsAuthenticated]
+    role = None
+
+    def get(self, request):
+        if request.user.role != self.role:
+            return Response({'error': 'Forbidden'}, status=403)
+        try:
+            days = int(request.query_params.get('days') or 0)
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=400)
+        days = max(0, min(days, MAX_DAYS))
+        user_id = ObjectId(str(request.user.id))
+        if self.role == 'provider':
+            return Response(claim_rollups.summary('provider', user_id, days))
+        return Response({**claim_rollups.summary('all', None, days), 'mine': claim_rollups.summary('payor', user_id, days)})
+
+
+class ProviderDashboardView(DashboardView):
+    role = 'provider'
+
+
+class PayorDashboardView(DashboardView):
+    role = 'payor'
+
+
+class PeopleSearchView(APIView):
+    """GET ``?q=``: members and providers by partial name, memberId, npiNumber or licenseNumber.
+
+    ``role=patient|provider`` narrows the search; ``limit`` is capped by
+    USER_SEARCH_MAX_RESULTS. Results come ranked from the in-memory index
+    (authapp.search) and are then read by _id for display.
+    """
+    permission_classes = [IsAuthenticated]
+    roles = ('patient', 'provider')
+
+    def get(self, request):
+        if request.user.role != 'payor':
+            return Response({'error': 'Forbidden'}, status=403)
+        query = (request.query_params.get('q') or '').strip()
+        role = request.query_params.get('role')
+        if not query:
+            return Response({'error': 'q is required'}, status=400)
+        if role and role not in self.roles:
+            return Response({'error': f'role must be one of {", ".join(self.roles)}'}, status=400)
+        try:
+            limit = min(int(request.query_params.get('limit') or 20), settings.USER_SEARCH_MAX_RESULTS)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        hits = user_search.search(query, roles=[role] if role else self.roles, limit=limit)
+        ids = [ObjectId(user_id) for user_id, _ in hits]
+        projection = {'name': 1, 'role': 1, 'profile.specialty': 1, **{f'profile.{key}': 1 for key in PROFILE_KEYS}}
+        users = {doc['_id']: doc for doc in User._get_collection().find({'_id': {'$in': ids}, 'is_active': {'$ne': False}}, projection)}
+        results = []
+        for user_id, (_, match) in zip(ids, hits):
+            doc = users.get(user_id)
+            if doc is None:
+                continue  # deleted since the index last saw it
+            profile = doc.get('profile') or {}
+            results.append({
+                'id': str(user_id), 'name': doc.get('name'), 'role': doc.get('role'), 'match': match,
+                **{key: profile[key] for key in (*PROFILE_KEYS, 'specialty') if profile.get(key)},
+            })
+        audit_trail.record('people.search', request, user=request.user, q=query, results=[r['id'] for r in results])
+        return Response({'results': results})
+
+
+CONTENT_TYPE_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+    'application/edi-x12': 'x12',
+}
+
+
+def serialize_job(job):
+    return {
+        'jobId': str(job.id),
+        'state': job.state,
+        'format': job.format,
+        'bytes': job.bytes,
+        'rows': job.rows,
+        'inserted': job.inserted,
+        'failed': job.failed,
+        'errors': job.errors,
+        'errorsTruncated': job.failed > len(job.errors),
+        'rowsPerSecond': job.rows_per_second,
+        'message': job.message,
+        'submittedAt': job.submitted_at.isoformat() if job.submitted_at else None,
+        'startedAt': job.started_at.isoformat() if job.started_at else None,
+        'finishedAt': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class BulkClaimUploadView(APIView):
+    """POST a file of claims (NDJSON, CSV or simplified 837; see claimsapp.ingest).
+
+    The format comes from ``?type=`` (``?format=`` belongs to DRF) or the Content-Type. The body is spooled
+    and ingested in the background; the 202 response carries the job id to poll.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+        if user.role != 'provider':
+            return Response({'error': 'Forbidden'}, status=403)
+        fmt = request.query_params.get('type') or CONTENT_TYPE_FORMATS.get(request.content_type.split(';')[0].strip())
+        if fmt not in INGEST_FORMATS:
+            return Response({'error': f'Send ?type= one of {", ".join(INGEST_FORMATS)}'}, status=400)
+        stream = request.stream
+        if stream is None:
+            return Response({'error': 'Empty upload'}, status=400)
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.INGEST_SPOOL_MEMORY_BYTES)
+        size = 0
+        while True:
+            block = stream.read(READ_SIZE)
+            if not block:
+                break
+            size += len(block)
+            if size > settings.INGEST_MAX_BYTES:
+                spool.close()
+                return Response({'error': f'Upload is larger than {settings.INGEST_MAX_BYTES} bytes'}, status=413)
+            spool.write(block)
+        spool.seek(0)
+
+        job = IngestJob(provider_id=ObjectId(str(user.id)), format=fmt, bytes=size)
+        job.save()
+        provider = (job.provider_id, user.name, (user.profile or {}).get('specialty'))
+        ingest_runner.submit(job.id, spool, fmt, provider)
+        location = request.build_absolute_uri(f'{request.path.rstrip("/")}/{job.id}')
+        return Response({'success': True, 'jobId': str(job.id), 'state': job.state}, status=202, headers={'Location': location})
+
+
+class BulkClaimJobView(APIView):
+    """GET progress, throughput and row errors of one of the caller's uploads."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        if request.user.role != 'provider':
+            return Response({'error': 'Forbidden'}, status=403)
+        try:
+            job = IngestJob.objects(id=ObjectId(job_id), provider_id=ObjectId(str(request.user.id))).first()
+        except InvalidId:
+            job = None
+        if job is None:
+            return Response({'error': 'Not Found'}, status=404)
+        return Response(serialize_job(job))
@@ -0,0 +1,76 @@
+# Push endpoints for new notifications. Run under ASGI (backend.asgi): each open
+# stream is a suspended coroutine rather than a blocked worker thread.
+import asyncio
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+from rest_framework import exceptions
+
+from authapp.authentication import authenticate_async
+from backend.renderers import FastJsonResponse, dumps
+from .broker import broker
+from .serializers import NotificationSerializer
+
+
+async def _authenticate(request):
+    try:
+        # EventSource cannot send headers, so the stream also accepts ?token=
+        user = await authenticate_async(request, token=request.GET.get('token'))
+    except exceptions.AuthenticationFailed as exc:
+        return None, FastJsonResponse({'detail': str(exc.detail)}, status=403)
+    if user is None:
+        return None, FastJsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+    return user, None
+
+
+@require_http_methods(['GET'])
+async def stream(request):
+    """Server-Sent Events: one ``notification`` event per new row, plus keep-alives."""
+    user, denied = await _authenticate(request)
+    if denied:
+        return denied
+
+    async def events():
+        queue = broker.subscribe(user.id)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    doc = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATIONS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                payload = dumps(NotificationSerializer.serialize(doc)).decode('utf-8')
+                yield f'id: {doc["_id"]}\nevent: notification\ndata: {payload}\n\n'
+        finally:
+            broker.unsubscribe(user.id, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_http_methods(['GET'])
+async def long_poll(request):
+    """Wait up to ?timeout= seconds (capped) for new notifications; 204 if none arrive."""
+    user, denied = await _authenticate(request)
+    if denied:
+        return denied
+    try:
+        timeout = min(float(request.GET.get('timeout', settings.NOTIFICATIONS_LONG_POLL_SECONDS)), settings.NOTIFICATIONS_LONG_POLL_SECONDS)
+    except ValueError:
+        timeout = settings.NOTIFICATIONS_LONG_POLL_SECONDS
+
+    queue = broker.subscribe(user.id)
+    try:
+        try:
+            docs = [await asyncio.wait_for(queue.get(), timeout=timeout)]
+        except asyncio.TimeoutError:
+            return HttpResponse(status=204)
+        while not queue.empty():
+            docs.append(queue.get_nowait())
+    finally:
+        broker.unsubscribe(user.id, queue)
+    return FastJsonResponse(NotificationSerializer.serialize_many(docs))
@@ -0,0 +1,79 @@
+"""In-process fan-out of new notifications to open SSE / long-poll clients.
+
+Each worker process runs at most one watcher task, whatever the number of
+connected dashboards. The watcher issues a single query for notifications
+newer than the last one it saw, every NOTIFICATIONS_POLL_SECONDS, and hands
+each row to the queues of that user's subscribers. Notifications written by
+any process are therefore delivered without per-client database load.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+
+from backend.mongo import get_async_db
+from .models import Notification
+
+# ObjectIds from different processes can interleave within a second, so every
+# poll looks back this far and de-duplicates instead of trusting a strict "$gt".
+LOOKBACK = timedelta(seconds=2)
+QUEUE_SIZE = 100
+
+
+class NotificationBroker:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._task = None
+        self._seen = set()
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers[str(user_id)].add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(str(user_id))
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[str(user_id)]
+
+    def stats(self):
+        return {
+            'users': len(self._subscribers),
+            'connections': sum(len(q) for q in self._subscribers.values()),
+            'watching': self._task is not None and not self._task.done(),
+        }
+
+    async def _watch(self):
+        collection = get_async_db()[Notification._get_collection_name()]
+        since = datetime.utcnow()
+        primed = False
+        while self._subscribers:
+            poll_started = datetime.utcnow()
+            cursor = collection.find({'_id': {'$gte': ObjectId.from_datetime(since - LOOKBACK)}}).sort('_id', 1)
+            async for doc in cursor:
+                if doc['_id'] in self._seen:
+                    continue
+                self._seen.add(doc['_id'])
+                if not primed:
+                    # rows already in the lookback window when we started are not new
+                    continue
+                for queue in self._subscribers.get(str(doc['user_id']), ()):
+                    if not queue.full():
+                        # a client that stops reading just misses pushes; it still sees
+                        # the rows on its next list request
+                        queue.put_nowait(doc)
+            # only ids the next query can return again need remembering
+            floor = ObjectId.from_datetime(poll_started - LOOKBACK)
+            self._seen = {_id for _id in self._seen if _id >= floor}
+            since = poll_started
+            primed = True
+            await asyncio.sleep(settings.NOTIFICATIONS_POLL_SECONDS)
+
+
+broker = NotificationBroker()
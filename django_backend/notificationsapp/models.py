@@ -0,0 +1,34 @@
+from mongoengine import Document, StringField, DateTimeField, BooleanField, IntField, ObjectIdField
+from datetime import datetime
+
+
+NOTIFICATION_TYPES = ['approval', 'denial', 'action_required', 'info', 'fraud_alert']
+
+
+class Notification(Document):
+    user_id = ObjectIdField(required=True)
+    type = StringField(required=True, choices=NOTIFICATION_TYPES)
+    title = StringField(required=True)
+    message = StringField(required=True)
+    claim_number = StringField()
+    read = BooleanField(default=False)
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'notification',
+        'indexes': [
+            # listing newest first; _id order is creation order
+            {'fields': ['user_id', '-id'], 'name': 'user_newest'},
+            # bulk mark-as-read only touches the user's unread rows
+            {'fields': ['user_id', 'id'], 'name': 'user_unread', 'partialFilterExpression': {'read': False}},
+        ],
+    }
+
+
+class NotificationCounter(Document):
+    """Per-user unread count, kept in step with writes so the badge needs no count query."""
+    id = ObjectIdField(primary_key=True)
+    unread = IntField(default=0)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {'collection': 'notification_counter'}
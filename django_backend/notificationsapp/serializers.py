@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.utils.timesince import timesince
+
+from backend.renderers import compile_row_encoder, json_datetime
+
+
+def time_ago(created_at):
+    return f'{timesince(created_at, now=datetime.utcnow(), depth=1)} ago' if created_at else None
+
+
+class NotificationSerializer:
+    FIELDS = [
+        ('id', '_id', str),
+        ('type', 'type', None),
+        ('title', 'title', None),
+        ('message', 'message', None),
+        ('claim', 'claim_number', None),
+        ('read', 'read', bool),
+        ('time', 'created_at', time_ago),
+        ('createdAt', 'created_at', json_datetime),
+    ]
+    serialize_many = staticmethod(compile_row_encoder('serialize_notifications', FIELDS))
+
+    @classmethod
+    def serialize(cls, notification):
+        return cls.serialize_many((notification,))[0]
@@ -0,0 +1,103 @@
+import logging
+from collections import Counter
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from .models import Notification, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+# the claim fields notify_claims reads
+CLAIM_FIELDS = {'claim_number': 1, 'patient_id': 1, 'provider_id': 1}
+# claim event (usually the new status) -> (type, title, message); sent to the patient and the provider
+CLAIM_NOTICES = {
+    'approved': ('approval', 'Claim approved', 'Claim {claim_number} has been approved.'),
+    'denied': ('denial', 'Claim denied', 'Claim {claim_number} has been denied.'),
+    'pending_docs': ('action_required', 'Documents needed', 'Claim {claim_number} needs more documentation before it can be decided.'),
+    'processing': ('info', 'Claim sent for review', 'Claim {claim_number} has been sent for payor review.'),
+    'under_review': ('info', 'Claim under review', 'A reviewer has started on claim {claim_number}.'),
+    'review_complete': ('info', 'Review completed', 'The review of claim {claim_number} is complete.'),
+}
+
+
+def _counters():
+    return NotificationCounter._get_collection()
+
+
+def _bump(user_id, delta):
+    _counters().update_one(
+        {'_id': user_id},
+        {'$inc': {'unread': delta}, '$set': {'updated_at': datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def notify(user_id, type, title, message, claim_number=None):
+    notification = Notification(user_id=ObjectId(str(user_id)), type=type, title=title, message=message, claim_number=claim_number)
+    notification.save()
+    _bump(notification.user_id, 1)
+    return notification
+
+
+def notify_claims(events):
+    """Notify each claim's patient and provider of ``(claim doc, event)`` pairs.
+
+    One insert_many and one counter bulk_write for the lot. The state change
+    being reported is already written, so a failure here is logged, not raised.
+    """
+    now = datetime.utcnow()
+    docs = []
+    for claim, event in events:
+        notice = CLAIM_NOTICES.get(event)
+        if notice is None:
+            continue
+        type, title, message = notice
+        message = message.format(claim_number=claim['claim_number'])
+        for user_id in {claim.get('patient_id'), claim.get('provider_id')} - {None}:
+            docs.append({
+                'user_id': user_id, 'type': type, 'title': title, 'message': message,
+                'claim_number': claim['claim_number'], 'read': False, 'created_at': now,
+            })
+    if not docs:
+        return 0
+    try:
+        Notification._get_collection().insert_many(docs, ordered=False)
+        unread = Counter(doc['user_id'] for doc in docs)
+        _counters().bulk_write([
+            UpdateOne({'_id': user_id}, {'$inc': {'unread': n}, '$set': {'updated_at': now}}, upsert=True)
+            for user_id, n in unread.items()
+        ], ordered=False)
+    except Exception:
+        logger.exception('Failed to send %d claim notifications', len(docs))
+        return 0
+    return len(docs)
+
+
+def unread_count(user_id):
+    doc = _counters().find_one({'_id': ObjectId(str(user_id))}, {'unread': 1})
+    return max(doc['unread'], 0) if doc else 0
+
+
+def mark_read(user_id, ids=None):
+    """Mark the given notifications (or all of them) read with a single update.
+
+    Returns the number that changed state; the counter moves by exactly that.
+    """
+    user_id = ObjectId(str(user_id))
+    query = {'user_id': user_id, 'read': False}
+    if ids is not None:
+        query['_id'] = {'$in': [ObjectId(str(i)) for i in ids]}
+    changed = Notification._get_collection().update_many(query, {'$set': {'read': True}}).modified_count
+    if changed:
+        _bump(user_id, -changed)
+    return changed
+
+
+def recount(user_id):
+    """Repair a counter from the source of truth (e.g. after a crash between the two writes)."""
+    user_id = ObjectId(str(user_id))
+    unread = Notification._get_collection().count_documents({'user_id': user_id, 'read': False})
+    _counters().update_one({'_id': user_id}, {'$set': {'unread': unread, 'updated_at': datetime.utcnow()}}, upsert=True)
+    return unread
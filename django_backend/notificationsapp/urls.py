@@ -0,0 +1,11 @@
+from django.urls import re_path
+from . import views, async_views
+
+urlpatterns = [
+    re_path(r'^$', views.list_notifications),
+    re_path(r'^unread-count/?$', views.unread_count),
+    re_path(r'^read/?$', views.mark_many_read),
+    re_path(r'^stream/?$', async_views.stream),
+    re_path(r'^poll/?$', async_views.long_poll),
+    re_path(r'^(?P<pk>[0-9a-f]{24})/read/?$', views.mark_one_read),
+]
@@ -0,0 +1,66 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from claimsapp.pagination import page_size
+from .models import Notification
+from .serializers import NotificationSerializer
+from . import services
+
+
+def _user_id(request):
+    return ObjectId(str(request.user.id))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_notifications(request):
+    # Keyset by _id: ?before=<last id of previous page>
+    query = {'user_id': _user_id(request)}
+    before = request.query_params.get('before')
+    if before:
+        try:
+            query['_id'] = {'$lt': ObjectId(before)}
+        except InvalidId:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    if request.query_params.get('unread') in ('1', 'true'):
+        query['read'] = False
+    rows = Notification._get_collection().find(query).sort('_id', -1).limit(page_size(request.query_params.get('limit')))
+    return Response(NotificationSerializer.serialize_many(rows))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_count(request):
+    return Response({'unread': services.unread_count(request.user.id)})
+
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def mark_one_read(request, pk):
+    try:
+        notification_id = ObjectId(pk)
+    except InvalidId:
+        return Response({'error': 'Not Found'}, status=status.HTTP_404_NOT_FOUND)
+    services.mark_read(request.user.id, [notification_id])
+    row = Notification._get_collection().find_one({'_id': notification_id, 'user_id': _user_id(request)})
+    if row is None:
+        return Response({'error': 'Not Found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(NotificationSerializer.serialize(row))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_many_read(request):
+    # {"ids": [...]} marks those; {"all": true} marks every unread notification
+    ids = request.data.get('ids')
+    if not request.data.get('all') and not isinstance(ids, list):
+        return Response({'success': False, 'message': 'Provide "ids" or "all": true'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        changed = services.mark_read(request.user.id, None if request.data.get('all') else ids)
+    except InvalidId:
+        return Response({'success': False, 'message': 'Invalid notification id'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'success': True, 'updated': changed, 'unread': services.unread_count(request.user.id)})
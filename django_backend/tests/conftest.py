@@ -0,0 +1,132 @@
+# Tests run against mongomock, the same in-process stand-in the benchmarks use
+# with --mongomock, so they need no mongod. Run from django_backend/:
+#     python -m pytest -q
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# keep the shared-memory tables of test runs apart from a server on this host
+os.environ.setdefault('LOGIN_THROTTLE_DIR', tempfile.mkdtemp(prefix='healthclaim-tests-'))
+
+
+def pytest_configure():
+    import mongoengine
+    import mongomock
+    import mongomock.collection
+    import backend.mongo
+
+    def connect_mock():
+        if not mongoengine.connection._connections:
+            mongoengine.connect('patientdb', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+
+    backend.mongo.connect_mongo = connect_mock
+
+    # mongomock 4.3 predates the sort option pymongo >= 4.11 passes for bulk updates
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    mongomock.collection.BulkOperationBuilder.add_update = add_update_without_sort
+
+    import django
+    django.setup()
+    connect_mock()
+
+
+@pytest.fixture(autouse=True)
+def mongo():
+    from mongoengine.connection import get_db
+    from authapp.principal_cache import principal_cache
+    db = get_db()
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+    principal_cache.clear()
+    return db
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def __aiter__(self):
+        self.rows = iter(list(self.cursor))
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.db[name])
+
+
+@pytest.fixture
+def async_db(mongo, monkeypatch):
+    """Serve get_async_db() from mongomock (it has no asyncio client)."""
+    import backend.mongo
+    import notificationsapp.broker
+    import authapp.async_views
+    db = AsyncDatabase(mongo)
+    for module in (backend.mongo, notificationsapp.broker, authapp.async_views):
+        monkeypatch.setattr(module, 'get_async_db', lambda: db)
+    return db
+
+
+@pytest.fixture
+def make_user(mongo):
+    from authapp.models import User
+
+    def make(role='patient', email=None, **profile):
+        user = User(email=email or f'{role}{User.objects.count()}@example.com', name=role.title(), role=role,
+                    profile={'firstName': role.title(), 'lastName': 'Test', **profile}, password='not-a-hash')
+        user.save()
+        return user
+    return make
+
+
+@pytest.fixture
+def make_claim(mongo):
+    from datetime import datetime
+    from claimsapp.models import Claim
+
+    def make(patient, provider, **fields):
+        fields.setdefault('claim_number', f'CLM-{Claim.objects.count() + 1:06d}')
+        fields.setdefault('service', 'Office visit')
+        fields.setdefault('service_code', '99213')
+        fields.setdefault('amount_cents', 15000)
+        fields.setdefault('service_date', datetime(2025, 3, 1))
+        claim = Claim(patient_id=patient.id, provider_id=provider.id, provider_specialty=provider.profile.get('specialty'), **fields)
+        claim.save()
+        return claim
+    return make
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from authapp.audit import AuditTrail
+
+
+class RecordingStore:
+    name = 'recording'
+
+    def __init__(self):
+        self.threads = []
+        self.docs = []
+        self.written = threading.Event()
+
+    def write(self, docs):
+        self.threads.append(threading.current_thread().name)
+        self.docs.extend(docs)
+        self.written.set()
+
+
+def trail(store):
+    return AuditTrail(store, None, flush_interval=0, batch_size=100, max_queue=1000, block_seconds=0.1)
+
+
+def test_unbuffered_trail_writes_inline_off_the_loop():
+    store = RecordingStore()
+    trail(store).record('claims.list')
+    assert store.threads == [threading.current_thread().name]
+    assert [doc['action'] for doc in store.docs] == ['claims.list']
+
+
+def test_unbuffered_trail_never_writes_on_the_event_loop():
+    store = RecordingStore()
+    audit = trail(store)
+
+    async def view():
+        audit.record('auth.me')
+        return list(store.docs)
+
+    assert asyncio.run(view()) == []
+    assert store.written.wait(2)
+    assert store.threads == ['audit-flush']
+    assert [doc['action'] for doc in store.docs] == ['auth.me']
+    audit.shutdown()
@@ -0,0 +1,111 @@
+import pytest
+
+from claimsapp.adjudication import Adjudicator
+from claimsapp.coverage import coverage_service, parse_cents
+from claimsapp.models import Accumulator, Claim
+from notificationsapp.models import Notification
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('$1,500', 150000), ('25.50', 2550), (30, 3000), (0, 0), (12.5, 1250), (None, None), ('', None),
+])
+def test_parse_cents(value, cents):
+    assert parse_cents(value) == cents
+
+
+@pytest.mark.parametrize('value', [True, False, -1, '-5', '1.005', 'abc', 'NaN', 'Infinity'])
+def test_parse_cents_rejects(value):
+    with pytest.raises(ValueError):
+        parse_cents(value)
+
+
+PLAN = {'memberId': 'M1', 'effectiveDate': '2024-01-01', 'copay': '$25', 'deductible': '$500', 'outOfPocketMax': '$1,000'}
+
+
+@pytest.fixture
+def members(make_user):
+    return make_user('patient', **PLAN), make_user('patient', **PLAN), make_user('provider')
+
+
+def balance(patient):
+    row = Accumulator.objects(id=f'{patient.id}:2025').first()
+    return (row.deductible_cents, row.oop_cents, row.claims) if row else (0, 0, 0)
+
+
+def charged_to(patient):
+    claims = Claim.objects(patient_id=patient.id, accumulated_at__ne=None)
+    return sum(c.deductible_cents for c in claims), sum(c.member_cents for c in claims), claims.count()
+
+
+def test_increment_only_applies_at_the_expected_version(members):
+    patient = members[0]
+    key = (patient.id, 2025)
+    assert coverage_service.increment({key: (100, 100, 1)}, {}) == set()
+    # computed from version 0, but the accumulator is at 1 now
+    assert coverage_service.increment({key: (50, 50, 1)}, {f'{patient.id}:2025': 0}) == {f'{patient.id}:2025'}
+    assert balance(patient) == (100, 100, 1)
+    assert coverage_service.increment({key: (50, 50, 1)}, {f'{patient.id}:2025': 1}) == set()
+    assert balance(patient) == (150, 150, 2)
+
+
+def test_apply_claim_charges_once(members, make_claim):
+    patient, _, provider = members
+    claim = make_claim(patient, provider, status='approved', amount_cents=30000)
+    share = coverage_service.apply_claim(claim)
+    assert share['deductible_cents'] == 30000
+    assert coverage_service.apply_claim(Claim.objects(id=claim.id).first()) is None
+    assert balance(patient) == charged_to(patient) == (30000, share['member_cents'], 1)
+
+
+def test_batch_recomputes_shares_after_a_concurrent_charge(members, make_claim, monkeypatch):
+    patient, _, provider = members
+    make_claim(patient, provider, amount_cents=30000, service_code='1')
+    make_claim(patient, provider, amount_cents=30000, service_code='2')
+    other = make_claim(patient, provider, amount_cents=40000, service_code='3', status='approved')
+    increment = coverage_service.increment
+    calls = []
+
+    def racing(totals, versions):
+        if not calls:
+            # another writer charges the member between the batch's read and its increment
+            coverage_service.apply_claim(other)
+        calls.append(versions)
+        return increment(totals, versions)
+    monkeypatch.setattr(coverage_service, 'increment', racing)
+
+    report = Adjudicator().run()
+
+    assert len(calls) == 2
+    assert report['written'] == 2 and report['busy'] == 0
+    # the deductible is met exactly once across the three claims
+    assert balance(patient) == charged_to(patient)
+    assert balance(patient)[0] == 50000
+    assert Claim.objects(patient_id=patient.id, status='approved').count() == 3
+
+
+def test_batch_leaves_a_contended_member_submitted(members, make_claim, monkeypatch):
+    busy_patient, patient, provider = members
+    contended = make_claim(busy_patient, provider, amount_cents=30000)
+    make_claim(patient, provider, amount_cents=30000)
+    increment = coverage_service.increment
+
+    def racing(totals, versions):
+        # another writer moves this member's accumulator before every attempt
+        coverage_service.accumulators.update_one({'_id': f'{busy_patient.id}:2025'}, {'$inc': {'version': 1}}, upsert=True)
+        return increment(totals, versions)
+    monkeypatch.setattr(coverage_service, 'increment', racing)
+
+    report = Adjudicator().run()
+
+    assert report['claims'] == 2 and report['written'] == 1 and report['busy'] == 1
+    claim = Claim.objects(id=contended.id).first()
+    assert claim.status == 'submitted'
+    assert claim.accumulated_at is None and claim.member_cents is None and claim.adjudication_run is None
+    assert balance(busy_patient) == charged_to(busy_patient) == (0, 0, 0)
+    assert balance(patient) == charged_to(patient)
+    assert Notification.objects(claim_number=contended.claim_number).count() == 0
+
+    monkeypatch.setattr(coverage_service, 'increment', increment)
+    report = Adjudicator().run()
+    assert report['written'] == 1 and report['busy'] == 0
+    assert balance(busy_patient) == charged_to(busy_patient) == (30000, 30000, 1)
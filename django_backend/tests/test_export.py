@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from authapp.authentication import generate_token_for_user
+from claimsapp.export import csv_cell
+
+
+@pytest.mark.parametrize('value, cell', [
+    ('=1+1', "'=1+1"), ('+44 20 7946 0000', "'+44 20 7946 0000"), ('-2', "'-2"), ('@SUM(A1)', "'@SUM(A1)"),
+    ('\tx', "'\tx"), ('\rx', "'\rx"), ('Office visit', 'Office visit'), ('a=b', 'a=b'), ('', ''),
+    (-5, -5), (None, None), (True, True),
+])
+def test_csv_cell(value, cell):
+    assert csv_cell(value) == cell
+
+
+def download(user, path):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {generate_token_for_user(user)}')
+    response = client.get(path)
+    assert response.status_code == 200
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+@pytest.fixture
+def hostile_claim(make_user, make_claim):
+    patient, provider = make_user('patient'), make_user('provider')
+    make_claim(patient, provider, description='=HYPERLINK("http://evil.example","click")', service='@SUM(A1:A9)',
+               service_code='-99213', patient_name='+Smith', amount_cents=1500)
+    return provider
+
+
+def test_csv_export_guards_text_cells_only(hostile_claim):
+    rows = list(csv.DictReader(io.StringIO(download(hostile_claim, '/api/provider/claims/export'))))
+    assert len(rows) == 1
+    row = rows[0]
+    assert row['description'] == '\'=HYPERLINK("http://evil.example","click")'
+    assert row['service'] == "'@SUM(A1:A9)"
+    assert row['service_code'] == "'-99213"
+    assert row['patient_name'] == "'+Smith"
+    assert row['amount_cents'] == '1500'
+    assert row['service_date'] == '2025-03-01'
+
+
+def test_ndjson_export_is_unchanged(hostile_claim):
+    row = json.loads(download(hostile_claim, '/api/provider/claims/export?type=ndjson').splitlines()[0])
+    assert row['description'] == '=HYPERLINK("http://evil.example","click")'
+    assert row['service_code'] == '-99213'
+    assert row['amount_cents'] == 1500
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, override_settings
+
+from authapp.authentication import generate_token_for_user
+from claimsapp.adjudication import Adjudicator
+from claimsapp.models import Claim
+from claimsapp.review_queue import review_queue
+from notificationsapp import services
+from notificationsapp.models import Notification
+
+
+def titles(user):
+    return [n.title for n in Notification.objects(user_id=user.id).order_by('id')]
+
+
+def test_adjudication_notifies_patient_and_provider(make_user, make_claim):
+    patient, provider = make_user('patient'), make_user('provider', specialty='Cardiology')
+    claim = make_claim(patient, provider)
+
+    decision = Adjudicator().adjudicate(claim)
+
+    assert decision['status'] == 'approved'
+    assert titles(patient) == titles(provider) == ['Claim approved']
+    assert Notification.objects(user_id=patient.id).first().claim_number == claim.claim_number
+    assert services.unread_count(patient.id) == services.unread_count(provider.id) == 1
+
+
+def test_batch_adjudication_notifies_written_claims(make_user, make_claim):
+    patient, provider = make_user('patient'), make_user('provider', specialty='Cardiology')
+    make_claim(patient, provider)
+    make_claim(patient, provider)  # same member, provider, code and day: a duplicate
+    make_claim(patient, provider, status='approved')
+
+    report = Adjudicator(chunk_size=1).run()
+
+    assert report['written'] == 2
+    assert titles(patient) == ['Claim approved', 'Claim denied']
+    assert services.unread_count(provider.id) == 2
+
+
+def test_review_lease_and_completion_notify(make_user, make_claim):
+    patient, provider, payor = make_user('patient'), make_user('provider'), make_user('payor')
+    claim = make_claim(patient, provider, status='processing')
+    review_queue.enqueue(claim)
+
+    item = review_queue.claim_next(payor.id)
+    assert item['claim_id'] == claim.id
+    assert review_queue.complete(claim.id, payor.id)
+    assert not review_queue.complete(claim.id, payor.id)
+
+    assert Claim.objects(id=claim.id).first().status == 'under_review'
+    assert titles(patient) == titles(provider) == ['Claim under review', 'Review completed']
+    assert titles(payor) == []
+
+
+@override_settings(NOTIFICATIONS_POLL_SECONDS=0.05)
+def test_stream_delivers_notification_for_state_change(make_user, make_claim, async_db):
+    patient, provider = make_user('patient'), make_user('provider')
+    claim = make_claim(patient, provider)
+    token = generate_token_for_user(patient)
+
+    async def read_events():
+        response = await AsyncClient().get('/api/notifications/stream', {'token': token})
+        assert response.status_code == 200
+        events = response.streaming_content.__aiter__()
+        try:
+            assert await events.__anext__() == b'retry: 5000\n\n'
+            # the broker's first poll primes it; only later rows are pushed
+            await asyncio.sleep(0.2)
+            await sync_to_async(Adjudicator().adjudicate)(claim)
+            while True:
+                event = (await asyncio.wait_for(events.__anext__(), 3)).decode()
+                if 'event: notification' in event:
+                    return event
+        finally:
+            await events.aclose()
+
+    event = asyncio.run(read_events())
+    payload = json.loads(event.split('data: ', 1)[1])
+    assert payload['title'] == 'Claim approved'
+    assert payload['claim'] == claim.claim_number
@@ -0,0 +1,20 @@
+import json
+from datetime import datetime
+
+from backend.renderers import FastJSONRenderer
+from notificationsapp.serializers import NotificationSerializer
+
+
+def test_model_api_returns_iso_strings(make_user):
+    user = make_user('patient')
+    safe = user.to_safe_object()
+    assert safe['created_at'] == user.created_at.isoformat()
+    assert json.loads(json.dumps(safe))['created_at'] == safe['created_at']
+
+
+def test_notification_created_at_is_iso_and_renders_identically():
+    created = datetime(2025, 3, 1, 9, 30, 15, 250000)
+    row = NotificationSerializer.serialize({'_id': 'n1', 'type': 'info', 'title': 't', 'message': 'm', 'read': 0, 'created_at': created})
+    assert row['createdAt'] == '2025-03-01T09:30:15.250000'
+    rendered = json.loads(FastJSONRenderer().render({'row': row, 'raw': created}))
+    assert rendered['row']['createdAt'] == rendered['raw'] == row['createdAt']
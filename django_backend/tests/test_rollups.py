@@ -0,0 +1,22 @@
+from claimsapp.models import Claim, ClaimRollup
+from claimsapp.rollups import ROLLUP_FIELDS, claim_rollups, rollup_id
+
+
+def test_rebuild_swaps_in_recomputed_rollups(make_user, make_claim, mongo):
+    patient, provider = make_user('patient'), make_user('provider')
+    for amount in (1000, 2000, 3000):
+        claim = make_claim(patient, provider, amount_cents=amount)
+        claim_rollups.added([Claim._get_collection().find_one({'_id': claim.id}, ROLLUP_FIELDS)])
+    Claim.objects(amount_cents=3000).update(set__status='approved')
+    ClaimRollup._get_collection().insert_one({'_id': 'all:-:2000-01-01', 'scope': 'all', 'counts': {'submitted': 9}})
+
+    assert claim_rollups.check()
+    assert claim_rollups.rebuild(batch_size=2) == 4
+    assert claim_rollups.check() == []
+
+    total = ClaimRollup.objects(id=rollup_id('provider', provider.id, None)).first()
+    assert total.counts == {'submitted': 2, 'approved': 1}
+    assert total.amount_cents == {'submitted': 3000, 'approved': 3000}
+    assert ClaimRollup.objects(id='all:-:2000-01-01').first() is None
+    assert 'scope_owner_day' in ClaimRollup._get_collection().index_information()
+    assert 'claim_rollup_rebuild' not in mongo.list_collection_names()